@@ -0,0 +1,503 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Callable
+
+from channels.layers import get_channel_layer
+
+from .matchmaking import LOBBY_TABLE_ID, matchmaker
+from .metrics import engine_latency, timed_group_send
+from .protocol import build_event, build_server_message_event, get_frame_format
+from .models.BettingRound import BettingRound
+from .models.Game import HoldemGameState
+from .models.GamePhase import HoldemGamePhase
+from .models.Player import HoldemPlayer
+from .timers import timer_queue
+
+logger = logging.getLogger(__name__)
+
+STARTING_BIG_BLINDS = 50
+TURN_TIMEOUT = 30
+RECONNECT_GRACE = 60
+TIMEOUTS_BEFORE_SITTING_OUT = 2
+SPECTATOR_INTERVAL = 1.0
+
+
+class TableActor:
+    """Owns the live state of one table and applies commands one at a time,
+    in the order they were submitted"""
+    def __init__(self, table) -> None:
+        self.table = table
+        self.channel_layer = get_channel_layer()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: asyncio.Task = None
+        self.processed: int = 0
+        self.max_queue_depth: int = 0
+        self.total_latency: float = 0.0
+        self.max_latency: float = 0.0
+
+    async def submit(self, command: str, **kwargs):
+        """Queues command and waits until it has been applied, returning the handler's result"""
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.queue = asyncio.Queue()
+            self.task = asyncio.create_task(self.run())
+        future = loop.create_future()
+        self.queue.put_nowait((command, kwargs, future, time.monotonic()))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return await future
+
+    async def run(self) -> None:
+        if self.table.is_restored:
+            self.table.is_restored = False
+            await self.resume()
+        while True:
+            command, kwargs, future, enqueued_at = await self.queue.get()
+            try:
+                result = await getattr(self, f'handle_{command}')(**kwargs)
+            except Exception as e:
+                logger.exception('Command failed', extra={'table_id': self.table.table_id, 'command': command})
+                if not future.done(): future.set_exception(e)
+            else:
+                if not future.done(): future.set_result(result)
+            latency = time.monotonic() - enqueued_at
+            self.table.revision += 1
+            self.processed += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def stop(self) -> None:
+        if self.task: self.task.cancel()
+
+    def get_stats(self) -> dict:
+        return {
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'processed': self.processed,
+            'mean_latency': self.total_latency / self.processed if self.processed else 0.0,
+            'max_latency': self.max_latency,
+        }
+
+    async def handle_register_channel(self, user_id: str, channel_name: str) -> bool:
+        """Routes user_id's private messages to channel_name, unless another connection already has them"""
+        if self.table.player_channels.get(user_id, channel_name) != channel_name: return False
+        self.table.player_channels[user_id] = channel_name
+        reconnect_timer = self.table.reconnect_timers.pop(user_id, None)
+        if reconnect_timer:
+            timer_queue.cancel(reconnect_timer)
+            await self.send_server_message(message=f'{user_id} has reconnected')
+        return True
+
+    async def handle_unregister_channel(self, user_id: str, channel_name: str) -> None:
+        if self.table.player_channels.get(user_id) != channel_name: return
+        del self.table.player_channels[user_id]
+        if user_id in self.table.waiting_room or self.get_player(user_id):
+            self.table.reconnect_timers[user_id] = timer_queue.schedule(
+                RECONNECT_GRACE, self.submit, 'reconnect_expired', user_id=user_id)
+
+    async def handle_reconnect_expired(self, user_id: str) -> None:
+        """The player did not come back in time: drop them from the waiting room and sit them out"""
+        if self.table.reconnect_timers.pop(user_id, None) is None: return
+        if user_id in self.table.waiting_room:
+            await self.handle_player_leave(user_id)
+        if self.get_player(user_id):
+            await self.handle_sit_out(user_id)
+
+    async def handle_sit_out(self, user_id: str) -> bool:
+        if not self.get_player(user_id) or user_id in self.table.sitting_out: return False
+        self.table.sitting_out.add(user_id)
+        await self.send_server_message(message=f'{user_id} is sitting out')
+        if self.is_turn_of(user_id): await self.act_for(user_id)
+        return True
+
+    async def handle_sit_in(self, user_id: str) -> bool:
+        if user_id not in self.table.sitting_out: return False
+        self.table.sitting_out.discard(user_id)
+        self.table.timeouts.pop(user_id, None)
+        await self.send_server_message(message=f'{user_id} is back')
+        return True
+
+    async def handle_turn_timeout(self, user_id: str, seq: int) -> bool:
+        """Acts for a player whose turn it still is, seq tells a stale timer from a live one"""
+        if seq != self.table.stream.seq or not self.is_turn_of(user_id): return False
+        timeouts = self.table.timeouts.get(user_id, 0) + 1
+        if timeouts >= TIMEOUTS_BEFORE_SITTING_OUT:
+            self.table.sitting_out.add(user_id)
+            await self.send_server_message(message=f'{user_id} timed out and is sitting out')
+        is_allowed = await self.act_for(user_id)
+        self.table.timeouts[user_id] = timeouts
+        return is_allowed
+
+    async def resume(self) -> None:
+        """Starts the timers of a table restored from a snapshot. Nobody has reconnected yet,
+        so every player gets the reconnect grace and the player to act gets their turn timer"""
+        players = [player.get_id() for player in self.table.game.players] if self.table.game else []
+        for user_id in list(self.table.waiting_room) + players:
+            if user_id in self.table.player_channels or user_id in self.table.reconnect_timers: continue
+            self.table.reconnect_timers[user_id] = timer_queue.schedule(
+                RECONNECT_GRACE, self.submit, 'reconnect_expired', user_id=user_id)
+        try:
+            await self.start_turn_timer()
+        except Exception:
+            logger.exception('Could not resume table', extra={'table_id': self.table.table_id})
+
+    async def handle_connect(self, channel_name: str = None, protocol: str = None) -> int:
+        """Counts a websocket of this table, on whichever worker it is connected to"""
+        self.table.connections += 1
+        if channel_name: self.table.channel_protocols[channel_name] = protocol
+        return self.table.connections
+
+    async def handle_disconnect(self, channel_name: str = None) -> int:
+        self.table.connections -= 1
+        self.table.channel_protocols.pop(channel_name, None)
+        return self.table.connections
+
+    def get_frame_formats(self, channel_name: str = None) -> set[str]:
+        """Wire formats to encode an event in, the one channel_name reads or those of the whole table.
+        None means every format, for connections the table was never told about"""
+        protocols = self.table.channel_protocols
+        if channel_name in protocols: return {get_frame_format(protocols[channel_name])}
+        if channel_name or not self.table.knows_all_channels: return None
+        return {get_frame_format(protocol) for protocol in protocols.values()}
+
+    async def handle_chat(self, user_id: str, message: str) -> None:
+        await timed_group_send(
+            self.channel_layer,
+            self.table.group_name,
+            build_event('chat_message', {'type': 'chat', 'message': message, 'userId': user_id},
+                        self.get_frame_formats())
+        )
+
+    async def handle_get_waiting_room(self) -> list[str]:
+        return list(self.table.waiting_room)
+
+    async def handle_player_join(self, user_id: str, stack: int = None) -> bool:
+        waiting_room = self.table.waiting_room
+        if user_id in waiting_room or self.get_player(user_id):
+            await self.send_server_message(message=user_id + ' is already in the room!')
+            return False
+
+        waiting_room[user_id] = stack or self.table.big_blind * STARTING_BIG_BLINDS
+        await self.send_waiting_room_update(joined=[user_id])
+        return True
+
+    async def handle_player_leave(self, user_id: str) -> bool:
+        waiting_room = self.table.waiting_room
+        if not user_id in waiting_room:
+            await self.send_server_message(message=user_id + ' is not in the room!')
+            return False
+
+        del waiting_room[user_id]
+        await self.send_waiting_room_update(left=[user_id])
+        self.release_seats([user_id])
+        return True
+
+    async def handle_seat_players(self, players: dict[str, int], big_blind: int, seats: int) -> bool:
+        """Players sent here by the lobby, with the stacks they bring. Starts the table once it has enough"""
+        self.table.big_blind, self.table.seats, self.table.is_matchmade = big_blind, seats, True
+        for user_id, stack in players.items():
+            await self.handle_player_join(user_id, stack)
+        if self.table.game: return True
+        return await self.handle_start_game()
+
+    async def handle_move_player(self, user_id: str, table_id: str) -> bool:
+        """Sends a player to another table to balance them, right away or after the hand they are in"""
+        if user_id in self.table.waiting_room:
+            stack = self.table.waiting_room.pop(user_id)
+            await self.send_waiting_room_update(left=[user_id])
+            asyncio.create_task(self.submit_to_table(table_id, 'seat_players', players={user_id: stack},
+                                                     big_blind=self.table.big_blind, seats=self.table.seats))
+        elif self.get_player(user_id):
+            self.table.moving[user_id] = table_id
+        else:
+            return False
+        await self.send_private_message(user_id, f'You are moving to table {table_id}')
+        return True
+
+    async def handle_start_game(self) -> bool:
+        game = self.table.game
+        if game and game.phase == HoldemGamePhase.SHOWDOWN:
+            # next hand, with the players who are not moving or bust and whoever is waiting
+            self.move_players_out(game)
+            busted = [player.get_id() for player in game.players if player.stack == 0]
+            game.players = [player for player in game.players if player.stack > 0]
+            # newcomers go in front of the button, so they post the big blind once it moves
+            game.players[:0] = self.take_waiting_players(self.table.seats - len(game.players))
+            self.release_seats(busted)
+            if len(game.players) < 2:
+                self.table.game = None
+                for player in game.players:
+                    self.table.waiting_room[player.get_id()] = player.stack
+                await self.send_waiting_room_update(joined=[player.get_id() for player in game.players], message='Waiting for players')
+                return False
+            with engine_latency.time(phase=HoldemGamePhase.PREFLOP.value):
+                game.start_preflop()
+            self.table.recorder.start_hand(game)
+            await self.broadcast_delta()
+            await self.send_hole_cards()
+            await self.start_turn_timer()
+            return True
+
+        if len(self.table.waiting_room) < 2:
+            # not enough players
+            return False
+        if game:
+            # already a game in progress
+            return False
+
+        # start game
+        players = self.take_waiting_players(self.table.seats)
+        await self.send_waiting_room_update(left=[player.get_id() for player in players], message="Game has started")
+        with engine_latency.time(phase=HoldemGamePhase.PREFLOP.value):
+            holdem_game = HoldemGameState(players=players, big_blind=self.table.big_blind, small_blind=self.table.big_blind // 2)
+            for player in holdem_game.players:
+                player.participate()
+            holdem_game.start_preflop()
+        self.table.game = holdem_game
+        self.table.recorder.start_hand(holdem_game)
+        await self.broadcast_delta()
+        await self.send_hole_cards()
+        await self.start_turn_timer()
+        return True
+
+    def take_waiting_players(self, count: int) -> list[HoldemPlayer]:
+        """Takes up to count players from the waiting room, longest waiting first"""
+        waiting_room = self.table.waiting_room
+        user_ids = list(itertools.islice(waiting_room, max(count, 0)))
+        return [HoldemPlayer(stack=waiting_room.pop(user_id), id=user_id) for user_id in user_ids]
+
+    def move_players_out(self, game: HoldemGameState) -> None:
+        for player in [player for player in game.players if player.get_id() in self.table.moving]:
+            table_id = self.table.moving.pop(player.get_id())
+            game.players.remove(player)
+            if not player.stack:
+                # bust on the way out, the seat kept for them at the other table is free again
+                asyncio.create_task(self.submit_to_table(LOBBY_TABLE_ID, 'seat_released', table_id=table_id, user_id=player.get_id()))
+                continue
+            asyncio.create_task(self.submit_to_table(table_id, 'seat_players', players={player.get_id(): player.stack},
+                                                     big_blind=self.table.big_blind, seats=self.table.seats))
+
+    def release_seats(self, user_ids: list[str]) -> None:
+        if not self.table.is_matchmade or not user_ids: return
+        for user_id in user_ids:
+            asyncio.create_task(self.submit_to_table(LOBBY_TABLE_ID, 'seat_released', table_id=self.table.table_id, user_id=user_id))
+
+    async def submit_to_table(self, table_id: str, command: str, **kwargs) -> None:
+        """Submits to another table without holding up this one, tables waiting on each other would deadlock"""
+        from .cluster import table_router  # cluster imports this module through tables
+        try:
+            await table_router.submit(table_id, command, **kwargs)
+        except Exception:
+            logger.exception('Command for another table failed', extra={'table_id': table_id, 'command': command})
+
+    async def handle_queue_join(self, user_id: str, big_blind: int, seats: int) -> bool:
+        """Lobby only: queues user_id for a table of big_blind stakes with seats seats"""
+        try:
+            ticket, seatings = matchmaker.join(user_id, big_blind, seats)
+        except ValueError as e:
+            await self.send_private_message(user_id, str(e))
+            return False
+        pool = matchmaker.get_pool_of(user_id)
+        channel_name = self.table.player_channels.get(user_id)
+        if channel_name:
+            await self.channel_layer.group_add(pool.group_name, channel_name)
+            await self.channel_layer.send(channel_name, build_event('queue_update', {
+                'type': 'queue_update', 'pool': pool.pool_id, 'ticket': ticket, 'position': len(pool.queue),
+            }, self.get_frame_formats(channel_name)))
+        if user_id in pool.queue: await self.send_queue_update(pool, joined=ticket)
+        await self.apply_seatings(pool, seatings)
+        return True
+
+    async def handle_queue_leave(self, user_id: str) -> bool:
+        pool = matchmaker.get_pool_of(user_id)
+        ticket = matchmaker.leave(user_id)
+        if ticket is None: return False
+        channel_name = self.table.player_channels.get(user_id)
+        if channel_name: await self.channel_layer.group_discard(pool.group_name, channel_name)
+        await self.send_queue_update(pool, left=[ticket])
+        return True
+
+    async def handle_seat_released(self, table_id: str, user_id: str) -> None:
+        pool = matchmaker.get_pool_of(user_id)
+        await self.apply_seatings(pool, matchmaker.release(table_id, user_id))
+
+    async def apply_seatings(self, pool, seatings: list) -> None:
+        if not seatings: return
+        new_players = {}
+        for seating in seatings:
+            channel_name = self.table.player_channels.get(seating.user_id)
+            if channel_name:
+                await self.channel_layer.group_discard(pool.group_name, channel_name)
+                await self.channel_layer.send(channel_name, build_event('table_assigned', {
+                    'type': 'table_assigned', 'tableId': seating.table_id, 'bigBlind': pool.big_blind, 'seats': pool.seats,
+                }, self.get_frame_formats(channel_name)))
+            if seating.from_table_id:
+                asyncio.create_task(self.submit_to_table(seating.from_table_id, 'move_player',
+                                                         user_id=seating.user_id, table_id=seating.table_id))
+            else:
+                new_players.setdefault(seating.table_id, {})[seating.user_id] = None
+        for table_id, players in new_players.items():
+            asyncio.create_task(self.submit_to_table(table_id, 'seat_players', players=players,
+                                                     big_blind=pool.big_blind, seats=pool.seats))
+        seated_tickets = [seating.ticket for seating in seatings if seating.ticket is not None]
+        if seated_tickets: await self.send_queue_update(pool, left=seated_tickets)
+
+    async def handle_bet(self, user_id: str, amount: int) -> bool:
+        return await self.apply_action(user_id, 'bet', lambda betting_round: betting_round.bet_action(user_id, amount))
+
+    async def handle_call(self, user_id: str) -> bool:
+        return await self.apply_action(user_id, 'call', lambda betting_round: betting_round.call_action(user_id))
+
+    async def handle_check(self, user_id: str) -> bool:
+        return await self.apply_action(user_id, 'check', lambda betting_round: betting_round.check_action(user_id))
+
+    async def handle_fold(self, user_id: str) -> bool:
+        return await self.apply_action(user_id, 'fold', lambda betting_round: betting_round.fold_action(user_id))
+
+    async def handle_snapshot(self, user_id: str) -> dict:
+        game = self.table.game
+        if not game: return None
+        snapshot = self.table.stream.snapshot(game)
+        player = self.get_player(user_id)
+        if player:
+            snapshot['holeCards'] = [repr(card) for card in player.hole_cards]
+            snapshot['hand'] = player.hand_state.get_hand_rank().name
+        return snapshot
+
+    async def act_for(self, user_id: str) -> bool:
+        """Checks for a player who is away, or folds when there is a bet to call"""
+        betting_round = self.table.game.get_betting_round()
+        if betting_round.get_highest_bet() == self.get_player(user_id).get_current_bet():
+            return await self.handle_check(user_id)
+        return await self.handle_fold(user_id)
+
+    def is_turn_of(self, user_id: str) -> bool:
+        game = self.table.game
+        if not game or game.phase in (HoldemGamePhase.PREGAME, HoldemGamePhase.SHOWDOWN): return False
+        return game.get_betting_round().get_active_player().get_id() == user_id
+
+    async def start_turn_timer(self) -> None:
+        """Gives the player to act TURN_TIMEOUT seconds, or acts for them straight away when they sit out"""
+        timer_queue.cancel(self.table.turn_timer)
+        self.table.turn_timer = None
+        game = self.table.game
+        if not game or game.phase in (HoldemGamePhase.PREGAME, HoldemGamePhase.SHOWDOWN): return
+        user_id = game.get_betting_round().get_active_player().get_id()
+        if user_id in self.table.sitting_out:
+            await self.act_for(user_id)
+            return
+        self.table.turn_timer = timer_queue.schedule(
+            TURN_TIMEOUT, self.submit, 'turn_timeout', user_id=user_id, seq=self.table.stream.seq)
+
+    async def apply_action(self, user_id: str, action_name: str, action: Callable[[BettingRound], bool]) -> bool:
+        game = self.table.game
+        if not game or game.phase in (HoldemGamePhase.PREGAME, HoldemGamePhase.SHOWDOWN):
+            await self.send_private_message(user_id, 'Action not allowed')
+            return False
+        phase = game.phase
+        player = self.get_player(user_id)
+        bet_before = player.get_current_bet() if player else 0
+        with engine_latency.time(phase=phase.value):
+            is_allowed = action(game.get_betting_round())
+            amount = player.get_current_bet() - bet_before if is_allowed else 0
+            if is_allowed and game.get_betting_round().is_round_over():
+                game.advance_phase()
+        if not is_allowed:
+            await self.send_private_message(user_id, 'Action not allowed')
+            return False
+        self.table.recorder.record_action(game, phase, user_id, action_name, amount)
+        self.table.timeouts.pop(user_id, None)
+        await self.broadcast_delta()
+        if game.phase != phase: await self.send_hole_cards()  # the new cards may have improved each hand
+        await self.start_turn_timer()
+        return True
+
+    def get_player(self, user_id: str) -> HoldemPlayer:
+        if not self.table.game: return None
+        return next((player for player in self.table.game.players if player.get_id() == user_id), None)
+
+    async def broadcast_delta(self) -> None:
+        await timed_group_send(
+            self.channel_layer,
+            self.table.group_name,
+            build_event('state_delta', {
+                'type': 'state_delta',
+                **self.table.stream.next_delta(self.table.game),
+            }, self.get_frame_formats())
+        )
+        self.schedule_spectator_update()
+
+    def schedule_spectator_update(self) -> None:
+        """Spectators get one merged snapshot per SPECTATOR_INTERVAL however many deltas there were,
+        so a crowd of watchers costs the seated players nothing per action"""
+        if self.table.spectator_timer or not self.table.spectators: return
+        self.table.spectator_timer = timer_queue.schedule(SPECTATOR_INTERVAL, self.submit, 'spectator_update')
+
+    async def handle_spectator_update(self) -> None:
+        self.table.spectator_timer = None
+        if not self.table.game or self.table.stream.seq == self.table.spectator_seq: return
+        self.table.spectator_seq = self.table.stream.seq
+        await timed_group_send(
+            self.channel_layer,
+            self.table.spectator_group_name,
+            build_event('spectator_update', {
+                'type': 'spectator_update',
+                **self.table.stream.snapshot(self.table.game),
+            }, self.get_frame_formats())
+        )
+
+    async def handle_spectator_join(self, channel_name: str) -> dict:
+        """Adds a watcher to the spectator group, returning the public state to start them from"""
+        self.table.spectators += 1
+        await self.channel_layer.group_add(self.table.spectator_group_name, channel_name)
+        return self.table.stream.snapshot(self.table.game) if self.table.game else None
+
+    async def handle_spectator_leave(self, channel_name: str) -> None:
+        self.table.spectators -= 1
+        await self.channel_layer.group_discard(self.table.spectator_group_name, channel_name)
+
+    async def send_hole_cards(self) -> None:
+        for player in self.table.game.players:
+            channel_name = self.table.player_channels.get(player.get_id())
+            if not channel_name: continue
+            await self.channel_layer.send(channel_name, build_event('private_update', {
+                'type': 'private_update',
+                'seq': self.table.stream.seq,
+                'holeCards': [repr(card) for card in player.hole_cards],
+                'hand': player.hand_state.get_hand_rank().name,
+            }, self.get_frame_formats(channel_name)))
+
+    async def send_private_message(self, user_id: str, message: str) -> None:
+        channel_name = self.table.player_channels.get(user_id)
+        if not channel_name: return
+        await self.channel_layer.send(channel_name,
+                                      build_server_message_event(message, self.get_frame_formats(channel_name)))
+
+    async def send_waiting_room_update(self, **change) -> None:
+        """Broadcasts who joined or left the waiting room and its size, never the whole list"""
+        await timed_group_send(
+            self.channel_layer,
+            self.table.group_name,
+            build_event('waiting_room_update', {
+                'type':'waiting_room_update',
+                **change,
+                'size': len(self.table.waiting_room),
+                'userId': 'Server'
+            }, self.get_frame_formats())
+        )
+
+    async def send_queue_update(self, pool, **change) -> None:
+        await timed_group_send(
+            self.channel_layer,
+            pool.group_name,
+            build_event('queue_update', {'type': 'queue_update', 'pool': pool.pool_id, **change, 'size': len(pool.queue)},
+                        self.get_frame_formats())
+        )
+
+    async def send_server_message(self, message: str) -> None:
+        await timed_group_send(
+            self.channel_layer,
+            self.table.group_name,
+            build_server_message_event(message, self.get_frame_formats())
+        )
@@ -1,3 +1,8 @@
 from django.contrib import admin
 
+from .models.HandHistory import HandEvent, HandRecord
+
 # Register your models here.
+
+admin.site.register(HandRecord)
+admin.site.register(HandEvent)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class HoldemConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "holdem"
+
+    def ready(self):
+        # the Django models live next to the game models in the holdem.models package
+        from .models import HandHistory  # noqa: F401
+        from .log import start_queue_logging
+        from .models.PreflopEquity import get_preflop_equity_table
+        start_queue_logging(self.name)
+        get_preflop_equity_table()
@@ -0,0 +1,133 @@
+import time
+import tracemalloc
+from typing import Callable
+
+from .models.CardGenerator import generate_cards
+from .models.Deck import Deck
+from .models.Game import HoldemGameState
+from .models.GamePhase import HoldemGamePhase
+from .models.HandRank import HandRank
+from .models.HandRanker import HandRanker, TIE_BREAKER_MAP
+from .models.Player import HoldemPlayer
+
+MIN_RUN_TIME = 0.2
+REPEATS = 5
+
+HANDS_BY_RANK = {
+    HandRank.ROYAL_FLUSH: ['as', 'ks', 'qs', 'js', 'ts'],
+    HandRank.STRAIGHT_FLUSH: ['9d', '8d', '7d', '6d', '5d'],
+    HandRank.FOUR_OF_A_KIND: ['7s', '7h', '7d', '7c', 'ks'],
+    HandRank.FULL_HOUSE: ['qs', 'qh', 'qd', '4c', '4s'],
+    HandRank.FLUSH: ['as', '9s', '7s', '4s', '2s'],
+    HandRank.STRAIGHT: ['ah', '2d', '3s', '4c', '5h'],
+    HandRank.THREE_OF_A_KIND: ['8s', '8h', '8d', 'ac', 'js'],
+    HandRank.TWO_PAIRS: ['ts', 'th', '6d', '6c', '3s'],
+    HandRank.PAIR: ['js', 'jh', '9d', '7c', '5s'],
+    HandRank.HIGH_CARD: ['ks', 'jh', '9d', '7c', '5s'],
+}
+
+BenchmarkCase = Callable[[], None]
+
+
+def create_game(num_players: int, seed: int = 0) -> HoldemGameState:
+    players = [HoldemPlayer(stack=1000, id=f'player{i}') for i in range(num_players)]
+    return HoldemGameState(players, seed=seed)
+
+def play_hand_passively(game: HoldemGameState) -> None:
+    """Plays one hand from start_preflop to start_showdown with every player calling or checking"""
+    game.start_preflop()
+    while game.phase != HoldemGamePhase.SHOWDOWN:
+        betting_round = game.get_betting_round()
+        while not betting_round.is_round_over():
+            betting_round.call_action(betting_round.get_active_player().get_id())
+        game.advance_phase()
+
+def _hand_ranker_case() -> BenchmarkCase:
+    hand = generate_cards(HANDS_BY_RANK[HandRank.TWO_PAIRS])
+    def run():
+        HandRanker(hand).update_hand_stats()
+    return run
+
+def _tie_break_case(hand_rank: HandRank) -> Callable[[], BenchmarkCase]:
+    def setup() -> BenchmarkCase:
+        hand = generate_cards(HANDS_BY_RANK[hand_rank])
+        tie_breaker = TIE_BREAKER_MAP[hand_rank]
+        return lambda: tie_breaker(hand)
+    return setup
+
+def _hand_strengths_case(num_players: int) -> Callable[[], BenchmarkCase]:
+    def setup() -> BenchmarkCase:
+        game = create_game(num_players)
+        play_hand_passively(game)
+        return game.get_active_player_hand_strengths
+    return setup
+
+def _deck_case() -> BenchmarkCase:
+    def run():
+        Deck().shuffle()
+    return run
+
+def _deck_reshuffle_case() -> BenchmarkCase:
+    return Deck().shuffle
+
+def _generate_cards_case() -> BenchmarkCase:
+    raw_cards = ['as', 'kd', 'qh', 'jc', 'ts', '9d', '8h']
+    return lambda: generate_cards(raw_cards)
+
+def _full_hand_case() -> BenchmarkCase:
+    game = create_game(6)
+    def run():
+        for player in game.players:
+            player.stack = 1000
+        play_hand_passively(game)
+    return run
+
+BENCHMARK_CASES: dict[str, Callable[[], BenchmarkCase]] = {
+    'hand_ranker_update_hand_stats': _hand_ranker_case,
+    **{f'tie_break_values_{hand_rank.name.lower()}': _tie_break_case(hand_rank) for hand_rank in HandRank},
+    **{f'hand_strengths_{num_players}_players': _hand_strengths_case(num_players) for num_players in range(2, 11)},
+    'deck_construct_and_shuffle': _deck_case,
+    'deck_reshuffle': _deck_reshuffle_case,
+    'generate_cards': _generate_cards_case,
+    'full_hand_6_players': _full_hand_case,
+}
+
+
+def measure(case: BenchmarkCase, min_run_time: float = MIN_RUN_TIME, repeats: int = REPEATS) -> dict:
+    """Best ops/sec over repeats timed batches, and the peak bytes allocated during a single call"""
+    loops = 1
+    while True:
+        elapsed = _time_loops(case, loops)
+        if elapsed >= min_run_time / repeats: break
+        loops *= 2
+    best = min(_time_loops(case, loops) for _ in range(repeats))
+
+    tracemalloc.start()
+    try:
+        case()  # warm caches so only memory a call needs is traced
+        current_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'ops_per_sec': round(loops / best, 1),
+        'peak_bytes_per_op': peak - current_before,
+    }
+
+def _time_loops(case: BenchmarkCase, loops: int) -> float:
+    started = time.perf_counter()
+    for _ in range(loops):
+        case()
+    return time.perf_counter() - started
+
+def find_regressions(baseline: dict, results: dict, threshold_percent: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline: continue
+        base_ops = baseline[name]['ops_per_sec']
+        change = (result['ops_per_sec'] - base_ops) / base_ops * 100
+        if change < -threshold_percent:
+            regressions.append(f'{name}: {base_ops} -> {result["ops_per_sec"]} ops/sec ({change:.1f}%)')
+    return regressions
@@ -0,0 +1,132 @@
+import asyncio
+import itertools
+import logging
+
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+from .snapshots import save_snapshots_periodically
+from .tables import TableRegistry, table_registry
+
+logger = logging.getLogger(__name__)
+
+OWNERSHIP_LEASE = 30
+LEASE_REFRESH_INTERVAL = OWNERSHIP_LEASE / 3
+FORWARD_TIMEOUT = 5
+
+
+class TableRouter:
+    """Routes table commands to the single worker process that owns the table.
+
+    Ownership is a lease in the shared cache (table_owner:<id> -> worker channel),
+    claimed with an atomic add by the first worker to touch the table and kept
+    alive by the owner. Other workers forward commands over the channel layer
+    to the owner's worker channel and wait for the reply, so only the owner
+    restores, evicts or deletes the snapshot of a table. With the default
+    in-memory channel layer and local memory cache every table is local."""
+    def __init__(self, registry: TableRegistry, channel_layer=None, cache_backend=None) -> None:
+        self.registry = registry
+        self.channel_layer = channel_layer
+        self.cache = cache_backend or cache
+        self.worker_channel: str = None
+        self.owned_tables: set[str] = set()
+        self.pending_replies: dict[int, asyncio.Future] = {}
+        self.request_ids = itertools.count()
+        self.tasks: list[asyncio.Task] = []
+        self.loop: asyncio.AbstractEventLoop = None
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.loop is loop: return
+        self.loop = loop
+        for table_id in self.owned_tables:
+            # left over from a previous event loop in this process
+            await self.cache.adelete(f'table_owner:{table_id}')
+        self.channel_layer = self.channel_layer or get_channel_layer()
+        self.worker_channel = await self.channel_layer.new_channel('worker.')
+        self.owned_tables = set()
+        self.tasks = [asyncio.create_task(self.listen()), asyncio.create_task(self.refresh_leases())]
+        if self.registry.snapshot_store:
+            self.tasks.append(asyncio.create_task(save_snapshots_periodically(self.registry)))
+
+    def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        self.loop = None
+
+    async def submit(self, table_id: str, command: str, **kwargs):
+        await self.start()
+        owner = await self.get_owner(table_id)
+        if owner == self.worker_channel:
+            return await self.registry.get_table(table_id).get_actor().submit(command, **kwargs)
+        return await self.forward(owner, table_id, command, kwargs)
+
+    async def get_owner(self, table_id: str) -> str:
+        key = f'table_owner:{table_id}'
+        owner = await self.cache.aget(key)
+        if owner is None and await self.cache.aadd(key, self.worker_channel, OWNERSHIP_LEASE):
+            owner = self.worker_channel
+        elif owner is None:
+            owner = await self.cache.aget(key)
+        if owner == self.worker_channel:
+            self.owned_tables.add(table_id)
+        elif table_id in self.owned_tables:
+            self.lose_table(table_id)
+        return owner
+
+    def lose_table(self, table_id: str) -> None:
+        logger.warning('Lost table ownership', extra={'table_id': table_id})
+        self.owned_tables.discard(table_id)
+        self.registry.release_table(table_id)
+
+    async def forward(self, owner: str, table_id: str, command: str, kwargs: dict):
+        request_id = next(self.request_ids)
+        reply = self.pending_replies[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            await self.channel_layer.send(owner, {
+                'type': 'table.command',
+                'request_id': request_id,
+                'reply_channel': self.worker_channel,
+                'table_id': table_id,
+                'command': command,
+                'kwargs': kwargs,
+            })
+            return await asyncio.wait_for(reply, FORWARD_TIMEOUT)
+        finally:
+            del self.pending_replies[request_id]
+
+    async def listen(self) -> None:
+        while True:
+            message = await self.channel_layer.receive(self.worker_channel)
+            if message['type'] == 'table.command':
+                asyncio.create_task(self.handle_forwarded_command(message))
+            elif message['type'] == 'table.reply':
+                reply = self.pending_replies.get(message['request_id'])
+                if reply is None or reply.done(): continue
+                if 'error' in message: reply.set_exception(RuntimeError(message['error']))
+                else: reply.set_result(message['result'])
+
+    async def handle_forwarded_command(self, message: dict) -> None:
+        response = {'type': 'table.reply', 'request_id': message['request_id']}
+        try:
+            table = self.registry.get_table(message['table_id'])
+            response['result'] = await table.get_actor().submit(message['command'], **message['kwargs'])
+        except Exception as e:
+            logger.exception('Forwarded command failed', extra={'table_id': message['table_id'], 'command': message['command']})
+            response['error'] = f'{type(e).__name__}: {e}'
+        await self.channel_layer.send(message['reply_channel'], response)
+
+    async def refresh_leases(self) -> None:
+        while True:
+            await asyncio.sleep(LEASE_REFRESH_INTERVAL)
+            for table_id in list(self.owned_tables):
+                if self.registry.find_table(table_id) is None:
+                    # evicted, let another worker claim it
+                    self.owned_tables.discard(table_id)
+                    await self.cache.adelete(f'table_owner:{table_id}')
+                elif not await self.cache.atouch(f'table_owner:{table_id}', OWNERSHIP_LEASE) \
+                        and not await self.cache.aadd(f'table_owner:{table_id}', self.worker_channel, OWNERSHIP_LEASE):
+                    self.lose_table(table_id)
+
+
+table_router = TableRouter(table_registry)
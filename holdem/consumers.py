@@ -1,182 +1,193 @@
-import json
-import asyncio
-from datetime import datetime
+import logging
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncWebsocketConsumer
-from django.core.cache import cache
 
-from .models.Game import HoldemGameState
-from .models.Player import HoldemPlayer
+from .cluster import table_router
+from .matchmaking import LOBBY_TABLE_ID
+from .metrics import messages_received, message_latency, timed_group_send
+from .protocol import (MSGPACK_PROTOCOL, build_server_message_event, decode_message, encode_message,
+                       get_frame_format, negotiate_protocol)
+from .tables import DEFAULT_TABLE_ID, get_group_name
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_TYPES = ('server_message', 'player_join', 'player_leave', 'start_game', 'bet', 'call', 'check', 'fold',
+                 'sit_out', 'sit_in', 'queue_join', 'queue_leave', 'snapshot', 'message')
+
+
+def parse_int(value) -> int:
+    """A number sent by a client, None when it is not one"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        self.room_group_name = 'test'
+        self.table_id = self.scope['url_route']['kwargs'].get('table_id', DEFAULT_TABLE_ID)
+        self.protocol = negotiate_protocol(self.scope.get('subprotocols', []))
+        # counted by the table's owner, which may be another worker, so it is not evicted while in use
+        # and only encodes what it sends in the formats its connections read
+        connections = await table_router.submit(self.table_id, 'connect', channel_name=self.channel_name,
+                                                protocol=self.protocol)
+        self.room_group_name = get_group_name(self.table_id)
         self.user_id = None
+        self.is_spectator = 'spectate' in parse_qs(self.scope.get('query_string', b'').decode())
+
+        if self.is_spectator:
+            # watchers only get throttled public snapshots, never chat or per action deltas
+            await self.accept(subprotocol=self.protocol)
+            snapshot = await table_router.submit(self.table_id, 'spectator_join', channel_name=self.channel_name)
+            if snapshot: await self.send_message({'type': 'spectator_update', **snapshot})
+            logger.info('Spectator connected', extra={'table_id': self.table_id})
+            return
 
         await (self.channel_layer.group_add)(
             self.room_group_name,
             self.channel_name
         )
-        await self.accept()
+        await self.accept(subprotocol=self.protocol)
 
-        if not cache.get('player_waiting_room'):
-            player_waiting_room = []
-            cache.set('player_waiting_room', player_waiting_room)
-        else:
-            waiting_room_list = cache.get('player_waiting_room')
-            await self.send_waiting_room_update(message=", ".join(waiting_room_list))
+        waiting_room_list = await table_router.submit(self.table_id, 'get_waiting_room')
+        if waiting_room_list:
+            # the full list only goes to whoever connects, the group gets joins and leaves
+            await self.send_message({'type': 'waiting_room_update', 'players': waiting_room_list,
+                                     'size': len(waiting_room_list), 'userId': 'Server'})
 
-        print(f"{str(datetime.now())} - Group {self.room_group_name} has {len(self.channel_layer.groups.get(self.room_group_name, {}).items())} connection(s)")
-    #     asyncio.create_task(self.wait_and_send_msg(3))
+        logger.info('Connected', extra={'table_id': self.table_id, 'connections': connections})
 
-    # async def wait_and_send_msg(self, seconds: int):
-    #     await asyncio.sleep(seconds)
+    async def receive(self, text_data=None, bytes_data=None):
+        text_data_json = decode_message(text_data, bytes_data)
+        logger.debug('Message received', extra={'table_id': self.table_id, 'data': text_data_json})
 
-    #     await (self.channel_layer.group_send)(
-    #     self.room_group_name,
-    #     {
-    #         'type':'server_message',
-    #         'message':f"{seconds} seconds passed after login!",
-    #     }
-    # )
+        msg_type = text_data_json['type']
+        metric_type = msg_type if msg_type in MESSAGE_TYPES else 'unhandled'
+        messages_received.inc(type=metric_type)
+        with message_latency.time(type=metric_type):
+            await self.handle_message(text_data_json)
 
-    async def receive(self, text_data=None, bytes_data=None):
-        text_data_json = json.loads(text_data)
-        print(f'{str(datetime.now())} - Message received: ', text_data_json)
-        
+    async def handle_message(self, text_data_json: dict):
         msg_type = text_data_json['type']
-        message = text_data_json['message']
-        user_id = text_data_json['userId']
+        if self.is_spectator:
+            # spectators can only ask for the state again, they are not at the table
+            if msg_type == 'snapshot':
+                snapshot = await table_router.submit(self.table_id, 'snapshot', user_id=None)
+                await self.send_message({'type': 'spectator_update', **(snapshot or {})})
+            return
+
+        message = text_data_json.get('message', '')
+        if not self.user_id:
+            # the first user id a connection sends is the only one it can act as
+            if not text_data_json.get('userId'): return await self.send_error('Send your user id first')
+            is_registered = await table_router.submit(self.table_id, 'register_channel', user_id=text_data_json['userId'],
+                                                      channel_name=self.channel_name)
+            if not is_registered: return await self.send_error(f'{text_data_json["userId"]} is connected elsewhere')
+            self.user_id = text_data_json['userId']
+        elif text_data_json.get('userId', self.user_id) != self.user_id:
+            logger.warning('Message for another user', extra={'table_id': self.table_id, 'user_id': self.user_id})
+            return await self.send_error(f'This connection belongs to {self.user_id}')
+        user_id = self.user_id
 
-        if not self.user_id and msg_type == 'server_message':
-            self.user_id = user_id
-        
         if msg_type == 'player_join':
-            await self.handle_player_join(user_id)
+            await table_router.submit(self.table_id, 'player_join', user_id=user_id)
 
         elif msg_type == 'player_leave':
-            await self.handle_player_leave(user_id)
+            await table_router.submit(self.table_id, 'player_leave', user_id=user_id)
 
         elif msg_type == 'start_game':
-            await self.handle_start_game()
+            await table_router.submit(self.table_id, 'start_game')
+
+        elif msg_type == 'bet':
+            amount = parse_int(text_data_json.get('amount', message))
+            if amount is None: return await self.send_error('Bet amount must be a number')
+            await table_router.submit(self.table_id, 'bet', user_id=user_id, amount=amount)
+
+        elif msg_type in ('call', 'check', 'fold', 'sit_out', 'sit_in'):
+            await table_router.submit(self.table_id, msg_type, user_id=user_id)
+
+        elif msg_type == 'queue_join':
+            big_blind, seats = parse_int(text_data_json.get('bigBlind')), parse_int(text_data_json.get('seats'))
+            if big_blind is None or seats is None: return await self.send_error('bigBlind and seats must be numbers')
+            await table_router.submit(LOBBY_TABLE_ID, 'queue_join', user_id=user_id, big_blind=big_blind, seats=seats)
+
+        elif msg_type == 'queue_leave':
+            await table_router.submit(LOBBY_TABLE_ID, 'queue_leave', user_id=user_id)
+
+        elif msg_type == 'snapshot':
+            snapshot = await table_router.submit(self.table_id, 'snapshot', user_id=user_id)
+            await self.send_message({'type': 'snapshot', **(snapshot or {})})
 
         elif msg_type == 'server_message':
             await self.send_server_message(message)
             
         elif msg_type == 'message':
-            await self.send_chat_message(user_id, message)
+            await table_router.submit(self.table_id, 'chat', user_id=user_id, message=message)
 
         else:
-            print(f'{str(datetime.now())} - Message not handled! ', text_data_json)
+            logger.warning('Message not handled', extra={'table_id': self.table_id, 'data': text_data_json})
 
-    async def handle_player_join(self, user_id:str):
-        waiting_room_list = cache.get('player_waiting_room')
-        if user_id in waiting_room_list:
-            await self.send_server_message(message=user_id + ' is already in the room!')
-            return
-
-        waiting_room_list.append(user_id)
-        cache.set('player_waiting_room', waiting_room_list)
-        await self.send_waiting_room_update(message=", ".join(waiting_room_list))
-
-    async def handle_player_leave(self, user_id:str):
-        waiting_room_list = cache.get('player_waiting_room')
-        if not user_id in waiting_room_list:
-            await self.send_server_message(message=user_id + ' is not in the room!')
-            return
+    async def send_message(self, message: dict):
+        await self.send(**encode_message(message, self.protocol))
 
-        waiting_room_list.remove(user_id)
-        cache.set('player_waiting_room', waiting_room_list)
-        await self.send_waiting_room_update(message=", ".join(waiting_room_list))
+    async def send_error(self, message: str):
+        await self.send_message({'type': 'chat', 'message': message, 'userId': 'Server'})
 
-    async def handle_start_game(self):
-        waiting_room_list = cache.get('player_waiting_room')
-        if len(waiting_room_list) < 2:
-            # not enough players
+    async def send_frames(self, event):
+        """Relays a message that was serialized once by whoever sent it to the group"""
+        frame = event['frames'].get(get_frame_format(self.protocol))
+        if frame is None:
+            # sent while the table was forgetting this connection, it is on its way out
+            logger.debug('No frame for protocol', extra={'table_id': self.table_id, 'type': event['type']})
             return
-        if cache.get('holdem_game'):
-            # already a game in progress
-            return
-        cache.set('player_waiting_room', [])
-
-        # update waiting list
-        await self.send_waiting_room_update(message="Game has started")
-        
-        # start game
-        players = [HoldemPlayer(stack=100, id=player_id) for player_id in waiting_room_list]
-        holdem_game = HoldemGameState(players=players)
-        for player in holdem_game.players:
-            player.participate()
-        holdem_game.start_preflop()
-        cache.set('holdem_game', holdem_game)
-
-    async def send_chat_message(self, user_id:str, message:str):
-        await (self.channel_layer.group_send)(
-            self.room_group_name,
-            {
-                'type':'chat_message',
-                'message':message,
-                'userId': user_id
-            }
-        )
+        if self.protocol == MSGPACK_PROTOCOL:
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
 
     async def chat_message(self, event):
-        message = event['message']
-        user_id = event['userId']
+        await self.send_frames(event)
 
-        await self.send(text_data=json.dumps({
-            'type':'chat',
-            'message':message,
-            'userId': user_id
-        }))
+    async def state_delta(self, event):
+        await self.send_frames(event)
 
-    async def send_waiting_room_update(self, message:str):
-        await (self.channel_layer.group_send)(
-            self.room_group_name,
-            {
-                'type':'waiting_room_update',
-                'message': message,
-                'userId': 'Server'
-            }
-        )
+    async def private_update(self, event):
+        await self.send_frames(event)
 
     async def waiting_room_update(self, event):
-        user_id = event['userId']
-        message = event['message']
+        await self.send_frames(event)
 
-        await self.send(text_data=json.dumps({
-            'type':'waiting_room_update',
-            'message': message,
-            'userId': user_id
-        }))
+    async def queue_update(self, event):
+        await self.send_frames(event)
+
+    async def table_assigned(self, event):
+        await self.send_frames(event)
 
     async def send_server_message(self, message):
-        await (self.channel_layer.group_send)(
+        await timed_group_send(
+            self.channel_layer,
             self.room_group_name,
-            {
-                'type':'server_message',
-                'message':message,
-        })
+            build_server_message_event(message)
+        )
 
     async def server_message(self, event):
-        message = event['message']
-        await self.send(text_data=json.dumps({
-            'type':'chat',
-            'message':message,
-            'userId': "Server"
-        }))
+        await self.send_frames(event)
+
+    async def spectator_update(self, event):
+        await self.send_frames(event)
     
     async def disconnect(self, code=None):
-        print(f'{str(datetime.now())} - {self.user_id} disconnecting!')
+        connections = await table_router.submit(self.table_id, 'disconnect', channel_name=self.channel_name)
+        if self.is_spectator:
+            await table_router.submit(self.table_id, 'spectator_leave', channel_name=self.channel_name)
+            return
+        if self.user_id:
+            await table_router.submit(self.table_id, 'unregister_channel', user_id=self.user_id, channel_name=self.channel_name)
+        logger.info('Disconnecting', extra={'table_id': self.table_id, 'user_id': self.user_id})
 
-        await (self.channel_layer.group_send)(
-            self.room_group_name,
-            {
-                'type':'server_message',
-                'message': f'{self.user_id} has disconnected!',
-            }
-        )
+        await self.send_server_message(f'{self.user_id} has disconnected!')
         await (self.channel_layer.group_discard)(
             self.room_group_name,
             self.channel_name
         )
-        print(f"{str(datetime.now())} - Group <{self.room_group_name}> has {len(self.channel_layer.groups.get(self.room_group_name, {}).items())} connection(s)")
+        logger.info('Disconnected', extra={'table_id': self.table_id, 'connections': connections})
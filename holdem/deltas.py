@@ -0,0 +1,50 @@
+from .models.Game import HoldemGameState
+from .models.GamePhase import HoldemGamePhase
+
+
+def get_public_state(game: HoldemGameState) -> dict:
+    """Everything every seat is allowed to see"""
+    betting_round = game.get_betting_round()
+    is_betting = betting_round is not None and game.phase not in (HoldemGamePhase.PREGAME, HoldemGamePhase.SHOWDOWN)
+    legal_actions = betting_round.get_legal_actions() if is_betting else None
+    return {
+        'phase': game.phase.value,
+        'pot': game.pot,
+        'activePlayer': betting_round.get_active_player().get_id() if is_betting else None,
+        # what the active player may put in: a call, or a raise between minBet and maxBet when maxBet is not 0
+        'legalActions': {'call': legal_actions.call_amount, 'minBet': legal_actions.min_bet,
+                         'maxBet': legal_actions.max_bet} if legal_actions else None,
+        'bets': {player.get_id(): player.get_current_bet() for player in game.players},
+        'stacks': {player.get_id(): player.stack for player in game.players},
+        'folded': [player.get_id() for player in game.players if not player.is_active],
+        'communityCards': [repr(card) for card in game.get_community_cards()],
+        'winners': [player.get_id() for player in game.winners],
+    }
+
+
+class GameStateStream:
+    """Turns successive public states of a game into numbered deltas holding
+    only what changed, so clients can apply them in order and spot gaps"""
+    def __init__(self) -> None:
+        self.seq: int = 0
+        self.last_state: dict = {}
+
+    def next_delta(self, game: HoldemGameState) -> dict:
+        state = get_public_state(game)
+        delta = {}
+        for key, value in state.items():
+            previous = self.last_state.get(key)
+            if value == previous: continue
+            if key in ('bets', 'stacks') and previous is not None and previous.keys() == value.keys():
+                delta[key] = {player_id: amount for player_id, amount in value.items() if previous[player_id] != amount}
+            elif key == 'communityCards' and previous is not None and value[:len(previous)] == previous:
+                delta['newCards'] = value[len(previous):]
+            else:
+                delta[key] = value
+        self.last_state = state
+        self.seq += 1
+        return {'seq': self.seq, **delta}
+
+    def snapshot(self, game: HoldemGameState) -> dict:
+        """Full public state at the current sequence number"""
+        return {'seq': self.seq, **get_public_state(game)}
@@ -0,0 +1,155 @@
+import atexit
+import logging
+import queue
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models.Game import HoldemGameState
+from .models.GamePhase import HoldemGamePhase
+from .models.HandHistory import HandEvent, HandRecord
+from .models.Player import HoldemPlayer
+from .models.Pot import get_winnings
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+ACTIONS = ('bet', 'call', 'check', 'fold')
+DEALT_CARDS = {
+    HoldemGamePhase.FLOP: slice(0, 3),
+    HoldemGamePhase.TURN: slice(3, 4),
+    HoldemGamePhase.RIVER: slice(4, 5),
+}
+PHASES = list(HoldemGamePhase)
+
+
+class HandHistoryWriter:
+    """Saves hand history rows from a background thread in batches, so the
+    table actors only pay for putting unsaved rows on a queue"""
+    def __init__(self, batch_size: int = BATCH_SIZE) -> None:
+        self.batch_size = batch_size
+        self.rows: queue.Queue = queue.Queue()
+        self.thread: threading.Thread = None
+        self.written: int = 0
+
+    def add(self, row: HandRecord | HandEvent) -> None:
+        self.rows.put(row)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='hand-history-writer', daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+
+    def run(self) -> None:
+        while True:
+            batch = [self.rows.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.rows.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+                self.written += len(batch)
+            except Exception:
+                logger.exception('Could not save hand history', extra={'rows': len(batch)})
+            finally:
+                for _ in batch:
+                    self.rows.task_done()
+
+    def flush(self) -> None:
+        """Blocks until every row added so far has been written"""
+        self.rows.join()
+
+    def write(self, batch: list) -> None:
+        # rows are queued in order, so a hand's record is never behind its events
+        with transaction.atomic():
+            HandRecord.objects.bulk_create([row for row in batch if isinstance(row, HandRecord)])
+            HandEvent.objects.bulk_create([row for row in batch if isinstance(row, HandEvent)])
+
+
+class HandRecorder:
+    """Turns what happens at one table into hand history rows for the writer"""
+    def __init__(self, table_id: str, writer: HandHistoryWriter) -> None:
+        self.table_id = table_id
+        self.writer = writer
+        self.hands: int = 0
+        self.record: HandRecord = None
+        self.sequence: int = 0
+
+    def start_hand(self, game: HoldemGameState) -> None:
+        if not settings.HOLDEM_HAND_HISTORY: return
+        self.hands += 1
+        self.sequence = 0
+        # stacks the hand started with, the blinds may already have been paid out at a showdown
+        winnings = get_winnings(game.pots) if game.phase == HoldemGamePhase.SHOWDOWN else {}
+        self.record = HandRecord(
+            hand_id=uuid.uuid4().hex,
+            table_id=self.table_id,
+            hand_number=self.hands,
+            started_at=timezone.now(),
+            big_blind=game.big_blind,
+            small_blind=game.small_blind,
+            seats=[{'id': player.get_id(), 'stack': player.stack + player.total_contribution - winnings.get(player.get_id(), 0)}
+                   for player in game.players],
+            deck=list(game.deck_codes),
+        )
+        self.writer.add(self.record)
+        for player in game.players:
+            self.add_event('hole_cards', HoldemGamePhase.PREFLOP, player.get_id(), cards=[repr(card) for card in player.hole_cards])
+        # blinds that put everyone all in run the board out before anyone acts
+        self.record_phase_change(game, HoldemGamePhase.PREFLOP)
+
+    def record_action(self, game: HoldemGameState, phase: HoldemGamePhase, player_id: str, action: str, amount: int) -> None:
+        if self.record is None: return
+        self.add_event(action, phase, player_id, amount)
+        self.record_phase_change(game, phase)
+
+    def record_phase_change(self, game: HoldemGameState, phase: HoldemGamePhase) -> None:
+        """Deals of every street after phase, an all in runout goes through several at once,
+        then the showdown if the hand is over"""
+        if game.phase == phase: return
+        community_cards = game.get_community_cards()
+        for street, dealt_cards in DEALT_CARDS.items():
+            new_cards = community_cards[dealt_cards]
+            # a hand everyone folded ends without dealing the rest of the board
+            if PHASES.index(street) <= PHASES.index(phase) or not new_cards: continue
+            self.add_event('deal', street, cards=[repr(card) for card in new_cards])
+        if game.phase == HoldemGamePhase.SHOWDOWN:
+            self.add_event('showdown', game.phase,
+                           winners=[player.get_id() for player in game.winners],
+                           stacks={player.get_id(): player.stack for player in game.players})
+            self.record = None
+
+    def add_event(self, kind: str, phase: HoldemGamePhase, player_id: str = '', amount: int = None, **data) -> None:
+        self.sequence += 1
+        self.writer.add(HandEvent(hand=self.record, sequence=self.sequence, kind=kind, phase=phase.value,
+                                  player_id=player_id, amount=amount, data=data, created_at=timezone.now()))
+
+
+def replay_hand(hand_id: str) -> HoldemGameState:
+    record = HandRecord.objects.get(hand_id=hand_id)
+    return replay(record, list(record.events.order_by('sequence')))
+
+def replay(record: HandRecord, events: list[HandEvent]) -> HoldemGameState:
+    """Deals the recorded deck to the recorded seats and applies every action again"""
+    players = [HoldemPlayer(stack=seat['stack'], id=seat['id']) for seat in record.seats]
+    game = HoldemGameState(players, big_blind=record.big_blind, small_blind=record.small_blind)
+    game.deal_hand(record.deck)
+    for event in events:
+        if event.kind in ACTIONS:
+            betting_round = game.get_betting_round()
+            if event.kind == 'bet': is_allowed = betting_round.bet_action(event.player_id, event.amount)
+            else: is_allowed = getattr(betting_round, f'{event.kind}_action')(event.player_id)
+            if not is_allowed: raise ValueError(f'Replayed {event.kind} by {event.player_id} was not allowed')
+            if betting_round.is_round_over(): game.advance_phase()
+        elif event.kind == 'deal' and event.data['cards'] != [repr(card) for card in game.get_community_cards()[DEALT_CARDS[HoldemGamePhase(event.phase)]]]:
+            raise ValueError(f'Replay dealt different cards than recorded in {event.phase}')
+        elif event.kind == 'showdown' and event.data['winners'] != [player.get_id() for player in game.winners]:
+            raise ValueError('Replay has different winners than recorded')
+    return game
+
+
+history_writer = HandHistoryWriter()
@@ -0,0 +1,37 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+
+# attributes every LogRecord has, anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line, with any extra= fields as keys"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info: entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_listeners: dict[str, logging.handlers.QueueListener] = {}
+
+def start_queue_logging(logger_name: str) -> None:
+    """Moves the handlers configured for logger_name onto a background thread, so
+    the event loop only pays for putting records on a queue"""
+    logger = logging.getLogger(logger_name)
+    if logger_name in _listeners or not logger.handlers: return
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, *logger.handlers, respect_handler_level=True)
+    logger.handlers = [logging.handlers.QueueHandler(records)]
+    listener.start()
+    atexit.register(listener.stop)
+    _listeners[logger_name] = listener
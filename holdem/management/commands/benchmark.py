@@ -0,0 +1,39 @@
+import json
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from holdem.benchmarks import BENCHMARK_CASES, MIN_RUN_TIME, measure, find_regressions
+
+
+class Command(BaseCommand):
+    help = 'Runs the holdem.models microbenchmarks, optionally saving or comparing against a JSON baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', default='', help='Only run cases whose name matches this regex')
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--compare', help='Fail if a case is slower than in this JSON baseline')
+        parser.add_argument('--threshold', type=float, default=10.0, help='Allowed slowdown in percent')
+        parser.add_argument('--min-time', type=float, default=MIN_RUN_TIME, help='Seconds spent timing each case')
+
+    def handle(self, *args, **options):
+        pattern = re.compile(options['filter'])
+        results = {}
+        for name, setup in BENCHMARK_CASES.items():
+            if not pattern.search(name): continue
+            results[name] = measure(setup(), options['min_time'])
+            result = results[name]
+            self.stdout.write(f"{name:<40} {result['ops_per_sec']:>14,.1f} ops/sec "
+                              f"{result['peak_bytes_per_op']:>10,} B peak")
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = find_regressions(baseline, results, options['threshold'])
+            if regressions:
+                raise CommandError('Benchmarks regressed past {}%:\n{}'.format(options['threshold'], '\n'.join(regressions)))
+            self.stdout.write(f"No case regressed past {options['threshold']}%")
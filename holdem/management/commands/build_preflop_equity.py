@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from holdem.models.PreflopEquity import (DEFAULT_ITERATIONS, STARTING_HANDS, build_preflop_equities,
+                                         get_starting_hand_name, write_preflop_equity_table)
+
+
+class Command(BaseCommand):
+    help = 'Simulates every starting hand class against 1 to 9 random hands and writes the preflop equity table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help='Deals per starting hand class')
+        parser.add_argument('--workers', type=int, help='Worker processes, defaults to the CPU count')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default=str(settings.HOLDEM_PREFLOP_EQUITY_PATH))
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1: raise CommandError('Iterations must be positive')
+        started = time.perf_counter()
+        equities = build_preflop_equities(options['iterations'], options['seed'], options['workers'])
+        write_preflop_equity_table(options['output'], equities, options['iterations'])
+        elapsed = time.perf_counter() - started
+        best = max(range(STARTING_HANDS), key=lambda index: equities[index][0])
+        self.stdout.write(f'Wrote {options["output"]} in {elapsed:.1f}s, '
+                          f'best heads up: {get_starting_hand_name(best)} {equities[best][0]:.3f}')
@@ -0,0 +1,270 @@
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+WS_PATH = '/ws/socket-server'
+STRATEGIES = ('passive', 'aggressive', 'random')
+HAND_TIMEOUT = 60  # seconds a hand may take before the table is given up on
+HAND_OVER = None  # queued as a turn to wake a client once a hand reaches showdown
+
+
+class InProcessTransport:
+    """Talks to the ASGI application in this process through Channels' WebsocketCommunicator"""
+    def __init__(self, path: str) -> None:
+        from channels.testing import WebsocketCommunicator
+        from holdemserver.asgi import application
+        self.communicator = WebsocketCommunicator(application, path)
+
+    async def connect(self) -> None:
+        connected, _ = await self.communicator.connect()
+        if not connected: raise ConnectionError('Websocket connection refused')
+
+    async def send(self, data: dict) -> None:
+        await self.communicator.send_to(text_data=json.dumps(data))
+
+    async def receive(self) -> dict:
+        return json.loads(await self.communicator.receive_from(timeout=3600))
+
+    async def close(self) -> None:
+        await self.communicator.disconnect()
+
+
+class RemoteTransport:
+    """Talks to a running ASGI server over a real websocket"""
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.websocket = None
+
+    async def connect(self) -> None:
+        try:
+            import websockets
+        except ImportError:
+            raise CommandError('Remote load tests need the websockets package: pip install websockets')
+        self.websocket = await websockets.connect(self.url, max_queue=None)
+
+    async def send(self, data: dict) -> None:
+        await self.websocket.send(json.dumps(data))
+
+    async def receive(self) -> dict:
+        return json.loads(await self.websocket.recv())
+
+    async def close(self) -> None:
+        await self.websocket.close()
+
+
+class LoadStats:
+    def __init__(self) -> None:
+        self.connect_times: list[float] = []
+        self.chat_round_trips: list[float] = []  # chat message to its echo
+        self.action_round_trips: list[float] = []  # action to the state delta it caused
+        self.sent: int = 0
+        self.received: int = 0
+        self.hands: int = 0
+        self.errors: int = 0
+
+
+class SimulatedClient:
+    def __init__(self, user_id: str, transport, stats: LoadStats, strategy: str, rng: random.Random) -> None:
+        self.user_id = user_id
+        self.transport = transport
+        self.stats = stats
+        self.strategy = strategy
+        self.rng = rng
+        self.chat_replies: dict[str, asyncio.Future] = {}
+        self.pending_action: float = None
+        self.state: dict = {}
+        self.hands_seen: int = 0
+        self.counts_hands: bool = False
+        self.turns = asyncio.Queue()
+        self.reader: asyncio.Task = None
+
+    async def connect(self) -> None:
+        started = time.perf_counter()
+        await self.transport.connect()
+        self.stats.connect_times.append(time.perf_counter() - started)
+        self.reader = asyncio.create_task(self.read())
+        await self.send({'type': 'server_message', 'message': f'{self.user_id} has connected!'})
+
+    async def send(self, data: dict) -> None:
+        await self.transport.send({'userId': self.user_id, 'message': '', **data})
+        self.stats.sent += 1
+
+    async def read(self) -> None:
+        while True:
+            try:
+                data = await self.transport.receive()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats.errors += 1
+                return
+            self.stats.received += 1
+            self.handle(data)
+
+    def handle(self, data: dict) -> None:
+        if data.get('type') == 'chat' and data.get('userId') == self.user_id:
+            reply = self.chat_replies.pop(data['message'], None)
+            if reply and not reply.done(): reply.set_result(time.perf_counter())
+        elif data.get('type') in ('state_delta', 'snapshot'):
+            if self.pending_action is not None:
+                self.stats.action_round_trips.append(time.perf_counter() - self.pending_action)
+                self.pending_action = None
+            if data['type'] == 'snapshot': self.state = {}
+            for key, value in data.items():
+                if key in ('bets', 'stacks') and data['type'] == 'state_delta':
+                    self.state.setdefault(key, {}).update(value)
+                elif key == 'newCards':
+                    self.state['communityCards'] = self.state.get('communityCards', []) + value
+                else:
+                    self.state[key] = value
+            if self.state.get('activePlayer') == self.user_id:
+                self.turns.put_nowait(dict(self.state))
+            if data.get('winners') and data.get('phase') == 'showdown':
+                self.hands_seen += 1
+                if self.counts_hands: self.stats.hands += 1
+                self.turns.put_nowait(HAND_OVER)
+
+    def count_players_with_chips(self) -> int:
+        return sum(stack > 0 for stack in self.state.get('stacks', {}).values())
+
+    async def chat(self) -> None:
+        token = f'{self.user_id}-{self.rng.random()}'
+        reply = self.chat_replies[token] = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        await self.send({'type': 'message', 'message': token})
+        self.stats.chat_round_trips.append(await reply - started)
+
+    async def act(self, state: dict) -> None:
+        legal_actions = state.get('legalActions') or {}
+        to_call = legal_actions.get('call', 0)
+        # the smallest legal raise, or a call when the server says raising is not possible
+        raise_action = {'type': 'bet', 'amount': legal_actions['minBet']} if legal_actions.get('maxBet') else {'type': 'call' if to_call else 'check'}
+        roll = self.rng.random()
+        if self.strategy == 'aggressive' and roll < 0.3:
+            action = raise_action
+        elif self.strategy == 'random' and roll < 0.1 and to_call:
+            action = {'type': 'fold'}
+        elif self.strategy == 'random' and roll < 0.2:
+            action = raise_action
+        else:
+            action = {'type': 'call' if to_call else 'check'}
+        self.pending_action = time.perf_counter()
+        await self.send(action)
+
+    async def close(self) -> None:
+        if self.reader: self.reader.cancel()
+        await self.transport.close()
+
+
+class Command(BaseCommand):
+    help = 'Simulates websocket players against the holdem consumer and reports throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--players-per-table', type=int, default=6)
+        parser.add_argument('--chats', type=int, default=5, help='Chat round trips per client')
+        parser.add_argument('--hands', type=int, default=0, help='Hands to play per table')
+        parser.add_argument('--strategy', choices=STRATEGIES, default='passive')
+        parser.add_argument('--url', help='ws:// base URL of a running server; runs in-process when omitted')
+        parser.add_argument('--server-pid', type=int, help='Process id of a running server, to report its RSS')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        report = asyncio.run(self.run(options))
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+            return
+        for key, value in report.items():
+            self.stdout.write(f'{key}: {value}')
+
+    async def run(self, options: dict) -> dict:
+        stats = LoadStats()
+        rng = random.Random(options['seed'])
+        per_table = options['players_per_table']
+        clients = []
+        for i in range(options['clients']):
+            path = f'{WS_PATH}/load{i // per_table}'
+            transport = RemoteTransport(options['url'].rstrip('/') + path) if options['url'] else InProcessTransport(path)
+            clients.append(SimulatedClient(f'bot{i}', transport, stats, options['strategy'], random.Random(rng.random())))
+
+        started = time.perf_counter()
+        await asyncio.gather(*[client.connect() for client in clients])
+        connect_elapsed = time.perf_counter() - started
+
+        tables = [clients[i:i + per_table] for i in range(0, len(clients), per_table)]
+        await asyncio.gather(*[self.run_table(table, options) for table in tables])
+        elapsed = time.perf_counter() - started
+
+        await asyncio.gather(*[client.close() for client in clients], return_exceptions=True)
+        return self.build_report(stats, connect_elapsed, elapsed, options)
+
+    async def run_table(self, clients: list[SimulatedClient], options: dict) -> None:
+        for client in clients:
+            await client.send({'type': 'player_join'})
+        for _ in range(options['chats']):
+            await asyncio.gather(*[client.chat() for client in clients])
+        if not options['hands'] or len(clients) < 2: return
+
+        clients[0].counts_hands = True
+        for hand in range(options['hands']):
+            # the server will not deal a hand to fewer than two players with chips
+            if hand and clients[0].count_players_with_chips() < 2: return
+            await clients[0].send({'type': 'start_game'})
+            try:
+                await asyncio.wait_for(asyncio.gather(*[self.play_hand(client, hand + 1) for client in clients]),
+                                       timeout=HAND_TIMEOUT)
+            except asyncio.TimeoutError:
+                clients[0].stats.errors += 1
+                return
+
+    async def play_hand(self, client: SimulatedClient, hands_seen: int) -> None:
+        while client.hands_seen < hands_seen:
+            state = await client.turns.get()
+            if state is not HAND_OVER and state.get('phase') not in ('pregame', 'showdown'):
+                await client.act(state)
+
+    def build_report(self, stats: LoadStats, connect_elapsed: float, elapsed: float, options: dict) -> dict:
+        chat_round_trips = sorted(stats.chat_round_trips)
+        action_round_trips = sorted(stats.action_round_trips)
+        return {
+            'clients': options['clients'],
+            'connections_per_sec': round(len(stats.connect_times) / connect_elapsed, 1) if connect_elapsed else None,
+            'messages_per_sec': round((stats.sent + stats.received) / elapsed, 1),
+            'messages_sent': stats.sent,
+            'messages_received': stats.received,
+            'hands': stats.hands,
+            'errors': stats.errors,
+            'chat_rtt_p50_ms': percentile_ms(chat_round_trips, 50),
+            'chat_rtt_p95_ms': percentile_ms(chat_round_trips, 95),
+            'chat_rtt_p99_ms': percentile_ms(chat_round_trips, 99),
+            'action_rtt_p50_ms': percentile_ms(action_round_trips, 50),
+            'action_rtt_p95_ms': percentile_ms(action_round_trips, 95),
+            'action_rtt_p99_ms': percentile_ms(action_round_trips, 99),
+            'server_rss_mb': get_rss_mb(options['server_pid'] if options['url'] else os.getpid()),
+        }
+
+
+def percentile_ms(sorted_values: list[float], percent: int) -> float:
+    if not sorted_values: return None
+    if len(sorted_values) == 1: return round(sorted_values[0] * 1000, 3)
+    return round(statistics.quantiles(sorted_values, n=100)[percent - 1] * 1000, 3)
+
+def get_rss_mb(pid: int) -> float:
+    if pid is None: return None
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid == os.getpid():
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return None
@@ -0,0 +1,47 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from holdem.simulation import HANDS_PER_CHUNK, POLICIES, simulate_parallel
+
+
+class Command(BaseCommand):
+    help = 'Plays bot hands through the game engine without websockets and checks chip conservation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hands', type=int, default=100000)
+        parser.add_argument('--policies', nargs='+', choices=POLICIES, default=['passive', 'aggressive', 'random'] * 2,
+                            help='Policy of each seat at the table')
+        parser.add_argument('--workers', type=int, help='Worker processes, defaults to the CPU count')
+        parser.add_argument('--hands-per-chunk', type=int, default=HANDS_PER_CHUNK)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if len(options['policies']) < 2: raise CommandError('A table needs at least 2 seats')
+        started = time.perf_counter()
+        stats = simulate_parallel(options['hands'], options['policies'], options['seed'],
+                                  options['workers'], options['hands_per_chunk'])
+        elapsed = time.perf_counter() - started
+        report = {
+            'hands': stats.hands,
+            'hands_per_sec': round(stats.hands / elapsed, 1),
+            'showdowns': stats.showdowns,
+            'uncontested': stats.uncontested,
+            'split_pots': stats.split_pots,
+            'rebuys': stats.rebuys,
+            'mean_pot': round(stats.total_pot / stats.hands, 2) if stats.hands else None,
+            'largest_pot': stats.largest_pot,
+            'winning_hands': dict(stats.winning_hands.most_common()),
+            'net_chips_by_policy': dict(stats.net_chips_by_policy),
+            'conservation_violations': stats.conservation_violations,
+            'chips_lost': stats.chips_lost,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+        else:
+            for key, value in report.items():
+                self.stdout.write(f'{key}: {value}')
+        if stats.conservation_violations:
+            self.stderr.write(f'{stats.conservation_violations} hands did not conserve chips')
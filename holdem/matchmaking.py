@@ -0,0 +1,128 @@
+import itertools
+from dataclasses import dataclass
+
+LOBBY_TABLE_ID = 'lobby'
+MIN_PLAYERS = 2
+
+
+@dataclass
+class Seating:
+    user_id: str
+    table_id: str
+    from_table_id: str = None  # set when a seated player is moved to break up a short table
+    ticket: int = None  # queue ticket of a player who was waiting
+
+
+class MatchPool:
+    """Players waiting for tables of one stake and size, and the tables they were sent to.
+    The queue is a dict in arrival order, so joining, leaving and taking the
+    longest waiting player are all O(1)"""
+    def __init__(self, big_blind: int, seats: int) -> None:
+        if seats < MIN_PLAYERS: raise ValueError(f'Tables need at least {MIN_PLAYERS} seats')
+        if big_blind < 2: raise ValueError('Big blind must be at least 2')
+        self.big_blind = big_blind
+        self.seats = seats
+        self.pool_id = f'{big_blind}_{seats}'
+        self.group_name = f'queue_{self.pool_id}'
+        self.open_at = max(MIN_PLAYERS, seats // 2)  # queued players needed to open another table
+        self.queue: dict[str, int] = {}  # user id -> ticket
+        self.tickets = itertools.count(1)
+        self.tables: dict[str, set[str]] = {}  # table id -> players seated or on their way
+        self.open_tables: dict[str, None] = {}  # tables with a free seat, in the order they opened
+        self.table_numbers = itertools.count(1)
+
+    def join(self, user_id: str) -> tuple[int, list[Seating]]:
+        """Queues user_id, returning their ticket and any seatings it made possible"""
+        ticket = self.queue[user_id] = next(self.tickets)
+        if self.open_tables:
+            return ticket, [self.seat(user_id, next(iter(self.open_tables)))]
+        if len(self.queue) < self.open_at: return ticket, []
+        table_id = f'bb{self.big_blind}_{self.seats}max_{next(self.table_numbers)}'
+        self.tables[table_id] = set()
+        self.open_tables[table_id] = None
+        return ticket, self.fill(table_id)
+
+    def leave(self, user_id: str) -> int:
+        return self.queue.pop(user_id, None)
+
+    def seat(self, user_id: str, table_id: str, from_table_id: str = None) -> Seating:
+        ticket = self.queue.pop(user_id, None)
+        players = self.tables[table_id]
+        players.add(user_id)
+        if len(players) >= self.seats: self.open_tables.pop(table_id, None)
+        return Seating(user_id, table_id, from_table_id, ticket)
+
+    def fill(self, table_id: str) -> list[Seating]:
+        seatings = []
+        while self.queue and len(self.tables[table_id]) < self.seats:
+            seatings.append(self.seat(next(iter(self.queue)), table_id))
+        return seatings
+
+    def release(self, table_id: str, user_id: str) -> list[Seating]:
+        """Frees the seat of a player who left or busted, then fills it from the queue,
+        or breaks the table up when the other tables have room for everyone left at it"""
+        players = self.tables.get(table_id)
+        if players is None or user_id not in players: return []
+        players.discard(user_id)
+        self.open_tables.setdefault(table_id)
+        seatings = self.fill(table_id)
+        if seatings: return seatings
+        if not players:
+            del self.tables[table_id]
+            del self.open_tables[table_id]
+            return []
+        free_seats = [(other_id, self.seats - len(self.tables[other_id])) for other_id in self.open_tables if other_id != table_id]
+        if sum(free for _, free in free_seats) < len(players): return []
+        del self.tables[table_id]
+        del self.open_tables[table_id]
+        moving = iter(sorted(players))
+        for other_id, free in free_seats:
+            seatings.extend(self.seat(user_id, other_id, table_id) for user_id in itertools.islice(moving, free))
+        return seatings
+
+
+class Matchmaker:
+    """Pools of players by stake and table size. Every player is either queued in
+    one pool or seated at one of its tables"""
+    def __init__(self) -> None:
+        self.pools: dict[tuple[int, int], MatchPool] = {}
+        self.player_pools: dict[str, MatchPool] = {}
+        self.table_pools: dict[str, MatchPool] = {}
+
+    def get_pool(self, big_blind: int, seats: int) -> MatchPool:
+        pool = self.pools.get((big_blind, seats))
+        if pool is None:
+            pool = self.pools[(big_blind, seats)] = MatchPool(big_blind, seats)
+        return pool
+
+    def join(self, user_id: str, big_blind: int, seats: int) -> tuple[int, list[Seating]]:
+        if user_id in self.player_pools: raise ValueError(f'{user_id} is already matchmaking')
+        pool = self.get_pool(big_blind, seats)
+        self.player_pools[user_id] = pool
+        ticket, seatings = pool.join(user_id)
+        for seating in seatings:
+            self.table_pools[seating.table_id] = pool
+        return ticket, seatings
+
+    def leave(self, user_id: str) -> int:
+        """Takes user_id out of their queue, returning their ticket, or None when they are seated"""
+        pool = self.player_pools.get(user_id)
+        ticket = pool.leave(user_id) if pool else None
+        if ticket is not None: del self.player_pools[user_id]
+        return ticket
+
+    def release(self, table_id: str, user_id: str) -> list[Seating]:
+        pool = self.table_pools.get(table_id)
+        if pool is None or user_id not in pool.tables.get(table_id, ()): return []
+        del self.player_pools[user_id]
+        seatings = pool.release(table_id, user_id)
+        if table_id not in pool.tables: del self.table_pools[table_id]
+        for seating in seatings:
+            self.table_pools[seating.table_id] = pool
+        return seatings
+
+    def get_pool_of(self, user_id: str) -> MatchPool:
+        return self.player_pools.get(user_id)
+
+
+matchmaker = Matchmaker()
@@ -0,0 +1,116 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+LabelValues = tuple[tuple[str, str], ...]
+
+
+def _format_labels(labels: LabelValues, extra: str = '') -> str:
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra: parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    type_name = 'counter'
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> list[str]:
+        return [f'{self.name}{_format_labels(labels)} {value}' for labels, value in self.values.items()]
+
+
+class Histogram:
+    """Observations counted into fixed upper bound buckets, rendered cumulatively"""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # labels -> [per bucket counts (last is +Inf), sum, count]
+        self.values: dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def get_count(self, **labels) -> int:
+        series = self.values.get(tuple(sorted(labels.items())))
+        return series[2] if series else 0
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        lines = []
+        for labels, (bucket_counts, total, count) in self.values.items():
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + ('+Inf',), bucket_counts):
+                cumulative += bucket_count
+                upper_bound_label = f'le="{upper_bound}"'
+                lines.append(f'{self.name}_bucket{_format_labels(labels, upper_bound_label)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics of this process, rendered in the Prometheus text exposition format.
+    Each worker process keeps its own registry, so scrape every worker"""
+    def __init__(self) -> None:
+        self.metrics: dict[str, Counter | Histogram] = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.register(Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, buckets))
+
+    def register(self, metric):
+        if metric.name in self.metrics: raise ValueError(f'Metric {metric.name} is already registered')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+messages_received = registry.counter('holdem_messages_received_total', 'Websocket messages received by type')
+message_latency = registry.histogram('holdem_message_handling_seconds', 'Time to handle a websocket message by type')
+group_send_latency = registry.histogram('holdem_group_send_seconds', 'Time spent in channel layer group_send by event type')
+engine_latency = registry.histogram('holdem_engine_seconds', 'Time spent in the game engine by phase the command started in')
+
+
+async def timed_group_send(channel_layer, group: str, event: dict) -> None:
+    with group_send_latency.time(event=event['type']):
+        await channel_layer.group_send(group, event)
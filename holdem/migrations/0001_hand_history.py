@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-18 09:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HandRecord',
+            fields=[
+                ('hand_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('table_id', models.CharField(db_index=True, max_length=64)),
+                ('hand_number', models.PositiveIntegerField()),
+                ('started_at', models.DateTimeField()),
+                ('big_blind', models.PositiveIntegerField()),
+                ('small_blind', models.PositiveIntegerField()),
+                ('seats', models.JSONField()),
+                ('deck', models.JSONField()),
+            ],
+            options={
+                'ordering': ['started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HandEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('kind', models.CharField(max_length=16)),
+                ('phase', models.CharField(max_length=16)),
+                ('player_id', models.CharField(blank=True, max_length=64)),
+                ('amount', models.IntegerField(null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField()),
+                ('hand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='holdem.handrecord')),
+            ],
+            options={
+                'ordering': ['hand', 'sequence'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='handevent',
+            constraint=models.UniqueConstraint(fields=('hand', 'sequence'), name='unique_hand_event_sequence'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+import numpy as np
+
+from ..models.Card import Card
+from ..models.HandRank import HandRank
+from ..models.HandEvaluator import STRAIGHT_HIGH, TOP_RANKS
+from ..models.Constants import RANK_VALUE_MAP, SUIT_BITS, SUIT_MASK, RANK_BITS, TIE_BREAK_RANKS, HAND_RANK_SHIFT
+from ..models.Rank import Rank
+
+STRAIGHT_HIGH_TABLE = np.array(STRAIGHT_HIGH, dtype=np.int64)
+TOP_RANKS_TABLE = np.array(TOP_RANKS, dtype=np.int64)
+RANK_BIT_VALUES = 1 << np.arange(len(Rank), dtype=np.int64)
+
+
+def encode_hands(hands: list[list[Card]]) -> np.ndarray:
+    """Converts equally sized hands into an (N, hand size) array of card codes"""
+    return np.array([[card.code for card in hand] for hand in hands], dtype=np.int64)
+
+def evaluate_batch(hands: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Scores an (N, 5), (N, 6) or (N, 7) array of card codes.
+    Returns the hand keys, equal to HandEvaluator.evaluate_codes for each row,
+    and the HandRank value of each hand"""
+    hands = np.asarray(hands, dtype=np.int64)
+    if hands.ndim != 2 or not 5 <= hands.shape[1] <= 7:
+        raise ValueError(f'Hands must have shape (N, 5) to (N, 7), got {hands.shape}')
+    num_hands = hands.shape[0]
+    ranks = hands >> SUIT_BITS
+    suits = hands & SUIT_MASK
+    rows = np.arange(num_hands)[:, None]
+
+    rank_counts = np.bincount((rows * len(Rank) + ranks).ravel(), minlength=num_hands * len(Rank)).reshape(num_hands, len(Rank))
+    suit_counts = np.bincount((rows * 4 + suits).ravel(), minlength=num_hands * 4).reshape(num_hands, 4)
+    present = (rank_counts > 0) @ RANK_BIT_VALUES
+    quads = (rank_counts == 4) @ RANK_BIT_VALUES
+    trips = (rank_counts == 3) @ RANK_BIT_VALUES
+    pairs = (rank_counts == 2) @ RANK_BIT_VALUES
+
+    flush_suit = suit_counts.argmax(axis=1)
+    is_flush = suit_counts.max(axis=1) >= 5
+    flush_mask = np.where(suits == flush_suit[:, None], 1 << ranks, 0).sum(axis=1) * is_flush
+    straight_flush_high = STRAIGHT_HIGH_TABLE[flush_mask]
+    straight_high = STRAIGHT_HIGH_TABLE[present]
+
+    quad = _highest_value(quads)
+    triplet = _highest_value(trips)
+    full_house_pair = _highest_value((trips & ~_bit(triplet)) | pairs)
+    high_pair = _highest_value(pairs)
+    low_pair = _highest_value(pairs & ~_bit(high_pair))
+
+    categories = [
+        (is_flush & (straight_flush_high == RANK_VALUE_MAP[Rank.ACE]), HandRank.ROYAL_FLUSH, 0),
+        (is_flush & (straight_flush_high > 0), HandRank.STRAIGHT_FLUSH, _at(straight_flush_high, 0)),
+        (quad > 0, HandRank.FOUR_OF_A_KIND, _at(quad, 0) | _top_ranks(present & ~_bit(quad), 1, 1)),
+        ((triplet > 0) & (full_house_pair > 0), HandRank.FULL_HOUSE, _at(triplet, 0) | _at(full_house_pair, 1)),
+        (is_flush, HandRank.FLUSH, TOP_RANKS_TABLE[flush_mask]),
+        (straight_high > 0, HandRank.STRAIGHT, _at(straight_high, 0)),
+        (triplet > 0, HandRank.THREE_OF_A_KIND, _at(triplet, 0) | _top_ranks(present & ~_bit(triplet), 2, 1)),
+        (low_pair > 0, HandRank.TWO_PAIRS,
+         _at(high_pair, 0) | _at(low_pair, 1) | _top_ranks(present & ~_bit(high_pair) & ~_bit(low_pair), 1, 2)),
+        (high_pair > 0, HandRank.PAIR, _at(high_pair, 0) | _top_ranks(present & ~_bit(high_pair), 3, 1)),
+    ]
+    keys = np.select(
+        [condition for condition, _, _ in categories],
+        [hand_rank.value << HAND_RANK_SHIFT | tie_break for _, hand_rank, tie_break in categories],
+        default=HandRank.HIGH_CARD.value << HAND_RANK_SHIFT | TOP_RANKS_TABLE[present]
+    )
+    return keys, (keys >> HAND_RANK_SHIFT).astype(np.int8)
+
+def _highest_value(masks: np.ndarray) -> np.ndarray:
+    return TOP_RANKS_TABLE[masks] >> (RANK_BITS * (TIE_BREAK_RANKS - 1))
+
+def _bit(values: np.ndarray) -> np.ndarray:
+    return np.where(values > 0, 1 << np.maximum(values - 1, 0), 0)
+
+def _at(values: np.ndarray, pos: int) -> np.ndarray:
+    return values << (RANK_BITS * (TIE_BREAK_RANKS - 1 - pos))
+
+def _top_ranks(masks: np.ndarray, count: int, pos: int) -> np.ndarray:
+    packed = TOP_RANKS_TABLE[masks] >> (RANK_BITS * (TIE_BREAK_RANKS - count))
+    return packed << (RANK_BITS * (TIE_BREAK_RANKS - count - pos))
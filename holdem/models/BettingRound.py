@@ -1,62 +1,129 @@
+from dataclasses import dataclass
+
 from ..models.Player import HoldemPlayer
 
+
+@dataclass(frozen=True)
+class LegalActions:
+    """What the player to act may do, amounts are chips put in by the action"""
+    player_id: str
+    call_amount: int  # 0 when the player can check, capped at their stack
+    min_bet: int  # smallest raise, or the whole stack when it is short of one, 0 when they cannot raise
+    max_bet: int
+
+    def can_check(self) -> bool:
+        return self.call_amount == 0
+
+    def can_raise(self) -> bool:
+        return self.max_bet > 0
+
+
 class BettingRound:
-    def __init__(self, player_list: list[HoldemPlayer]) -> None:
+    """One street of betting. Seats that can still act are linked in a ring, and the
+    highest bet, minimum raise and players left to act are running counters, so
+    actions and is_round_over never scan the table"""
+    def __init__(self, player_list: list[HoldemPlayer], min_raise: int = 1) -> None:
         self.players = player_list
-        self.active_player_index = 0
-        self.number_of_actions = 0
-        self.INITIAL_ACTIVE_PLAYERS = self.count_active_players()
+        self.live_players = sum(player.is_active for player in self.players)  # not folded, all in players included
+        self.highest_bet = max(player.get_current_bet() for player in self.players)
+        self.min_raise = max(min_raise, 1)  # size of the last full raise, the big blind until someone raises
+        self.last_aggressor: HoldemPlayer = None
+        self.full_raises = 0
+        # full raises each seat had seen when it last acted, only a full raise since then reopens its betting
+        self.seen_raises = [-1] * len(self.players)
+        # all in players are still in the hand but have nothing left to act with, so are left out of the ring
+        seats = [index for index, player in enumerate(self.players) if player.can_act()]
+        self.next_seat = [0] * len(self.players)
+        self.previous_seat = [0] * len(self.players)
+        for seat, next_seat in zip(seats, seats[1:] + seats[:1]):
+            self.next_seat[seat] = next_seat
+            self.previous_seat[next_seat] = seat
+        self.acting_players = len(seats)
+        self.players_to_act = len(seats)  # who still has to act before the round can end
+        self.active_player_index = seats[0] if seats else 0
 
     def get_active_player(self) -> HoldemPlayer:
-        current_player = self.players[self.active_player_index]
-        if not current_player.is_active:
-            self.move_to_next_active_player()
-            current_player = self.players[self.active_player_index]
-        return current_player
-    
-    def move_to_next_active_player(self) -> None:
-        print(f"incrementing index {self.active_player_index}")
-        if self.active_player_index == len(self.players) - 1:
-            self.active_player_index = 0
-        else:
-            self.active_player_index += 1
-        
-        if not self.get_active_player().is_active:
-            self.move_to_next_active_player()
+        return self.players[self.active_player_index]
+
+    def get_legal_actions(self) -> LegalActions:
+        player = self.get_active_player()
+        to_call = self.highest_bet - player.get_current_bet()
+        if player.stack <= to_call: return LegalActions(player.get_id(), player.stack, 0, 0)
+        if not self.can_raise(): return LegalActions(player.get_id(), to_call, 0, 0)
+        return LegalActions(player.get_id(), to_call, min(to_call + self.min_raise, player.stack), player.stack)
+
+    def can_raise(self) -> bool:
+        """False for a player facing only an all in short of a full raise after they already acted"""
+        return self.seen_raises[self.active_player_index] < self.full_raises
+
+    def end_turn(self) -> None:
+        """Passes the action on, taking the player out of the ring once they folded or are all in"""
+        seat = self.active_player_index
+        self.seen_raises[seat] = self.full_raises
+        self.players_to_act -= 1
+        if self.players[seat].can_act():
+            self.active_player_index = self.next_seat[seat]
+            return
+        self.acting_players -= 1
+        if not self.acting_players: return  # nobody can act, stay put
+        next_seat, previous_seat = self.next_seat[seat], self.previous_seat[seat]
+        self.next_seat[previous_seat] = next_seat
+        self.previous_seat[next_seat] = previous_seat
+        self.active_player_index = next_seat
+
+    def is_turn_of(self, player_id: str) -> bool:
+        active_player = self.get_active_player()
+        return active_player.get_id() == player_id and active_player.can_act()
 
     def bet_action(self, player_id: str, bet_amount: int) -> bool:
+        """Puts in bet_amount more chips: a call, a raise of at least min_raise, or the rest of the stack"""
+        if not self.is_turn_of(player_id): return False
         active_player = self.get_active_player()
-        if not active_player.get_id() == player_id: return False
-
-        try:
-            active_player.bet(bet_amount)
-        except ValueError:
-            print(f"Invalid bet for player {active_player.get_id()}")
-            return False
-        
-        self.move_to_next_active_player()
-        self.number_of_actions += 1
+        if not 0 < bet_amount <= active_player.stack: return False
+        raise_size = active_player.get_current_bet() + bet_amount - self.highest_bet
+        if bet_amount < active_player.stack and (raise_size < 0 or 0 < raise_size < self.min_raise): return False
+        if raise_size > 0 and not self.can_raise(): return False
+
+        active_player.bet(bet_amount)
+        if raise_size > 0:
+            # an all in short of a full raise has to be called, but neither reopens betting nor raises the minimum
+            if raise_size >= self.min_raise:
+                self.min_raise = raise_size
+                self.full_raises += 1
+            self.highest_bet += raise_size
+            self.last_aggressor = active_player
+            self.players_to_act = self.acting_players
+        self.end_turn()
         return True
-    
-    def fold_action(self, player_id: str) -> bool:
+
+    def call_action(self, player_id: str) -> bool:
+        if not self.is_turn_of(player_id): return False
         active_player = self.get_active_player()
-        if not active_player.get_id() == player_id: return False
-        active_player.fold()
-        self.number_of_actions += 1
-        return True
+        # calling with a short stack puts the player all in
+        call_amount = min(self.highest_bet - active_player.get_current_bet(), active_player.stack)
+        if call_amount == 0: return self.check_action(player_id)
+        return self.bet_action(player_id, call_amount)
 
-    def is_round_over(self) -> bool:
-        is_only_one_player_active = self.count_active_players() == 1
-        
-        active_player_bet = self.get_active_player().get_current_bet()
-        are_all_active_player_bets_same = self.are_all_active_players_bet(active_player_bet)
+    def check_action(self, player_id: str) -> bool:
+        if not self.is_turn_of(player_id): return False
+        if self.get_active_player().get_current_bet() != self.highest_bet: return False
+        self.end_turn()
+        return True
 
-        all_players_moved = self.number_of_actions >= self.INITIAL_ACTIVE_PLAYERS
-        return is_only_one_player_active or (all_players_moved and are_all_active_player_bets_same)
+    def fold_action(self, player_id: str) -> bool:
+        if not self.is_turn_of(player_id): return False
+        self.get_active_player().fold()
+        self.live_players -= 1
+        self.end_turn()
+        return True
 
-    def are_all_active_players_bet(self, bet_amount: int) -> bool:
-        return all([player.get_current_bet() == bet_amount for player in self.players if player.is_active])
+    def is_round_over(self) -> bool:
+        if self.live_players <= 1 or self.players_to_act <= 0 or not self.acting_players: return True
+        # with everyone else all in there is nobody left to bet against
+        return self.acting_players == 1 and self.get_active_player().get_current_bet() == self.highest_bet
 
     def count_active_players(self) -> int:
-        player_active_statuses = [player.is_active for player in self.players]
-        return sum(player_active_statuses)
\ No newline at end of file
+        return self.live_players
+
+    def get_highest_bet(self) -> int:
+        return self.highest_bet
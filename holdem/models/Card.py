@@ -1,32 +1,59 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from ..models.Rank import Rank
 from ..models.Suit import Suit
-from ..models.Constants import RANK_VALUE_MAP
+from ..models.Constants import RANK_VALUE_MAP, SUIT_INDEX_MAP, SUIT_BITS, SUIT_MASK
 
 @dataclass(frozen=True, slots=True)
 class Card:
     rank: Rank
     suit: Suit
+    code: int = field(init=False, repr=False)
 
     def __post_init__(self) -> None:
         if not isinstance(self.rank, Rank):
             raise ValueError(f'Rank should be of type Rank, got {type(self.rank)}')
         if not isinstance(self.suit, Suit):
             raise ValueError(f'Suit should be of type Suit, got {type(self.suit)}')
+        code = (RANK_VALUE_MAP[self.rank] - 1) << SUIT_BITS | SUIT_INDEX_MAP[self.suit]
+        object.__setattr__(self, 'code', code)
 
     def __str__(self) -> str:
         return f'{self.rank.name} OF {self.suit.name}S'
 
     def __repr__(self) -> str:
         return f'{self.rank.value}{self.suit.value}'
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Card):
+            return NotImplemented
+        return self.code == other.code
+
+    def __hash__(self) -> int:
+        return self.code
     
     def __lt__(self, other) -> bool:
         if not isinstance(other, Card):
             raise NotImplementedError(f'Card cannot be compared with {type(other)}')
-        return RANK_VALUE_MAP[self.rank] < RANK_VALUE_MAP[other.rank]
+        return self.code >> SUIT_BITS < other.code >> SUIT_BITS
     
     def __gt__(self, other) -> bool:
         if not isinstance(other, Card):
             raise NotImplementedError(f'Card cannot be compared with {type(other)}')
-        return RANK_VALUE_MAP[self.rank] > RANK_VALUE_MAP[other.rank]
\ No newline at end of file
+        return self.code >> SUIT_BITS > other.code >> SUIT_BITS
+
+    @staticmethod
+    def from_code(code: int) -> 'Card':
+        return CARDS[code]
+
+
+def get_rank_value(code: int) -> int:
+    """Rank value of a card code, matching RANK_VALUE_MAP"""
+    return (code >> SUIT_BITS) + 1
+
+def get_suit_index(code: int) -> int:
+    return code & SUIT_MASK
+
+# Interned cards, indexed by code
+CARDS: list[Card] = [Card(rank, suit) for rank in Rank for suit in Suit]
+CARD_STR_MAP: dict[str, Card] = {repr(card): card for card in CARDS}
@@ -1,4 +1,4 @@
-from ..models.Card import Card
+from ..models.Card import Card, CARD_STR_MAP
 from ..models.Rank import Rank
 from ..models.Suit import Suit
 
@@ -7,4 +7,7 @@ def generate_cards(raw_card_list: list[str]) -> list[Card]:
         raise TypeError(f'Argument must be of type list, got {type(raw_card_list)} instead')
     if not all(isinstance(item, str) for item in raw_card_list):
         raise TypeError(f'Elements of Argument must be type str')
-    return [Card(Rank(card_str[0]), Suit(card_str[1])) for card_str in raw_card_list]
\ No newline at end of file
+    return [CARD_STR_MAP.get(card_str[:2]) or Card(Rank(card_str[0]), Suit(card_str[1])) for card_str in raw_card_list]
+
+def generate_card_codes(raw_card_list: list[str]) -> list[int]:
+    return [card.code for card in generate_cards(raw_card_list)]
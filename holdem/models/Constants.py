@@ -1,3 +1,19 @@
 from ..models.Rank import Rank
+from ..models.Suit import Suit
 
-RANK_VALUE_MAP = {rank: i for i, rank in enumerate(Rank, 1)}
\ No newline at end of file
+RANK_VALUE_MAP = {rank: i for i, rank in enumerate(Rank, 1)}
+SUIT_INDEX_MAP = {suit: i for i, suit in enumerate(Suit)}
+
+# Cards are encoded as rank index * 4 + suit index, giving codes 0 to 51
+SUIT_BITS = 2
+SUIT_MASK = 0b11
+DECK_SIZE = len(Rank) * len(Suit)
+
+# 13 bit rank masks (bit 0 is two) of every straight, starting with the wheel
+STRAIGHT_RANK_MASKS = [0b1000000001111] + [0b11111 << i for i in range(9)]
+
+# Integer hand keys hold the HandRank value above the tie break key, which packs
+# up to 5 rank values into 4 bits each, most significant first
+RANK_BITS = 4
+TIE_BREAK_RANKS = 5
+HAND_RANK_SHIFT = RANK_BITS * TIE_BREAK_RANKS
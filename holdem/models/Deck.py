@@ -1,22 +1,59 @@
 import random
-from ..models.Card import Card
-from ..models.Rank import Rank
-from ..models.Suit import Suit
+import struct
+from ..models.Card import Card, CARDS
+from ..models.Constants import DECK_SIZE
+
+WORD_BITS = 32
+WORD_LIMIT = 1 << WORD_BITS
+SHUFFLE_WORDS = struct.Struct(f'<{DECK_SIZE - 1}I')
+
+def get_rng(seed: int = None) -> random.Random:
+    """The operating system's CSPRNG, or a reproducible generator when seeded"""
+    return random.SystemRandom() if seed is None else random.Random(seed)
 
 class Deck:
-    def __init__(self) -> None:
-        self.cards = [Card(r, s) for r in Rank for s in Suit]
+    """One permutation of the 52 card codes, dealt from the end by a cursor, so a
+    deck is reshuffled in place for every hand instead of being rebuilt.
+    Shuffles use the operating system's CSPRNG unless seeded for simulations and replays,
+    or take rng from a game that shares it with its other random choices"""
+    def __init__(self, seed: int = None, rng: random.Random = None) -> None:
+        self.card_codes = list(range(DECK_SIZE))
+        self.remaining = DECK_SIZE  # card_codes[remaining:] have been drawn
+        self.rng = rng or get_rng(seed)
 
     def get_cards(self) -> list[Card]:
-        return self.cards.copy()
+        return [CARDS[code] for code in self.card_codes[:self.remaining]]
+
+    def get_codes(self) -> list[int]:
+        return self.card_codes[:self.remaining]
+
+    def set_codes(self, card_codes: list[int]) -> None:
+        """Deals card_codes from the end, as recorded by deck_codes or a snapshot"""
+        self.card_codes = list(card_codes)
+        self.remaining = len(self.card_codes)
 
     def size(self) -> int:
-        return len(self.cards)
+        return self.remaining
 
     def shuffle(self) -> None:
-        random.shuffle(self.cards)
+        """Fisher-Yates over all 52 cards, taking its random words from one rng call"""
+        codes = self.card_codes
+        if len(codes) != DECK_SIZE: codes = self.card_codes = list(range(DECK_SIZE))
+        words = SHUFFLE_WORDS.unpack(self.rng.randbytes(SHUFFLE_WORDS.size))
+        for i, word in zip(range(DECK_SIZE - 1, 0, -1), words):
+            bound = i + 1
+            # words past the last multiple of bound would favour the low positions
+            while word >= WORD_LIMIT - WORD_LIMIT % bound:
+                word = self.rng.getrandbits(WORD_BITS)
+            j = word % bound
+            codes[i], codes[j] = codes[j], codes[i]
+        self.remaining = DECK_SIZE
 
     def draw_card(self) -> Card:
-        if not self.cards:
+        return CARDS[self.draw_code()]
+
+    def draw_code(self) -> int:
+        if not self.remaining:
             raise AttributeError('No more cards in deck')
-        return self.cards.pop()
\ No newline at end of file
+        self.remaining -= 1
+        return self.card_codes[self.remaining]
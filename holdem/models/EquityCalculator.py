@@ -0,0 +1,180 @@
+import asyncio
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import combinations
+from math import comb, sqrt
+
+from ..models.Card import Card
+from ..models.Constants import DECK_SIZE
+from ..models.Game import HoldemGameState
+from ..models.HandEvaluator import evaluate_codes
+from ..models.ResultCache import ResultCache
+from ..models.SuitIsomorphism import get_canonical_key
+
+BOARD_SIZE = 5
+EXHAUSTIVE_RUNOUT_LIMIT = 20000
+DEFAULT_ITERATIONS = 20000
+CONFIDENCE_Z_SCORE = 1.96  # 95% confidence interval
+TIME_CHECK_INTERVAL = 256
+EQUITY_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class Equity:
+    win: float
+    tie: float
+    equity: float
+    margin: float  # half width of the confidence interval of equity, 0 when exhaustive
+    runouts: int
+    is_exhaustive: bool
+
+    def get_confidence_interval(self) -> tuple[float, float]:
+        return max(self.equity - self.margin, 0.0), min(self.equity + self.margin, 1.0)
+
+
+@dataclass
+class EquityTally:
+    """Running totals per player, mergeable across worker processes"""
+    runouts: int
+    wins: list[int]
+    ties: list[int]
+    shares: list[float]
+    squared_shares: list[float]
+
+    @classmethod
+    def empty(cls, num_players: int) -> 'EquityTally':
+        return cls(0, [0] * num_players, [0] * num_players, [0.0] * num_players, [0.0] * num_players)
+
+    def add_runout(self, hand_keys: list[int]) -> None:
+        self.runouts += 1
+        best_key = max(hand_keys)
+        winners = [i for i, key in enumerate(hand_keys) if key == best_key]
+        share = 1 / len(winners)
+        for i in winners:
+            if len(winners) == 1: self.wins[i] += 1
+            else: self.ties[i] += 1
+            self.shares[i] += share
+            self.squared_shares[i] += share * share
+
+    def merge(self, other: 'EquityTally') -> None:
+        self.runouts += other.runouts
+        for i in range(len(self.wins)):
+            self.wins[i] += other.wins[i]
+            self.ties[i] += other.ties[i]
+            self.shares[i] += other.shares[i]
+            self.squared_shares[i] += other.squared_shares[i]
+
+    def to_equities(self, is_exhaustive: bool) -> list[Equity]:
+        if not self.runouts: raise ValueError('No runouts were evaluated')
+        equities = []
+        for i in range(len(self.wins)):
+            mean = self.shares[i] / self.runouts
+            variance = max(self.squared_shares[i] / self.runouts - mean * mean, 0.0)
+            margin = 0.0 if is_exhaustive else CONFIDENCE_Z_SCORE * sqrt(variance / self.runouts)
+            equities.append(Equity(self.wins[i] / self.runouts, self.ties[i] / self.runouts,
+                                   mean, margin, self.runouts, is_exhaustive))
+        return equities
+
+
+def calculate_equity(hole_cards: list[list[Card]], board: list[Card] = None, dead_cards: list[Card] = None,
+                     iterations: int = DEFAULT_ITERATIONS, time_budget: float = None, seed: int = None,
+                     exhaustive_limit: int = EXHAUSTIVE_RUNOUT_LIMIT) -> list[Equity]:
+    """Win, tie and pot share of each hand over the remaining board runouts.
+    Enumerates every runout when there are at most exhaustive_limit of them,
+    otherwise samples until iterations or time_budget (seconds) runs out"""
+    hole_codes, board_codes, remaining = _prepare(hole_cards, board, dead_cards)
+    if count_runouts(len(remaining), len(board_codes)) <= exhaustive_limit:
+        return list(equity_cache.get_or_compute(
+            _get_cache_key(hole_codes, board_codes, remaining),
+            lambda: tuple(enumerate_runouts(hole_codes, board_codes, remaining).to_equities(is_exhaustive=True))))
+    tally = sample_runouts(hole_codes, board_codes, remaining, iterations, time_budget, seed)
+    return tally.to_equities(is_exhaustive=False)
+
+async def calculate_equity_async(hole_cards: list[list[Card]], board: list[Card] = None, dead_cards: list[Card] = None,
+                                 iterations: int = DEFAULT_ITERATIONS, time_budget: float = None, seed: int = None,
+                                 exhaustive_limit: int = EXHAUSTIVE_RUNOUT_LIMIT, workers: int = 4,
+                                 executor: Executor = None) -> list[Equity]:
+    """calculate_equity run in a process pool, splitting sampled runouts across workers"""
+    executor = executor or get_equity_executor()
+    loop = asyncio.get_running_loop()
+    hole_codes, board_codes, remaining = _prepare(hole_cards, board, dead_cards)
+    if count_runouts(len(remaining), len(board_codes)) <= exhaustive_limit:
+        cache_key = _get_cache_key(hole_codes, board_codes, remaining)
+        equities = equity_cache.get(cache_key)
+        if equities is None:
+            tally = await loop.run_in_executor(executor, enumerate_runouts, hole_codes, board_codes, remaining)
+            equities = tuple(tally.to_equities(is_exhaustive=True))
+            equity_cache.put(cache_key, equities)
+        return list(equities)
+
+    seeds = random.Random(seed).sample(range(2**32), workers)
+    worker_iterations = [iterations // workers + (i < iterations % workers) for i in range(workers)]
+    tallies = await asyncio.gather(*[
+        loop.run_in_executor(executor, sample_runouts, hole_codes, board_codes, remaining,
+                             worker_iterations[i], time_budget, seeds[i])
+        for i in range(workers)
+    ])
+    tally = EquityTally.empty(len(hole_codes))
+    for worker_tally in tallies:
+        tally.merge(worker_tally)
+    return tally.to_equities(is_exhaustive=False)
+
+def calculate_game_equity(game: HoldemGameState, **kwargs) -> dict[str, Equity]:
+    """Equity of each active player in game, treating folded hole cards as dead"""
+    active_players = [player for player in game.players if player.is_active]
+    dead_cards = [card for player in game.players if not player.is_active for card in player.hole_cards]
+    equities = calculate_equity([player.hole_cards for player in active_players], game.get_community_cards(),
+                                dead_cards, **kwargs)
+    return {player.get_id(): equity for player, equity in zip(active_players, equities)}
+
+def count_runouts(remaining_cards: int, board_size: int) -> int:
+    return comb(remaining_cards, BOARD_SIZE - board_size)
+
+def enumerate_runouts(hole_codes: list[list[int]], board_codes: list[int], remaining: list[int]) -> EquityTally:
+    tally = EquityTally.empty(len(hole_codes))
+    for runout in combinations(remaining, BOARD_SIZE - len(board_codes)):
+        full_board = board_codes + list(runout)
+        tally.add_runout([evaluate_codes(full_board + hand) for hand in hole_codes])
+    return tally
+
+def sample_runouts(hole_codes: list[list[int]], board_codes: list[int], remaining: list[int],
+                   iterations: int, time_budget: float = None, seed: int = None) -> EquityTally:
+    rng = random.Random(seed)
+    missing = BOARD_SIZE - len(board_codes)
+    deadline = time.monotonic() + time_budget if time_budget else None
+    tally = EquityTally.empty(len(hole_codes))
+    for i in range(iterations):
+        if deadline and i % TIME_CHECK_INTERVAL == 0 and time.monotonic() > deadline: break
+        full_board = board_codes + rng.sample(remaining, missing)
+        tally.add_runout([evaluate_codes(full_board + hand) for hand in hole_codes])
+    return tally
+
+def _prepare(hole_cards: list[list[Card]], board: list[Card], dead_cards: list[Card]) -> tuple[list[list[int]], list[int], list[int]]:
+    board, dead_cards = board or [], dead_cards or []
+    if len(hole_cards) < 2: raise ValueError('Equity requires at least 2 hands')
+    if any(len(hand) != 2 for hand in hole_cards): raise ValueError('Each hand must have 2 hole cards')
+    if len(board) > BOARD_SIZE: raise ValueError(f'Board cannot have more than {BOARD_SIZE} cards')
+    hole_codes = [[card.code for card in hand] for hand in hole_cards]
+    board_codes = [card.code for card in board]
+    known_codes = [code for hand in hole_codes for code in hand] + board_codes + [card.code for card in dead_cards]
+    if len(set(known_codes)) != len(known_codes): raise ValueError('Cards must be unique')
+    known = set(known_codes)
+    return hole_codes, board_codes, [code for code in range(DECK_SIZE) if code not in known]
+
+def _get_cache_key(hole_codes: list[list[int]], board_codes: list[int], remaining: list[int]):
+    # exhaustive results only depend on the cards up to a renaming of suits
+    dead_codes = set(range(DECK_SIZE)).difference(remaining, board_codes, *hole_codes)
+    return get_canonical_key(*hole_codes, board_codes, dead_codes)
+
+# Exhaustive results by suit isomorphism class, sampled results are not reproducible so never cached
+equity_cache = ResultCache(EQUITY_CACHE_SIZE)
+
+_executor: ProcessPoolExecutor = None
+
+def get_equity_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor()
+    return _executor
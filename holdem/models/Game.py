@@ -1,24 +1,26 @@
 from ..models.BettingRound import BettingRound
 from ..models.Card import Card
-from ..models.Deck import Deck
-from ..models.HandRanker import HandRanker
+from ..models.Deck import Deck, get_rng
+from ..models.HandState import HandState
 from ..models.Player import HoldemPlayer
 from ..models.GamePhase import HoldemGamePhase
+from ..models.Pot import Pot, award_pots, build_pots
 
-from itertools import combinations
-import random
 
 class HoldemGameState:
-    def __init__(self, players: list[HoldemPlayer], big_blind: int=2, small_blind: int=1) -> None:
+    def __init__(self, players: list[HoldemPlayer], big_blind: int=2, small_blind: int=1, seed: int=None) -> None:
         if len(players) < 2: raise ValueError("Game requires at least 2 players")
         self.players = players
         self.phase = HoldemGamePhase.PREGAME
-        self.deck = None
+        self.rng = get_rng(seed)  # seats and cards, a seeded game plays out the same way every run
+        self.deck = Deck(rng=self.rng)  # reshuffled in place every hand
+        self.deck_codes = []  # deck order the current hand was dealt from
         self.big_blind = big_blind  # big blind position is last in player list
         self.small_blind = small_blind
         self.community_cards = []
         self.betting_round = None
         self.pot = 0
+        self.pots: list[Pot] = []  # how the pot was split up at the end of the last hand
         self.winners = []
 
     def start_preflop(self) -> None:
@@ -29,77 +31,111 @@ class HoldemGameState:
             self.advance_button_position()
         else: 
             raise ValueError(f"Game phase must be pregame or showdown. Current mode is {self.phase}")
+        self.deal_hand()
+
+    def deal_hand(self, deck_codes: list[int] = None) -> None:
+        """Starts a hand with the current seating, from deck_codes when replaying a recorded hand"""
+        self.reset_hand()
         self.phase = HoldemGamePhase.PREFLOP
-        self.prepare_deck()
+        self.prepare_deck(deck_codes)
         self.pay_blinds()
         self.deal_hole_cards()
         self.initiate_betting_round()
-    
+        if self.betting_round.is_round_over():
+            # the blinds put everyone who could call them all in
+            self.advance_phase()
+
     def start_flop(self) -> None:
         if not self.phase == HoldemGamePhase.PREFLOP: raise ValueError(f"Game must be in preflop. Current mode is {self.phase}")
         self.phase = HoldemGamePhase.FLOP
         self.move_player_bets_to_pot()
         card1, card2, card3 = self.deck.draw_card(), self.deck.draw_card(), self.deck.draw_card()
-        self.community_cards.extend([card1, card2, card3])
+        self.deal_community_cards([card1, card2, card3])
         self.initiate_betting_round()
 
     def start_turn(self) -> None:
         if not self.phase == HoldemGamePhase.FLOP: raise ValueError(f"Game must be in flop. Current mode is {self.phase}")
         self.phase = HoldemGamePhase.TURN
         self.move_player_bets_to_pot()
-        self.community_cards.append(self.deck.draw_card())
+        self.deal_community_cards([self.deck.draw_card()])
         self.initiate_betting_round()
 
     def start_river(self) -> None:
         if not self.phase == HoldemGamePhase.TURN: raise ValueError(f"Game must be in turn. Current mode is {self.phase}")
         self.phase = HoldemGamePhase.RIVER
         self.move_player_bets_to_pot()
-        self.community_cards.append(self.deck.draw_card())
+        self.deal_community_cards([self.deck.draw_card()])
         self.initiate_betting_round()
 
     def start_showdown(self) -> None:
         if not self.phase == HoldemGamePhase.RIVER: raise ValueError(f"Game must be in river. Current mode is {self.phase}")
         self.phase = HoldemGamePhase.SHOWDOWN
         self.move_player_bets_to_pot()
-        winners = self.determine_winners()
-        self.winners = winners
-        pot_per_winner = self.pot // len(winners)
-        for winner in winners:
-            winner.stack += pot_per_winner
-            print(f'{winner.get_id()} won {pot_per_winner} with {winner.hole_cards}!')
+        self.return_uncalled_bet()
+        # hands were scored as the board came, each pot goes to its best eligible hands
+        hand_strengths = dict(self.get_active_player_hand_strengths())
+        self.pots = build_pots(self.get_odd_chip_order())
+        winnings = award_pots(self.pots, hand_strengths)
+        for player in self.players:
+            player.stack += winnings.get(player.get_id(), 0)
+        self.winners = [player for player in self.players if player.get_id() in winnings]
+        self.pot = 0
         #TODO reveal aggressor, reveal winning hand
 
+    def end_hand_uncontested(self) -> None:
+        if not self.count_active_players() == 1: raise ValueError('Hand can only end early with one active player')
+        self.phase = HoldemGamePhase.SHOWDOWN
+        self.move_player_bets_to_pot()
+        self.winners = [player for player in self.players if player.is_active]
+        self.pots = [Pot(self.pot, [self.winners[0].get_id()], [self.winners[0].get_id()])]
+        self.winners[0].stack += self.pot
+        self.pot = 0
+
+    def advance_phase(self) -> None:
+        """Moves on once the current betting round is over, ending the hand if everyone else folded"""
+        if self.count_active_players() == 1:
+            self.end_hand_uncontested()
+            return
+        next_phase_starters = {
+            HoldemGamePhase.PREFLOP: self.start_flop,
+            HoldemGamePhase.FLOP: self.start_turn,
+            HoldemGamePhase.TURN: self.start_river,
+            HoldemGamePhase.RIVER: self.start_showdown,
+        }
+        if self.phase not in next_phase_starters: raise ValueError(f"No betting round to finish in {self.phase}")
+        next_phase_starters[self.phase]()
+        if self.phase != HoldemGamePhase.SHOWDOWN and self.betting_round.is_round_over():
+            # nobody is left to bet, deal the rest of the board
+            self.advance_phase()
+
+    def return_uncalled_bet(self) -> None:
+        """Gives back the part of the biggest contribution nobody else matched"""
+        contributions = sorted((player.total_contribution for player in self.players), reverse=True)
+        uncalled = contributions[0] - contributions[1]
+        if not uncalled: return
+        bettor = next(player for player in self.players if player.total_contribution == contributions[0])
+        bettor.total_contribution -= uncalled
+        bettor.stack += uncalled
+        self.pot -= uncalled
+
+    def get_odd_chip_order(self) -> list[HoldemPlayer]:
+        """Players in postflop acting order, the first winners in it get a split pot's odd chips"""
+        return self.players[-2:] + self.players[:-2]
+
     def determine_winners(self) -> list[HoldemPlayer]:
-        winners = []
-        results = sorted(self.get_active_player_hand_strengths(), 
-                         key=lambda x:x[1])
-        winners.append(results.pop())
-        while winners[0][1] == results[-1][1]:
-            winners.append(results.pop())
-        winner_ids = [winner[0] for winner in winners]
-        return [player for player in self.players if player.get_id() in winner_ids]
+        hand_strengths = dict(self.get_active_player_hand_strengths())
+        best_strength = max(hand_strengths.values())
+        return [player for player in self.players if hand_strengths.get(player.get_id()) == best_strength]
 
     def get_active_player_hand_strengths(self) -> list[tuple[str, int]]:
         if not self.phase == HoldemGamePhase.SHOWDOWN: raise ValueError('Must be in showdown')
-        result = []
-        active_players = [player for player in self.players if player.is_active]
-        for player in active_players:
-            available_cards = self.community_cards + player.hole_cards
-            hand_possibilities = list(combinations(available_cards, 5))
-            all_hand_rank_values = []
-            for hand in hand_possibilities:
-                ranker = HandRanker(hand)
-                ranker.update_hand_stats()
-                val = ranker.calculate_hand_value()
-                all_hand_rank_values.append(val)
-            result.append((player.get_id(), max(all_hand_rank_values)))
-        return result
+        return [(player.get_id(), player.hand_state.get_value()) for player in self.players if player.is_active]
 
     def get_betting_round(self) -> BettingRound:
         return self.betting_round
 
     def initiate_betting_round(self) -> None:
-        self.betting_round = BettingRound(self.generate_betting_order())
+        self.betting_round = BettingRound(self.generate_betting_order(), self.big_blind)
 
     def generate_betting_order(self) -> list[HoldemPlayer]:
         if self.phase in [HoldemGamePhase.PREGAME, HoldemGamePhase.SHOWDOWN]: 
@@ -114,21 +150,46 @@ class HoldemGameState:
     def advance_button_position(self) -> None:
         self.players = self.players[1:] + [self.players[0]]
 
-    def prepare_deck(self) -> None:
-        self.deck = Deck()
-        self.deck.shuffle()
+    def reset_hand(self) -> None:
+        self.players = [player for player in self.players if player.stack > 0]
+        if len(self.players) < 2: raise ValueError("Game requires at least 2 players")
+        self.pot = 0
+        self.pots = []
+        self.community_cards = []
+        self.winners = []
+        for player in self.players:
+            player.hole_cards = []
+            player.hand_state = HandState()
+            player.total_contribution = 0
+            player.participate()
+
+    def prepare_deck(self, deck_codes: list[int] = None) -> None:
+        if deck_codes is None: self.deck.shuffle()
+        else: self.deck.set_codes(deck_codes)
+        self.deck_codes = self.deck.get_codes()
 
     def shuffle_players(self) -> None:
-        random.shuffle(self.players)
+        self.rng.shuffle(self.players)
 
     def pay_blinds(self) -> None:
-        self.players[-1].bet(self.big_blind)
-        self.players[-2].bet(self.small_blind)
+        # short stacks post what they have and are all in
+        self.players[-1].bet(min(self.big_blind, self.players[-1].stack))
+        self.players[-2].bet(min(self.small_blind, self.players[-2].stack))
 
     def deal_hole_cards(self) -> None:
         for player in self.players:
             card1, card2 = self.deck.draw_card(), self.deck.draw_card()
             player.hole_cards.extend([card1, card2])
+            player.hand_state.add_cards([card1, card2])
+
+    def deal_community_cards(self, cards: list[Card]) -> None:
+        self.community_cards.extend(cards)
+        for player in self.players:
+            # folded hands are never shown down, so they stop being scored
+            if player.is_active: player.hand_state.add_cards(cards)
+
+    def count_active_players(self) -> int:
+        return sum(player.is_active for player in self.players)
 
     def are_all_players_active(self) -> bool:
         return all([player.is_active for player in self.players])
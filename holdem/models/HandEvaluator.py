@@ -0,0 +1,129 @@
+from itertools import combinations_with_replacement
+from math import prod
+
+from ..models.Card import Card, get_rank_value, get_suit_index
+from ..models.Rank import Rank
+from ..models.HandRank import HandRank
+from ..models.HandRankTieBreaker import pack_hand_key, rank_values_to_key
+from ..models.Constants import RANK_VALUE_MAP, STRAIGHT_RANK_MASKS, RANK_BITS, TIE_BREAK_RANKS, HAND_RANK_SHIFT
+
+# Hand values are the integer keys of HandRanker.calculate_hand_key
+RANK_MASK_SIZE = 1 << 13
+
+RANK_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+
+def _highest_value(mask: int) -> int:
+    return mask.bit_length()
+
+def _bit(value: int) -> int:
+    return 1 << (value - 1)
+
+def _generate_straight_high_table() -> list[int]:
+    """Maps a 13 bit rank mask to the value of the highest straight it contains, or 0"""
+    table = [0] * RANK_MASK_SIZE
+    for mask in range(RANK_MASK_SIZE):
+        for high_value, straight in enumerate(STRAIGHT_RANK_MASKS, 4):
+            if mask & straight == straight:
+                table[mask] = high_value
+    return table
+
+def _generate_top_ranks_table() -> list[int]:
+    """Maps a 13 bit rank mask to its five highest rank values packed in descending order"""
+    table = [0] * RANK_MASK_SIZE
+    for mask in range(RANK_MASK_SIZE):
+        packed, remaining = 0, mask
+        for pos in range(TIE_BREAK_RANKS):
+            value = _highest_value(remaining)
+            if not value: break
+            packed |= value << (RANK_BITS * (TIE_BREAK_RANKS - 1 - pos))
+            remaining &= ~_bit(value)
+        table[mask] = packed
+    return table
+
+STRAIGHT_HIGH = _generate_straight_high_table()
+TOP_RANKS = _generate_top_ranks_table()
+
+
+def top_ranks(mask: int, count: int, pos: int = 0) -> int:
+    """Returns the highest count rank values of mask, packed from tie-break position pos"""
+    packed = TOP_RANKS[mask] >> (RANK_BITS * (TIE_BREAK_RANKS - count))
+    return packed << (RANK_BITS * (TIE_BREAK_RANKS - count - pos))
+
+def get_hand_rank_from_value(value: int) -> HandRank:
+    return HandRank(value >> HAND_RANK_SHIFT)
+
+def score_rank_counts(counts: list[int]) -> int:
+    """Scores the best non flush hand made from counts, indexed by rank value - 1"""
+    present = quads = trips = pairs = 0
+    for i, count in enumerate(counts):
+        if not count: continue
+        present |= 1 << i
+        if count == 4: quads |= 1 << i
+        elif count == 3: trips |= 1 << i
+        elif count == 2: pairs |= 1 << i
+
+    if quads:
+        quad = _highest_value(quads)
+        return pack_hand_key(HandRank.FOUR_OF_A_KIND, rank_values_to_key([quad]) | top_ranks(present & ~_bit(quad), 1, 1))
+    if trips:
+        triplet = _highest_value(trips)
+        pair = _highest_value((trips & ~_bit(triplet)) | pairs)
+        if pair:
+            return pack_hand_key(HandRank.FULL_HOUSE, rank_values_to_key([triplet, pair]))
+    if STRAIGHT_HIGH[present]:
+        return pack_hand_key(HandRank.STRAIGHT, rank_values_to_key([STRAIGHT_HIGH[present]]))
+    if trips:
+        return pack_hand_key(HandRank.THREE_OF_A_KIND, rank_values_to_key([triplet]) | top_ranks(present & ~_bit(triplet), 2, 1))
+    if pairs:
+        high_pair = _highest_value(pairs)
+        low_pair = _highest_value(pairs & ~_bit(high_pair))
+        if low_pair:
+            kickers = present & ~_bit(high_pair) & ~_bit(low_pair)
+            return pack_hand_key(HandRank.TWO_PAIRS, rank_values_to_key([high_pair, low_pair]) | top_ranks(kickers, 1, 2))
+        return pack_hand_key(HandRank.PAIR, rank_values_to_key([high_pair]) | top_ranks(present & ~_bit(high_pair), 3, 1))
+    return pack_hand_key(HandRank.HIGH_CARD, TOP_RANKS[present])
+
+def score_flush(mask: int) -> int:
+    """Scores the best hand made from the rank mask of a suit holding at least 5 cards"""
+    straight_high = STRAIGHT_HIGH[mask]
+    if straight_high == RANK_VALUE_MAP[Rank.ACE]:
+        return pack_hand_key(HandRank.ROYAL_FLUSH, 0)
+    if straight_high:
+        return pack_hand_key(HandRank.STRAIGHT_FLUSH, rank_values_to_key([straight_high]))
+    return pack_hand_key(HandRank.FLUSH, TOP_RANKS[mask])
+
+def _generate_rank_product_table() -> dict[int, int]:
+    """Maps the prime product of every 5 to 7 card rank multiset to its best non flush hand value"""
+    table = {}
+    for hand_size in range(5, 8):
+        for indices in combinations_with_replacement(range(13), hand_size):
+            counts = [0] * 13
+            for i in indices:
+                counts[i] += 1
+            if max(counts) > 4: continue
+            table[prod(RANK_PRIMES[i] for i in indices)] = score_rank_counts(counts)
+    return table
+
+RANK_PRODUCT_VALUES = _generate_rank_product_table()
+
+
+def evaluate_hand(cards: list[Card]) -> int:
+    """Returns the packed value of the best 5 card hand within 5 to 7 cards"""
+    return evaluate_codes([card.code for card in cards])
+
+def evaluate_codes(codes: list[int]) -> int:
+    """Same as evaluate_hand, for card codes"""
+    if not 5 <= len(codes) <= 7:
+        raise ValueError(f'Hand must contain 5 to 7 cards, got {len(codes)}')
+    product = 1
+    suit_masks = [0, 0, 0, 0]
+    for code in codes:
+        value = get_rank_value(code)
+        product *= RANK_PRIMES[value - 1]
+        suit_masks[get_suit_index(code)] |= _bit(value)
+
+    for mask in suit_masks:
+        if mask.bit_count() >= 5:
+            return score_flush(mask)
+    return RANK_PRODUCT_VALUES[product]
@@ -0,0 +1,35 @@
+from django.db import models
+
+
+class HandRecord(models.Model):
+    """How a hand started: seats in dealing order with their stacks before the
+    blinds, and the deck order, which is all a replay needs besides the events"""
+    hand_id = models.CharField(max_length=32, primary_key=True)
+    table_id = models.CharField(max_length=64, db_index=True)
+    hand_number = models.PositiveIntegerField()
+    started_at = models.DateTimeField()
+    big_blind = models.PositiveIntegerField()
+    small_blind = models.PositiveIntegerField()
+    seats = models.JSONField()
+    deck = models.JSONField()
+
+    class Meta:
+        app_label = 'holdem'
+        ordering = ['started_at']
+
+
+class HandEvent(models.Model):
+    """Append-only log of everything that happened in a hand, in order"""
+    hand = models.ForeignKey(HandRecord, on_delete=models.CASCADE, related_name='events')
+    sequence = models.PositiveIntegerField()
+    kind = models.CharField(max_length=16)  # hole_cards, bet, call, check, fold, deal or showdown
+    phase = models.CharField(max_length=16)
+    player_id = models.CharField(max_length=64, blank=True)
+    amount = models.IntegerField(null=True)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        app_label = 'holdem'
+        ordering = ['hand', 'sequence']
+        constraints = [models.UniqueConstraint(fields=['hand', 'sequence'], name='unique_hand_event_sequence')]
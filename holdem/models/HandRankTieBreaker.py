@@ -1,6 +1,9 @@
-from ..models.Card import Card
+from collections import Counter
+
+from ..models.Card import Card, get_rank_value
 from ..models.Rank import Rank
-from ..models.Constants import RANK_VALUE_MAP
+from ..models.HandRank import HandRank
+from ..models.Constants import RANK_VALUE_MAP, RANK_BITS, TIE_BREAK_RANKS, HAND_RANK_SHIFT
 
 
 def ranks_to_decimals(ranks: list[Rank]) -> float:
@@ -76,3 +79,33 @@ def get_tie_break_values_straight_flush(hand: list[Card]) -> float:
 
 def get_tie_break_values_royal_flush(hand: list[Card]) -> float:
     return 0.0 # all royal flushes are equal
+
+
+def pack_hand_key(hand_rank: HandRank, tie_break_key: int) -> int:
+    """Combines a hand rank and tie break key into a single comparable integer"""
+    return hand_rank.value << HAND_RANK_SHIFT | tie_break_key
+
+def rank_values_to_key(values: list[int]) -> int:
+    """Packs rank values into a tie break key, first value in the highest 4 bits"""
+    key = 0
+    for pos, value in enumerate(values, 1):
+        key |= value << (RANK_BITS * (TIE_BREAK_RANKS - pos))
+    return key
+
+def _rank_values_by_count(hand: list[Card]) -> list[int]:
+    """Distinct rank values, ordered by how often they occur and then by value, descending"""
+    counts = Counter(get_rank_value(card.code) for card in hand)
+    return sorted(counts, key=lambda value: (counts[value], value), reverse=True)
+
+def get_tie_break_key(hand: list[Card]) -> int:
+    """Tie break key of every hand rank but the straights: the ranks by count, then by value"""
+    return rank_values_to_key(_rank_values_by_count(hand))
+
+def get_tie_break_key_straight(hand: list[Card]) -> int:
+    values = sorted((get_rank_value(card.code) for card in hand), reverse=True)
+    if values[0] == RANK_VALUE_MAP[Rank.ACE] and values[1] == RANK_VALUE_MAP[Rank.FIVE]:
+        return rank_values_to_key(values[1:2])
+    return rank_values_to_key(values[:1])
+
+def get_tie_break_key_royal_flush(hand: list[Card]) -> int:
+    return 0 # all royal flushes are equal
@@ -1,7 +1,8 @@
 from collections import Counter
 from typing import Callable
 
-from ..models.Card import Card
+from ..models.Card import Card, get_suit_index
+from ..models.Constants import SUIT_BITS, STRAIGHT_RANK_MASKS
 from ..models.Rank import Rank
 from ..models.HandRank import HandRank
 from ..models.HandRankTieBreaker import (
@@ -14,16 +15,19 @@ from ..models.HandRankTieBreaker import (
     get_tie_break_values_full_house,
     get_tie_break_values_4_of_a_kind,
     get_tie_break_values_straight_flush,
-    get_tie_break_values_royal_flush
+    get_tie_break_values_royal_flush,
+    get_tie_break_key,
+    get_tie_break_key_straight,
+    get_tie_break_key_royal_flush,
+    pack_hand_key
 )
 
 class HandRanker:
     def __init__(self, hand: list[Card]) -> None:
         if len(hand) != 5:
             raise ValueError(f'Hand must contain 5 cards, got {len(hand)}')
-        cards_repr = [repr(card) for card in hand]
-        if len(set(cards_repr)) != len(hand):
-            raise ValueError(f'Cards passed in are not unique, got {cards_repr}')
+        if len({card.code for card in hand}) != len(hand):
+            raise ValueError(f'Cards passed in are not unique, got {[repr(card) for card in hand]}')
 
         self.hand: list[Card] = hand
         self.is_hand_flush: bool = False
@@ -31,10 +35,14 @@ class HandRanker:
         self.rank_histogram: list[int] = []
         self.highest_rank: Rank = None
         self.hand_rank: HandRank = None
-        self.tie_break_value: float = 0.0
+        self.tie_break_key: int = 0
     
     def calculate_hand_value(self) -> float:
-        return self.hand_rank.value + self.tie_break_value
+        """Float value of the hand, only worked out when asked for, calculate_hand_key is the fast path"""
+        return self.hand_rank.value + self._calculate_tie_break_value()
+
+    def calculate_hand_key(self) -> int:
+        return pack_hand_key(self.hand_rank, self.tie_break_key)
 
     def get_hand_rank(self) -> HandRank:
         return self.hand_rank
@@ -45,31 +53,24 @@ class HandRanker:
         self.rank_histogram = self._generate_rank_histogram()
         self.highest_rank = self.find_highest_rank(self.hand)
         self.hand_rank = self._calculate_hand_rank()
-        self.tie_break_value = self._calculate_tie_break_value()
+        self.tie_break_key = TIE_BREAKER_KEY_MAP[self.hand_rank](self.hand)
  
     def _is_flush(self) -> bool:
-        hand_suits = [card.suit for card in self.hand]
-        return len(set(hand_suits)) == 1
+        return len({get_suit_index(card.code) for card in self.hand}) == 1
 
     def _is_straight(self) -> bool:
-        rank_order = [Rank('a')] + [member for member in Rank]
-        hand_size = len(self.hand)
-        valid_straights = [set(rank_order[i: i + hand_size]) for i in range(len(rank_order) - hand_size + 1)]
-        ranks = [card.rank for card in self.hand]
-        return set(ranks) in valid_straights
+        rank_mask = 0
+        for card in self.hand:
+            rank_mask |= 1 << (card.code >> SUIT_BITS)
+        return rank_mask in STRAIGHT_RANK_MASKS
     
     def _generate_rank_histogram(self) -> list[int]:
-        ranks = [card.rank for card in self.hand]
-        return sorted([count for count in Counter(ranks).values()], reverse=True)
+        rank_indices = [card.code >> SUIT_BITS for card in self.hand]
+        return sorted(Counter(rank_indices).values(), reverse=True)
     
     @staticmethod
     def find_highest_rank(cards: list[Card]) -> Rank:
-        rank_order = [member for member in Rank]
-        ranks = [card.rank for card in cards]
-        max_idx = 0
-        for rank in ranks:
-            max_idx = max(max_idx, rank_order.index(rank))
-        return rank_order[max_idx]
+        return Card.from_code(max(card.code for card in cards)).rank
     
     def _calculate_tie_break_value(self) -> float:
         return TIE_BREAKER_MAP[self.hand_rank](self.hand)
@@ -78,7 +79,8 @@ class HandRanker:
         if not (self.rank_histogram and self.highest_rank):
             raise Exception('Hand stats not initialised')
         
-        if self.is_hand_flush and self.is_hand_straight and self.highest_rank == Rank('a'):
+        is_ace_high = self.highest_rank == Rank('a') and any(card.rank == Rank('k') for card in self.hand)
+        if self.is_hand_flush and self.is_hand_straight and is_ace_high:
             return HandRank.ROYAL_FLUSH
         elif self.is_hand_flush and self.is_hand_straight:
             return HandRank.STRAIGHT_FLUSH
@@ -113,3 +115,18 @@ TIE_BREAKER_MAP: dict[HandRank, HandRankTieBreakerCalculator] = {
     HandRank.STRAIGHT_FLUSH: get_tie_break_values_straight_flush,
     HandRank.ROYAL_FLUSH: get_tie_break_values_royal_flush
 }
+
+HandRankTieBreakerKeyCalculator = Callable[[list[Card]], int]
+
+TIE_BREAKER_KEY_MAP: dict[HandRank, HandRankTieBreakerKeyCalculator] = {
+    HandRank.HIGH_CARD: get_tie_break_key,
+    HandRank.PAIR: get_tie_break_key,
+    HandRank.TWO_PAIRS: get_tie_break_key,
+    HandRank.THREE_OF_A_KIND: get_tie_break_key,
+    HandRank.STRAIGHT: get_tie_break_key_straight,
+    HandRank.FLUSH: get_tie_break_key,
+    HandRank.FULL_HOUSE: get_tie_break_key,
+    HandRank.FOUR_OF_A_KIND: get_tie_break_key,
+    HandRank.STRAIGHT_FLUSH: get_tie_break_key_straight,
+    HandRank.ROYAL_FLUSH: get_tie_break_key_royal_flush
+}
@@ -0,0 +1,46 @@
+from ..models.Card import Card
+from ..models.Constants import SUIT_BITS, SUIT_MASK
+from ..models.HandEvaluator import RANK_PRIMES, RANK_PRODUCT_VALUES, get_hand_rank_from_value, score_flush, score_rank_counts
+from ..models.HandRank import HandRank
+from ..models.Rank import Rank
+from ..models.Suit import Suit
+
+MAX_CARDS = 7
+
+
+class HandState:
+    """One seat's cards as rank counts, per suit rank masks and the prime product of
+    its ranks, updated card by card as the board is dealt. The best hand so far is
+    rescored from these after every street, so reading it is O(1) at any point"""
+    __slots__ = ('rank_counts', 'suit_masks', 'product', 'size', 'value')
+
+    def __init__(self, cards: list[Card] = ()) -> None:
+        self.rank_counts = [0] * len(Rank)
+        self.suit_masks = [0] * len(Suit)  # bit count of a mask is the suit's card count
+        self.product = 1
+        self.size = 0
+        self.value = 0
+        self.add_cards(cards)
+
+    def add_cards(self, cards: list[Card]) -> None:
+        if self.size + len(cards) > MAX_CARDS: raise ValueError(f'Hand cannot hold more than {MAX_CARDS} cards')
+        for card in cards:
+            rank_index = card.code >> SUIT_BITS
+            self.rank_counts[rank_index] += 1
+            self.suit_masks[card.code & SUIT_MASK] |= 1 << rank_index
+            self.product *= RANK_PRIMES[rank_index]
+        self.size += len(cards)
+        self.value = self.score()
+
+    def score(self) -> int:
+        if self.size < 5: return score_rank_counts(self.rank_counts)
+        for mask in self.suit_masks:
+            if mask.bit_count() >= 5: return score_flush(mask)
+        return RANK_PRODUCT_VALUES[self.product]
+
+    def get_value(self) -> int:
+        """Packed value of the best hand so far, equal to evaluate_hand once there are 5 cards"""
+        return self.value
+
+    def get_hand_rank(self) -> HandRank:
+        return get_hand_rank_from_value(self.value)
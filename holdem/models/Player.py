@@ -1,4 +1,5 @@
 from ..models.Card import Card
+from ..models.HandState import HandState
 
 
 class HoldemPlayer:
@@ -6,8 +7,10 @@ class HoldemPlayer:
         if stack <= 0: raise ValueError("Player's stack must be positive")
         self.stack: int = stack
         self.hole_cards: list[Card] = []
+        self.hand_state: HandState = HandState()  # hole cards and the board dealt so far
         self.is_active: bool = False
         self.current_bet: int = 0
+        self.total_contribution: int = 0  # chips put in over every betting round of the hand
         self.id: str = id
 
     def participate(self) -> None:
@@ -16,12 +19,14 @@ class HoldemPlayer:
     def receive_hole_cards(self, cards: list[Card]) -> None:
         if len(cards) != 2: raise ValueError("Player can only receive two cards")
         self.hole_cards = cards
+        self.hand_state = HandState(cards)
 
     def bet(self, bet_amount: int) -> None:
         if bet_amount > self.stack: raise ValueError(f'Cannot bet more than stack {self.stack}')
         if bet_amount <= 0: raise ValueError('Cannot bet 0 or less')
         if not self.is_active == True: raise ValueError('Cannot bet when inactive')
         self.current_bet += bet_amount
+        self.total_contribution += bet_amount
         self.stack -= bet_amount
 
     def fold(self) -> None:
@@ -32,6 +37,12 @@ class HoldemPlayer:
         self.current_bet = 0
         return current_bet
     
+    def is_all_in(self) -> bool:
+        return self.is_active and self.stack == 0
+
+    def can_act(self) -> bool:
+        return self.is_active and self.stack > 0
+
     def is_current_bet_zero(self) -> bool:
         return self.current_bet == 0
     
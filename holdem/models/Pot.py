@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+
+from ..models.Player import HoldemPlayer
+
+
+@dataclass
+class Pot:
+    amount: int
+    eligible_player_ids: list[str]  # in odd chip order
+    winner_ids: list[str] = None
+
+
+def build_pots(players: list[HoldemPlayer]) -> list[Pot]:
+    """Main pot then side pots, layered at each contribution level an active
+    player is all in for. Players are given in odd chip order, folded players'
+    chips go into the pots without making them eligible, and an uncalled top
+    layer ends up as a pot only its bettor can win back"""
+    active_levels = sorted({player.total_contribution for player in players if player.is_active})
+    pots = []
+    previous_level = 0
+    for level in active_levels:
+        amount = sum(min(player.total_contribution, level) - min(player.total_contribution, previous_level) for player in players)
+        eligible = [player.get_id() for player in players if player.is_active and player.total_contribution >= level]
+        pots.append(Pot(amount, eligible))
+        previous_level = level
+    # folded players may have put in more than anyone still in the hand
+    pots[-1].amount += sum(max(player.total_contribution - previous_level, 0) for player in players)
+    return [pot for pot in pots if pot.amount]
+
+def award_pots(pots: list[Pot], hand_strengths: dict[str, int]) -> dict[str, int]:
+    """Chips won by each player, with every pot going to its best eligible hands.
+    Split pots give their odd chips one at a time in the pot's eligibility order"""
+    for pot in pots:
+        best_strength = max(hand_strengths[player_id] for player_id in pot.eligible_player_ids)
+        pot.winner_ids = [player_id for player_id in pot.eligible_player_ids if hand_strengths[player_id] == best_strength]
+    return get_winnings(pots)
+
+def get_winnings(pots: list[Pot]) -> dict[str, int]:
+    """Chips won by each player from pots that have their winners"""
+    winnings: dict[str, int] = {}
+    for pot in pots:
+        share, odd_chips = divmod(pot.amount, len(pot.winner_ids))
+        for i, player_id in enumerate(pot.winner_ids):
+            winnings[player_id] = winnings.get(player_id, 0) + share + (i < odd_chips)
+    return winnings
@@ -0,0 +1,126 @@
+import mmap
+import random
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from ..models.BatchHandEvaluator import evaluate_batch
+from ..models.Card import Card
+from ..models.Constants import DECK_SIZE, SUIT_BITS
+from ..models.Rank import Rank
+
+# The 169 starting hand classes are cells of a 13 x 13 grid of rank indices:
+# pairs on the diagonal, suited hands below it (high rank row) and offsuit above it
+RANKS = len(Rank)
+STARTING_HANDS = RANKS * RANKS
+MAX_OPPONENTS = 9
+BOARD_SIZE = 5
+DEFAULT_ITERATIONS = 20000
+BATCH_SIZE = 5000
+
+# File layout: header, then a little endian uint16 equity (scaled to EQUITY_SCALE)
+# for every starting hand against 1 to max opponents, hand major
+FILE_MAGIC = b'PFEQ'
+FILE_VERSION = 1
+HEADER = struct.Struct('<4sHHI')  # magic, version, max opponents, iterations per hand
+EQUITY_SCALE = 65535
+
+
+def get_starting_hand_index(hole_cards: list[Card]) -> int:
+    first, second = (card.code for card in hole_cards)
+    high, low = max(first, second) >> SUIT_BITS, min(first, second) >> SUIT_BITS
+    is_suited = (first ^ second) & ((1 << SUIT_BITS) - 1) == 0
+    if high == low or is_suited: return high * RANKS + low
+    return low * RANKS + high
+
+def get_starting_hand_codes(index: int) -> tuple[int, int]:
+    """Card codes of one hand of the class, the other hands only differ by suits"""
+    row, column = divmod(index, RANKS)
+    if row == column: return row << SUIT_BITS, row << SUIT_BITS | 1
+    if row > column: return row << SUIT_BITS, column << SUIT_BITS
+    return column << SUIT_BITS, row << SUIT_BITS | 1
+
+def get_starting_hand_name(index: int) -> str:
+    row, column = divmod(index, RANKS)
+    names = [rank.value.upper() for rank in Rank]
+    if row == column: return names[row] * 2
+    if row > column: return f'{names[row]}{names[column]}s'
+    return f'{names[column]}{names[row]}o'
+
+
+def simulate_starting_hand(index: int, iterations: int = DEFAULT_ITERATIONS, seed: int = None) -> list[float]:
+    """Pot share of a starting hand class against 1 to MAX_OPPONENTS random hands.
+    Every sampled deal is used for all opponent counts, the first k opponents facing it"""
+    hole_codes = np.array(get_starting_hand_codes(index), dtype=np.int64)
+    remaining = np.array([code for code in range(DECK_SIZE) if code not in hole_codes], dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    shares = np.zeros(MAX_OPPONENTS)
+    for start in range(0, iterations, BATCH_SIZE):
+        deals = min(BATCH_SIZE, iterations - start)
+        cards = rng.permuted(np.tile(remaining, (deals, 1)), axis=1)[:, :MAX_OPPONENTS * 2 + BOARD_SIZE]
+        board = cards[:, -BOARD_SIZE:]
+        hero_keys, _ = evaluate_batch(np.hstack([np.tile(hole_codes, (deals, 1)), board]))
+        opponent_hands = cards[:, :MAX_OPPONENTS * 2].reshape(deals, MAX_OPPONENTS, 2)
+        opponent_boards = np.broadcast_to(board[:, None, :], (deals, MAX_OPPONENTS, BOARD_SIZE))
+        opponent_keys, _ = evaluate_batch(np.concatenate([opponent_hands, opponent_boards], axis=2).reshape(-1, 7))
+        opponent_keys = opponent_keys.reshape(deals, MAX_OPPONENTS)
+        best_opponent = np.maximum.accumulate(opponent_keys, axis=1)
+        ties = np.cumsum(opponent_keys == hero_keys[:, None], axis=1)
+        hero_keys = hero_keys[:, None]
+        shares += np.where(hero_keys > best_opponent, 1.0, np.where(hero_keys == best_opponent, 1 / (ties + 1), 0.0)).sum(axis=0)
+    return [float(share) for share in shares / iterations]
+
+def build_preflop_equities(iterations: int = DEFAULT_ITERATIONS, seed: int = 0, workers: int = None) -> list[list[float]]:
+    """Equities of every starting hand class, one process pool task per class.
+    Each class gets its own seed from seed, so results do not depend on workers"""
+    seeder = random.Random(seed)
+    seeds = [seeder.getrandbits(32) for _ in range(STARTING_HANDS)]
+    indexes = range(STARTING_HANDS)
+    if workers == 1:
+        return list(map(simulate_starting_hand, indexes, [iterations] * STARTING_HANDS, seeds))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(simulate_starting_hand, indexes, [iterations] * STARTING_HANDS, seeds))
+
+def write_preflop_equity_table(path: str, equities: list[list[float]], iterations: int) -> None:
+    if len(equities) != STARTING_HANDS: raise ValueError(f'Expected {STARTING_HANDS} starting hands, got {len(equities)}')
+    values = np.rint(np.array(equities) * EQUITY_SCALE).astype('<u2')
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(HEADER.pack(FILE_MAGIC, FILE_VERSION, MAX_OPPONENTS, iterations) + values.tobytes())
+
+
+class PreflopEquityTable:
+    """Memory maps a table written by write_preflop_equity_table, lookups read one value
+    out of the mapped file without loading or parsing the rest of it"""
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as file:
+            self.mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_opponents, self.iterations = HEADER.unpack_from(self.mapped)
+        if magic != FILE_MAGIC or version != FILE_VERSION: raise ValueError(f'{path} is not a version {FILE_VERSION} preflop equity table')
+        self.values = np.frombuffer(self.mapped, dtype='<u2', offset=HEADER.size)
+        if len(self.values) != STARTING_HANDS * self.max_opponents: raise ValueError(f'{path} is truncated')
+
+    def close(self) -> None:
+        self.values = None  # the mapping cannot be closed while an array still points into it
+        self.mapped.close()
+
+    def get_class_equity(self, index: int, opponents: int) -> float:
+        if not 1 <= opponents <= self.max_opponents: raise ValueError(f'Opponents must be between 1 and {self.max_opponents}')
+        return int(self.values[index * self.max_opponents + opponents - 1]) / EQUITY_SCALE
+
+    def get_equity(self, hole_cards: list[Card], opponents: int) -> float:
+        """Pot share of hole_cards against opponents random hands, before the flop"""
+        return self.get_class_equity(get_starting_hand_index(hole_cards), opponents)
+
+
+_table: PreflopEquityTable = None
+
+def get_preflop_equity_table() -> PreflopEquityTable:
+    """The table at settings.HOLDEM_PREFLOP_EQUITY_PATH, None until it has been built"""
+    global _table
+    if _table is None and Path(settings.HOLDEM_PREFLOP_EQUITY_PATH).exists():
+        _table = PreflopEquityTable(settings.HOLDEM_PREFLOP_EQUITY_PATH)
+    return _table
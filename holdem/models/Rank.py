@@ -15,18 +15,14 @@ class Rank(Enum):
     KING = 'k'
     ACE = 'a'
 
-    @classmethod
-    def _member_list(cls):
-        return list(cls)
-
     def __lt__(self, other):
         if not isinstance(other, Rank):
             raise NotImplementedError(f'Rank cannot be with {type(other)}')
-        member_list = self.__class__._member_list()
-        return member_list.index(self) < member_list.index(other)
+        return _RANK_ORDER[self] < _RANK_ORDER[other]
     
     def __gt__(self, other):
         if not isinstance(other, Rank):
             raise NotImplementedError(f'Rank cannot be with {type(other)}')
-        member_list = self.__class__._member_list()
-        return member_list.index(self) > member_list.index(other)
+        return _RANK_ORDER[self] > _RANK_ORDER[other]
+
+_RANK_ORDER = {rank: i for i, rank in enumerate(Rank)}
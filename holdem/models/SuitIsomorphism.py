@@ -0,0 +1,15 @@
+from ..models.Constants import SUIT_BITS, SUIT_MASK
+from ..models.Suit import Suit
+
+CanonicalKey = tuple[tuple[int, ...], ...]
+
+
+def get_canonical_key(*groups: list[int]) -> CanonicalKey:
+    """Key shared by every relabelling of suits of the card code groups, e.g. each
+    player's hole cards then the board. Each suit is described by the ranks it has
+    in every group, and sorting those descriptions forgets which suit was which"""
+    suit_ranks = [[0] * len(groups) for _ in Suit]
+    for group_index, codes in enumerate(groups):
+        for code in codes:
+            suit_ranks[code & SUIT_MASK][group_index] |= 1 << (code >> SUIT_BITS)
+    return tuple(sorted(map(tuple, suit_ranks), reverse=True))
@@ -0,0 +1,40 @@
+import json
+
+import msgpack
+
+# websocket subprotocols a client can ask for at connect time, JSON text frames
+# are used when it asks for neither
+JSON_PROTOCOL = 'holdem.json'
+MSGPACK_PROTOCOL = 'holdem.msgpack'
+PROTOCOLS = (MSGPACK_PROTOCOL, JSON_PROTOCOL)
+FRAME_ENCODERS = {'text': json.dumps, 'bytes': msgpack.packb}
+
+
+def negotiate_protocol(requested: list[str]) -> str:
+    """First protocol we support in the client's order of preference, None for plain JSON"""
+    return next((protocol for protocol in requested if protocol in PROTOCOLS), None)
+
+def get_frame_format(protocol: str) -> str:
+    return 'bytes' if protocol == MSGPACK_PROTOCOL else 'text'
+
+def encode_frames(message: dict, formats: set[str] = None) -> dict:
+    """Serializes message once for each wire format its recipients use, every format when
+    they are not known, so a group broadcast hands the same frames to every member"""
+    if formats is None: formats = FRAME_ENCODERS
+    return {frame_format: FRAME_ENCODERS[frame_format](message) for frame_format in formats}
+
+def encode_message(message: dict, protocol: str) -> dict:
+    """Keyword arguments for the consumer's send, for a message going to a single client"""
+    if protocol == MSGPACK_PROTOCOL: return {'bytes_data': msgpack.packb(message)}
+    return {'text_data': json.dumps(message)}
+
+def build_event(handler_type: str, message: dict, formats: set[str] = None) -> dict:
+    """Channel layer event that the consumer's handler_type method relays as is"""
+    return {'type': handler_type, 'frames': encode_frames(message, formats)}
+
+def build_server_message_event(message: str, formats: set[str] = None) -> dict:
+    return build_event('server_message', {'type': 'chat', 'message': message, 'userId': 'Server'}, formats)
+
+def decode_message(text_data: str = None, bytes_data: bytes = None) -> dict:
+    if bytes_data is not None: return msgpack.unpackb(bytes_data)
+    return json.loads(text_data)
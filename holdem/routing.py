@@ -2,5 +2,6 @@ from django.urls import re_path
 from . import consumers
 
 websocket_urlpatterns = [
+    re_path(r'ws/socket-server/(?P<table_id>\w+)/?$', consumers.ChatConsumer.as_asgi()),
     re_path(r'ws/socket-server', consumers.ChatConsumer.as_asgi())
 ]
\ No newline at end of file
@@ -0,0 +1,163 @@
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+from .models.BettingRound import BettingRound
+from .models.Game import HoldemGameState
+from .models.GamePhase import HoldemGamePhase
+from .models.Player import HoldemPlayer
+
+STARTING_STACK = 200
+HANDS_PER_CHUNK = 10000
+
+Action = tuple  # ('bet', amount), ('call',), ('check',) or ('fold',)
+Policy = Callable[[HoldemGameState, HoldemPlayer, random.Random], Action]
+
+
+def get_amount_to_call(game: HoldemGameState, player: HoldemPlayer) -> int:
+    return game.get_betting_round().get_legal_actions().call_amount
+
+def get_raise(game: HoldemGameState, amount: int) -> Action:
+    """A bet of amount moved into the legal raise sizes, or a call when the player cannot raise"""
+    legal_actions = game.get_betting_round().get_legal_actions()
+    if not legal_actions.can_raise(): return ('call',)
+    return ('bet', min(max(amount, legal_actions.min_bet), legal_actions.max_bet))
+
+def passive_policy(game: HoldemGameState, player: HoldemPlayer, rng: random.Random) -> Action:
+    return ('call',)
+
+def aggressive_policy(game: HoldemGameState, player: HoldemPlayer, rng: random.Random) -> Action:
+    if rng.random() < 0.3: return get_raise(game, get_amount_to_call(game, player) + game.big_blind * 2)
+    return ('call',)
+
+def random_policy(game: HoldemGameState, player: HoldemPlayer, rng: random.Random) -> Action:
+    roll = rng.random()
+    to_call = get_amount_to_call(game, player)
+    if roll < 0.15 and to_call: return ('fold',)
+    if roll < 0.3: return get_raise(game, to_call + rng.randint(1, 4) * game.big_blind)
+    return ('call',)
+
+POLICIES: dict[str, Policy] = {
+    'passive': passive_policy,
+    'aggressive': aggressive_policy,
+    'random': random_policy,
+}
+
+FALLBACK_ACTIONS = [('check',), ('call',), ('fold',)]
+
+
+@dataclass
+class SimulationStats:
+    """Totals over simulated hands, mergeable across worker processes"""
+    hands: int = 0
+    showdowns: int = 0
+    uncontested: int = 0
+    split_pots: int = 0
+    rebuys: int = 0
+    conservation_violations: int = 0
+    chips_lost: int = 0
+    total_pot: int = 0
+    largest_pot: int = 0
+    winning_hands: Counter = field(default_factory=Counter)
+    net_chips_by_policy: Counter = field(default_factory=Counter)
+    elapsed: float = 0.0
+
+    def merge(self, other: 'SimulationStats') -> None:
+        self.hands += other.hands
+        self.showdowns += other.showdowns
+        self.uncontested += other.uncontested
+        self.split_pots += other.split_pots
+        self.rebuys += other.rebuys
+        self.conservation_violations += other.conservation_violations
+        self.chips_lost += other.chips_lost
+        self.total_pot += other.total_pot
+        self.largest_pot = max(self.largest_pot, other.largest_pot)
+        self.winning_hands.update(other.winning_hands)
+        self.net_chips_by_policy.update(other.net_chips_by_policy)
+        self.elapsed += other.elapsed
+
+
+def create_table(policy_names: list[str], seed: int = None) -> HoldemGameState:
+    players = [HoldemPlayer(stack=STARTING_STACK, id=f'{name}{seat}') for seat, name in enumerate(policy_names)]
+    return HoldemGameState(players, seed=seed)
+
+def take_action(betting_round: BettingRound, player_id: str, action: Action) -> None:
+    """Applies action, falling back to check, call and finally fold when the engine rejects it"""
+    actions = {
+        'bet': lambda amount: betting_round.bet_action(player_id, amount),
+        'call': lambda: betting_round.call_action(player_id),
+        'check': lambda: betting_round.check_action(player_id),
+        'fold': lambda: betting_round.fold_action(player_id),
+    }
+    for name, *args in [action] + FALLBACK_ACTIONS:
+        if actions[name](*args): return
+    raise RuntimeError(f'{player_id} has no legal action')
+
+def play_hand(game: HoldemGameState, seat_policies: dict[str, str], rng: random.Random, stats: SimulationStats) -> None:
+    """Plays one hand to showdown and checks that no chips were created or destroyed"""
+    stacks_before = {player.get_id(): player.stack for player in game.players if player.stack > 0}
+    game.start_preflop()
+    while game.phase != HoldemGamePhase.SHOWDOWN:
+        betting_round = game.get_betting_round()
+        while not betting_round.is_round_over():
+            player = betting_round.get_active_player()
+            policy = POLICIES[seat_policies[player.get_id()]]
+            take_action(betting_round, player.get_id(), policy(game, player, rng))
+        game.advance_phase()
+
+    # blinds that put everyone all in deal straight to showdown, so the pot is read from the finished hand
+    pot = sum(side_pot.amount for side_pot in game.pots)
+    stacks_after = {player.get_id(): player.stack for player in game.players}
+    chips_lost = sum(stacks_before.values()) - sum(stacks_after.values()) - game.pot
+    if chips_lost:
+        stats.conservation_violations += 1
+        stats.chips_lost += chips_lost
+    for player_id, stack in stacks_before.items():
+        stats.net_chips_by_policy[seat_policies[player_id]] += stacks_after[player_id] - stack
+
+    stats.hands += 1
+    stats.total_pot += pot
+    stats.largest_pot = max(stats.largest_pot, pot)
+    if game.count_active_players() == 1:
+        stats.uncontested += 1
+        return
+    stats.showdowns += 1
+    stats.split_pots += sum(len(side_pot.winner_ids) > 1 for side_pot in game.pots)
+    stats.winning_hands[game.winners[0].hand_state.get_hand_rank().name] += 1
+
+def simulate(hands: int, policy_names: list[str], seed: int = 0) -> SimulationStats:
+    """Plays hands at one table of bots, rebuying everyone once a seat is short of the big blind.
+    Every table is seeded from seed, so results never depend on the global random module"""
+    rng = random.Random(seed)
+    seat_policies = {f'{name}{seat}': name for seat, name in enumerate(policy_names)}
+    stats = SimulationStats()
+    started = time.perf_counter()
+    game = create_table(policy_names, rng.getrandbits(32))
+    while stats.hands < hands:
+        if len(game.players) < len(policy_names) or any(player.stack < game.big_blind for player in game.players):
+            game = create_table(policy_names, rng.getrandbits(32))
+            stats.rebuys += 1
+        play_hand(game, seat_policies, rng, stats)
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+def simulate_parallel(hands: int, policy_names: list[str], seed: int = 0, workers: int = None,
+                      hands_per_chunk: int = HANDS_PER_CHUNK) -> SimulationStats:
+    """simulate split into fixed size chunks with their own seeds, so results only depend on seed"""
+    chunk_sizes = [min(hands_per_chunk, hands - start) for start in range(0, hands, hands_per_chunk)]
+    seeder = random.Random(seed)
+    chunk_seeds = [seeder.getrandbits(32) for _ in chunk_sizes]
+    policy_lists = [policy_names] * len(chunk_sizes)
+    if workers == 1:
+        return _merge_results(map(simulate, chunk_sizes, policy_lists, chunk_seeds))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return _merge_results(executor.map(simulate, chunk_sizes, policy_lists, chunk_seeds))
+
+def _merge_results(results) -> SimulationStats:
+    stats = SimulationStats()
+    for chunk_stats in results:
+        stats.merge(chunk_stats)
+    return stats
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+import msgpack
+
+from .deltas import get_public_state
+from .models.BettingRound import BettingRound
+from .models.Card import CARDS
+from .models.Game import HoldemGameState
+from .models.GamePhase import HoldemGamePhase
+from .models.HandHistory import HandRecord
+from .models.HandState import HandState
+from .models.Player import HoldemPlayer
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 6
+SNAPSHOT_INTERVAL = 5
+
+
+def encode_game(game: HoldemGameState) -> dict:
+    is_betting = game.phase not in (HoldemGamePhase.PREGAME, HoldemGamePhase.SHOWDOWN)
+    betting_round = game.get_betting_round() if is_betting else None
+    return {
+        'phase': game.phase.value,
+        'pot': game.pot,
+        'big_blind': game.big_blind,
+        'small_blind': game.small_blind,
+        # seats in dealing order: id, stack, current bet, chips put in this hand, is active, hole card codes
+        'players': [[player.get_id(), player.stack, player.get_current_bet(), player.total_contribution,
+                     player.is_active, [card.code for card in player.hole_cards]] for player in game.players],
+        'deck': game.deck.get_codes(),
+        'deck_codes': game.deck_codes,
+        'community_cards': [card.code for card in game.community_cards],
+        'winners': [player.get_id() for player in game.winners],
+        # the ring of seats and the highest bet follow from the players, the rest is replayed
+        'betting_round': [betting_round.active_player_index, betting_round.players_to_act, betting_round.min_raise,
+                          betting_round.last_aggressor.get_id() if betting_round.last_aggressor else None,
+                          betting_round.full_raises, betting_round.seen_raises] if betting_round else None,
+    }
+
+def decode_game(data: dict) -> HoldemGameState:
+    players = []
+    for player_id, stack, current_bet, total_contribution, is_active, hole_codes in data['players']:
+        player = HoldemPlayer(stack=max(stack, 1), id=player_id)
+        player.stack = stack  # all in players have an empty stack, which the constructor rejects
+        player.current_bet = current_bet
+        player.total_contribution = total_contribution
+        player.is_active = is_active
+        player.hole_cards = [CARDS[code] for code in hole_codes]
+        players.append(player)
+    game = HoldemGameState(players, big_blind=data['big_blind'], small_blind=data['small_blind'])
+    game.phase = HoldemGamePhase(data['phase'])
+    game.pot = data['pot']
+    if data['deck'] is not None:
+        game.deck.set_codes(data['deck'])
+    game.deck_codes = data['deck_codes']
+    game.community_cards = [CARDS[code] for code in data['community_cards']]
+    for player in players:
+        player.hand_state = HandState(player.hole_cards + game.community_cards)
+    players_by_id = {player.get_id(): player for player in players}
+    game.winners = [players_by_id[player_id] for player_id in data['winners']]
+    if data['betting_round'] is not None:
+        game.initiate_betting_round()
+        betting_round: BettingRound = game.get_betting_round()
+        (betting_round.active_player_index, betting_round.players_to_act, betting_round.min_raise, last_aggressor_id,
+         betting_round.full_raises, betting_round.seen_raises) = data['betting_round']
+        betting_round.last_aggressor = players_by_id.get(last_aggressor_id)
+    return game
+
+def encode_table(table) -> bytes:
+    """Versioned msgpack snapshot of everything needed to carry on a table's game.
+    Connections and timers are not included, clients register their channels again on
+    reconnect and the table actor starts the timers again when it resumes"""
+    recorder = table.recorder
+    return msgpack.packb({
+        'version': SNAPSHOT_VERSION,
+        'table_id': table.table_id,
+        'waiting_room': table.waiting_room,
+        'config': [table.big_blind, table.seats, table.is_matchmade],
+        'sitting_out': sorted(table.sitting_out),
+        'seq': table.stream.seq,
+        'game': encode_game(table.game) if table.game else None,
+        'history': [recorder.hands, recorder.record.hand_id if recorder.record else None, recorder.sequence],
+    })
+
+def decode_table(snapshot: bytes, table) -> None:
+    """Restores a snapshot from encode_table into a fresh table"""
+    data = msgpack.unpackb(snapshot)
+    if data.get('version') != SNAPSHOT_VERSION: raise ValueError(f'Unsupported snapshot version {data.get("version")}')
+    if data['table_id'] != table.table_id: raise ValueError(f'Snapshot is of table {data["table_id"]}')
+    table.waiting_room = data['waiting_room']
+    table.big_blind, table.seats, table.is_matchmade = data['config']
+    table.sitting_out = set(data['sitting_out'])
+    table.game = decode_game(data['game']) if data['game'] else None
+    table.stream.seq = data['seq']
+    table.stream.last_state = get_public_state(table.game) if table.game else {}
+    hands, hand_id, sequence = data['history']
+    table.recorder.hands = hands
+    table.recorder.sequence = sequence
+    # events only need the key of a record that was saved before the restart
+    table.recorder.record = HandRecord(hand_id=hand_id) if hand_id else None
+
+
+class FileSnapshotStore:
+    """One file per table in directory, replaced atomically on every save"""
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get_path(self, table_id: str) -> Path:
+        return self.directory / f'{table_id}.snapshot'
+
+    def save(self, table_id: str, snapshot: bytes) -> None:
+        path = self.get_path(table_id)
+        temporary_path = path.with_suffix('.tmp')
+        temporary_path.write_bytes(snapshot)
+        os.replace(temporary_path, path)
+
+    def load(self, table_id: str) -> bytes:
+        try:
+            return self.get_path(table_id).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, table_id: str) -> None:
+        self.get_path(table_id).unlink(missing_ok=True)
+
+
+async def save_snapshots(registry) -> int:
+    """Snapshots every table that changed since its last snapshot, writing off the event loop"""
+    saved = 0
+    for table in list(registry.tables.values()):
+        if table.revision == table.snapshot_revision: continue
+        revision, snapshot = table.revision, encode_table(table)
+        await asyncio.to_thread(registry.snapshot_store.save, table.table_id, snapshot)
+        table.snapshot_revision = revision
+        saved += 1
+    return saved
+
+async def save_snapshots_periodically(registry, interval: float = SNAPSHOT_INTERVAL) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await save_snapshots(registry)
+        except Exception:
+            logger.exception('Could not save table snapshots')
@@ -0,0 +1,141 @@
+import logging
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .actors import TableActor
+from .deltas import GameStateStream
+from .history import HandRecorder, history_writer
+from .models.Game import HoldemGameState
+from .snapshots import FileSnapshotStore, decode_table
+from .timers import Timer, timer_queue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLE_ID = 'default'
+TABLE_IDLE_TIMEOUT = 60 * 30
+MAX_SEATS = 10
+
+
+def get_group_name(table_id: str) -> str:
+    return f'table_{table_id}'
+
+
+class Table:
+    def __init__(self, table_id: str) -> None:
+        self.table_id: str = table_id
+        self.group_name: str = get_group_name(table_id)
+        self.spectator_group_name: str = f'table_{table_id}_spectators'
+        self.spectators: int = 0
+        self.spectator_timer: Timer = None
+        self.spectator_seq: int = 0  # last sequence number spectators were sent
+        self.waiting_room: dict[str, int] = {}  # user id -> stack they sit down with, in joining order
+        self.big_blind: int = 2
+        self.seats: int = MAX_SEATS
+        self.is_matchmade: bool = False  # seated by the lobby, which hears when seats free up
+        self.moving: dict[str, str] = {}  # user id -> table the lobby moves them to after this hand
+        self.game: HoldemGameState = None
+        self.stream: GameStateStream = GameStateStream()
+        self.player_channels: dict[str, str] = {}
+        self.connections: int = 0
+        self.channel_protocols: dict[str, str] = {}  # channel name -> subprotocol of each connection, None for JSON
+        self.knows_all_channels: bool = True  # a restored table was never told of connections made before it
+        self.last_active: float = time.monotonic()
+        self.actor: TableActor = None
+        self.recorder: HandRecorder = HandRecorder(table_id, history_writer)
+        self.sitting_out: set[str] = set()  # players the table acts for as soon as it is their turn
+        self.timeouts: dict[str, int] = {}  # turn timeouts in a row, by player
+        self.turn_timer: Timer = None
+        self.reconnect_timers: dict[str, Timer] = {}
+        self.revision: int = 0  # commands applied, to tell whether a new snapshot is needed
+        self.is_restored: bool = False  # from a snapshot, its timers start with the actor
+        self.snapshot_revision: int = 0
+
+    def get_actor(self) -> TableActor:
+        if self.actor is None:
+            self.actor = TableActor(self)
+        return self.actor
+
+    def close(self) -> None:
+        if self.actor: self.actor.stop()
+        timer_queue.cancel(self.turn_timer)
+        timer_queue.cancel(self.spectator_timer)
+        for reconnect_timer in self.reconnect_timers.values():
+            timer_queue.cancel(reconnect_timer)
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+    def is_idle(self, now: float, idle_timeout: float) -> bool:
+        return self.connections == 0 and now - self.last_active > idle_timeout
+
+
+class TableRegistry:
+    """Tables by id, kept in least recently used order so idle tables
+    can be evicted from the front without scanning the whole registry.
+    With a snapshot store, tables are restored from their last snapshot the
+    first time they are asked for after a restart"""
+    def __init__(self, idle_timeout: float = TABLE_IDLE_TIMEOUT, snapshot_store: FileSnapshotStore = None) -> None:
+        self.idle_timeout = idle_timeout
+        self.snapshot_store = snapshot_store
+        self.tables: OrderedDict[str, Table] = OrderedDict()
+
+    def get_table(self, table_id: str) -> Table:
+        self.evict_idle_tables()
+        table = self.tables.get(table_id)
+        if table is None:
+            table = self.tables[table_id] = self.restore_table(table_id)
+        else:
+            self.tables.move_to_end(table_id)
+        table.touch()
+        return table
+
+    def restore_table(self, table_id: str) -> Table:
+        table = Table(table_id)
+        snapshot = self.snapshot_store.load(table_id) if self.snapshot_store else None
+        if snapshot is None: return table
+        try:
+            decode_table(snapshot, table)
+        except Exception:
+            logger.exception('Could not restore table snapshot', extra={'table_id': table_id})
+            return Table(table_id)
+        table.is_restored = True
+        table.knows_all_channels = False
+        logger.info('Restored table', extra={'table_id': table_id, 'seq': table.stream.seq})
+        return table
+
+    def find_table(self, table_id: str) -> Table:
+        return self.tables.get(table_id)
+
+    def release_table(self, table_id: str) -> None:
+        """Drops a table another worker owns now, leaving its snapshot for the new owner"""
+        table = self.tables.pop(table_id, None)
+        if table: table.close()
+
+    def evict_idle_tables(self) -> list[str]:
+        now = time.monotonic()
+        evicted = []
+        for _ in range(len(self.tables)):
+            table_id, table = next(iter(self.tables.items()))
+            if now - table.last_active <= self.idle_timeout: break
+            if table.is_idle(now, self.idle_timeout):
+                del self.tables[table_id]
+                table.close()
+                if self.snapshot_store: self.snapshot_store.delete(table_id)
+                evicted.append(table_id)
+            else:
+                # still has connections, check again after a full idle period
+                table.touch()
+                self.tables.move_to_end(table_id)
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+
+def get_snapshot_store() -> FileSnapshotStore:
+    return FileSnapshotStore(settings.HOLDEM_SNAPSHOT_DIR) if settings.HOLDEM_SNAPSHOT_DIR else None
+
+
+table_registry = TableRegistry(snapshot_store=get_snapshot_store())
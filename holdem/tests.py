@@ -1,3 +1,969 @@
-from django.test import TestCase
+import asyncio
+import json
+import random
+import tempfile
 
-# Create your tests here.
+import msgpack
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from io import StringIO
+from collections import Counter
+from itertools import combinations
+
+from channels.layers import InMemoryChannelLayer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from asgiref.sync import async_to_sync
+
+from .models.BatchHandEvaluator import encode_hands, evaluate_batch
+from .models.Card import Card, CARDS
+from .models.BettingRound import BettingRound, LegalActions
+from .models.CardGenerator import generate_cards
+from .models.Deck import Deck
+from .models.EquityCalculator import calculate_equity, calculate_equity_async, calculate_game_equity, equity_cache
+from .models.Game import HoldemGameState
+from .models.HandEvaluator import evaluate_hand, get_hand_rank_from_value
+from .models.HandRank import HandRank
+from .models.HandState import HandState
+from .models.HandRanker import HandRanker, TIE_BREAKER_MAP, TIE_BREAKER_KEY_MAP
+from .models.Player import HoldemPlayer
+from .models.Pot import Pot, award_pots, build_pots
+from .models.PreflopEquity import PreflopEquityTable, get_starting_hand_index, get_starting_hand_name
+from .models.Rank import Rank
+from .models.ResultCache import ResultCache
+from .models.Suit import Suit
+from .models.SuitIsomorphism import get_canonical_key
+from .benchmarks import find_regressions, measure
+from .cluster import TableRouter
+from .history import HandHistoryWriter, HandRecorder, replay_hand
+from .matchmaking import MatchPool, Matchmaker, Seating
+from .models.HandHistory import HandRecord
+from .metrics import MetricsRegistry, message_latency, group_send_latency
+from .deltas import GameStateStream, get_public_state
+from .models.GamePhase import HoldemGamePhase
+from .protocol import MSGPACK_PROTOCOL
+from .routing import websocket_urlpatterns
+from .simulation import SimulationStats, play_hand, simulate, simulate_parallel
+from .snapshots import FileSnapshotStore, SNAPSHOT_VERSION, save_snapshots
+from .tables import Table, TableRegistry, table_registry
+from .timers import TimerQueue
+
+
+def rank_with_hand_ranker(cards):
+    best_value, best_rank = 0.0, None
+    for hand in combinations(cards, 5):
+        ranker = HandRanker(list(hand))
+        ranker.update_hand_stats()
+        value = ranker.calculate_hand_value()
+        if value > best_value:
+            best_value, best_rank = value, ranker.get_hand_rank()
+    return best_value, best_rank
+
+
+def get_temp_dir(test: TestCase) -> str:
+    """A directory that is removed once test has finished"""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    return directory.name
+
+
+# hand history is written on another connection, outside of TestCase's transaction
+without_hand_history = override_settings(HOLDEM_HAND_HISTORY=False)
+
+
+class CardEncodingTest(TestCase):
+    def test_codes_round_trip(self):
+        for code, card in enumerate(CARDS):
+            self.assertEqual(card.code, code)
+            self.assertIs(Card.from_code(code), card)
+            self.assertEqual(Card(card.rank, card.suit), card)
+            self.assertIs(generate_cards([repr(card)])[0], card)
+
+    def test_deck_draws_interned_cards(self):
+        deck = Deck()
+        deck.shuffle()
+        drawn = [deck.draw_card() for _ in range(deck.size())]
+        self.assertEqual(sorted(card.code for card in drawn), list(range(52)))
+        self.assertTrue(all(card is CARDS[card.code] for card in drawn))
+
+    def test_seeded_decks_reshuffle_in_place_reproducibly(self):
+        deck, same_seed = Deck(seed=7), Deck(seed=7)
+        deck.shuffle()
+        same_seed.shuffle()
+        self.assertEqual(deck.get_codes(), same_seed.get_codes())
+        first_hand = [deck.draw_code() for _ in range(9)]
+        self.assertEqual(first_hand, same_seed.get_codes()[:-10:-1])
+        deck.set_codes([1, 2, 3])
+        deck.shuffle()
+        self.assertEqual(deck.size(), 52)
+        self.assertEqual(sorted(deck.get_codes()), list(range(52)))
+        self.assertNotEqual(deck.get_codes(), same_seed.get_codes())
+
+    def test_comparison_uses_rank_only(self):
+        self.assertLess(Card(Rank.TWO, Suit.SPADE), Card(Rank.THREE, Suit.CLUB))
+        self.assertFalse(Card(Rank.ACE, Suit.SPADE) < Card(Rank.ACE, Suit.CLUB))
+        self.assertGreater(Rank.ACE, Rank.KING)
+
+
+class HandEvaluatorTest(TestCase):
+    HANDS_BY_RANK = {
+        HandRank.ROYAL_FLUSH: [['as', 'ks', 'qs', 'js', 'ts', '2c', '3d'], ['ah', 'kh', 'qh', 'jh', 'th', '9h', '8h']],
+        HandRank.STRAIGHT_FLUSH: [['9d', '8d', '7d', '6d', '5d', 'ad', 'ac'], ['5c', '4c', '3c', '2c', 'ac', 'kh', 'kd']],
+        HandRank.FOUR_OF_A_KIND: [['7s', '7h', '7d', '7c', 'ks', 'kh', 'kd'], ['7s', '7h', '7d', '7c', 'as', '2h', '3d']],
+        HandRank.FULL_HOUSE: [['qs', 'qh', 'qd', '4c', '4s', '4h', '2d'], ['qs', 'qh', 'qd', '4c', '4s', 'jh', 'jd']],
+        HandRank.FLUSH: [['as', '9s', '7s', '4s', '2s', 'ks', 'kh'], ['as', '9s', '7s', '4s', '3s', 'kd', 'kh']],
+        HandRank.STRAIGHT: [['ah', '2d', '3s', '4c', '5h', '5d', '5s'], ['6h', '2d', '3s', '4c', '5h', 'ad', 'kd']],
+        HandRank.THREE_OF_A_KIND: [['8s', '8h', '8d', 'ac', 'js', '3h', '2d'], ['8s', '8h', '8d', 'ac', 'qs', '3h', '2d']],
+        HandRank.TWO_PAIRS: [['ts', 'th', '6d', '6c', '3s', '3h', '2d'], ['ts', 'th', '6d', '6c', '3s', '3h', '4d']],
+        HandRank.PAIR: [['js', 'jh', '9d', '7c', '5s', '3h', '2d'], ['js', 'jh', '9d', '7c', '6s', '3h', '2d']],
+        HandRank.HIGH_CARD: [['ks', 'jh', '9d', '7c', '5s', '3h', '2d'], ['ks', 'jh', '9d', '7c', '6s', '3h', '2d']],
+    }
+
+    def test_each_hand_rank_matches_hand_ranker(self):
+        for hand_rank, hands in self.HANDS_BY_RANK.items():
+            for raw_cards in hands:
+                cards = generate_cards(raw_cards)
+                value = evaluate_hand(cards)
+                self.assertEqual(get_hand_rank_from_value(value), hand_rank, raw_cards)
+                self.assertEqual(rank_with_hand_ranker(cards)[1], hand_rank, raw_cards)
+
+    def test_ordering_matches_hand_ranker(self):
+        hands = [generate_cards(raw) for hands in self.HANDS_BY_RANK.values() for raw in hands]
+        rng = random.Random(7)
+        for _ in range(300):
+            deck = Deck().get_cards()
+            hands.append(rng.sample(deck, rng.randint(5, 7)))
+
+        ranker_values = [rank_with_hand_ranker(hand) for hand in hands]
+        evaluator_values = [evaluate_hand(hand) for hand in hands]
+        for (ranker_a, rank_a), value_a in zip(ranker_values, evaluator_values):
+            self.assertEqual(get_hand_rank_from_value(value_a), rank_a)
+            for (ranker_b, _), value_b in zip(ranker_values, evaluator_values):
+                self.assertEqual(ranker_a < ranker_b, value_a < value_b)
+                self.assertEqual(ranker_a == ranker_b, value_a == value_b)
+
+    def test_determine_winners_splits_board_play(self):
+        players = [HoldemPlayer(stack=100, id=str(i)) for i in range(3)]
+        game = HoldemGameState(players)
+        for player, hole_cards in zip(players, [['2c', '3d'], ['2h', '3s'], ['4c', '4d']]):
+            player.participate()
+            player.receive_hole_cards(generate_cards(hole_cards))
+        game.deal_community_cards(generate_cards(['as', 'ks', 'qs', 'js', 'ts']))
+        game.phase = game.phase.SHOWDOWN
+        self.assertEqual(len(game.determine_winners()), 3)
+
+    def test_hand_state_tracks_best_hand_by_street(self):
+        state = HandState(generate_cards(['9h', '9d']))
+        self.assertEqual(state.get_hand_rank(), HandRank.PAIR)
+        for street, hand_rank in ((['9s', 'th', 'jh'], HandRank.THREE_OF_A_KIND), (['qh'], HandRank.THREE_OF_A_KIND), (['kh'], HandRank.STRAIGHT_FLUSH)):
+            state.add_cards(generate_cards(street))
+            self.assertEqual(state.get_hand_rank(), hand_rank)
+        self.assertEqual(state.get_value(), evaluate_hand(generate_cards(['9h', '9d', '9s', 'th', 'jh', 'qh', 'kh'])))
+
+
+class HandKeyTest(TestCase):
+    def test_tie_break_keys_order_like_tie_break_values(self):
+        rng = random.Random(11)
+        deck = Deck().get_cards()
+        rankers_by_hand_rank = {hand_rank: [] for hand_rank in HandRank}
+        for raw_hands in HandEvaluatorTest.HANDS_BY_RANK.values():
+            for raw_cards in raw_hands:
+                cards = generate_cards(raw_cards)
+                for hand in combinations(cards, 5):
+                    ranker = HandRanker(list(hand))
+                    ranker.update_hand_stats()
+                    rankers_by_hand_rank[ranker.get_hand_rank()].append(ranker)
+        for _ in range(1000):
+            ranker = HandRanker(rng.sample(deck, 5))
+            ranker.update_hand_stats()
+            rankers_by_hand_rank[ranker.get_hand_rank()].append(ranker)
+
+        for hand_rank, rankers in rankers_by_hand_rank.items():
+            self.assertTrue(rankers, hand_rank)
+            values = [TIE_BREAKER_MAP[hand_rank](ranker.hand) for ranker in rankers]
+            keys = [TIE_BREAKER_KEY_MAP[hand_rank](ranker.hand) for ranker in rankers]
+            for value_a, key_a in zip(values, keys):
+                for value_b, key_b in zip(values, keys):
+                    self.assertEqual(value_a < value_b, key_a < key_b, hand_rank)
+                    self.assertEqual(value_a == value_b, key_a == key_b, hand_rank)
+
+    def test_hand_key_matches_evaluator(self):
+        rng = random.Random(13)
+        deck = Deck().get_cards()
+        for _ in range(500):
+            hand = rng.sample(deck, 5)
+            ranker = HandRanker(hand)
+            ranker.update_hand_stats()
+            self.assertEqual(ranker.calculate_hand_key(), evaluate_hand(hand))
+
+
+class BatchHandEvaluatorTest(TestCase):
+    def test_matches_hand_ranker(self):
+        rng = random.Random(17)
+        deck = Deck().get_cards()
+        fixtures = [generate_cards(raw) for hands in HandEvaluatorTest.HANDS_BY_RANK.values() for raw in hands]
+        for hand_size in (5, 7):
+            hands = [hand[:hand_size] for hand in fixtures] + [rng.sample(deck, hand_size) for _ in range(300)]
+            keys, hand_ranks = evaluate_batch(encode_hands(hands))
+            for hand, key, hand_rank in zip(hands, keys, hand_ranks):
+                rankers = [HandRanker(list(five_cards)) for five_cards in combinations(hand, 5)]
+                for ranker in rankers:
+                    ranker.update_hand_stats()
+                best = max(rankers, key=lambda ranker: ranker.calculate_hand_key())
+                self.assertEqual(key, best.calculate_hand_key(), hand)
+                self.assertEqual(HandRank(hand_rank), best.get_hand_rank(), hand)
+
+    def test_rejects_bad_shape(self):
+        with self.assertRaises(ValueError):
+            evaluate_batch(encode_hands([Deck().get_cards()[:4]]))
+
+
+class EquityCalculatorTest(TestCase):
+    def test_river_is_exhaustive(self):
+        hands = [generate_cards(['as', 'ah']), generate_cards(['ks', 'kh'])]
+        board = generate_cards(['2c', '7d', '9h', 'kd'])
+        equities = calculate_equity(hands, board)
+        self.assertTrue(all(equity.is_exhaustive for equity in equities))
+        self.assertEqual(equities[0].runouts, 44)
+        self.assertAlmostEqual(equities[0].win, 2 / 44)
+        self.assertEqual(equities[0].margin, 0.0)
+
+    def test_preflop_is_sampled_with_confidence_interval(self):
+        hands = [generate_cards(['as', 'ah']), generate_cards(['ks', 'kh'])]
+        equities = calculate_equity(hands, iterations=3000, seed=3)
+        self.assertFalse(equities[0].is_exhaustive)
+        low, high = equities[0].get_confidence_interval()
+        self.assertLess(low, 0.82)
+        self.assertGreater(high, 0.82)
+        self.assertAlmostEqual(equities[0].equity + equities[1].equity, 1.0)
+
+    def test_async_merges_worker_tallies(self):
+        hands = [generate_cards(['as', 'ah']), generate_cards(['ks', 'kh'])]
+        with ThreadPoolExecutor(2) as executor:
+            equities = asyncio.run(calculate_equity_async(hands, iterations=1001, seed=3, workers=2, executor=executor))
+        self.assertEqual(equities[0].runouts, 1001)
+
+    def test_game_equity_ignores_folded_players(self):
+        players = [HoldemPlayer(stack=100, id=str(i)) for i in range(3)]
+        game = HoldemGameState(players)
+        for player in players:
+            player.participate()
+        game.start_preflop()
+        players[0].fold()
+        equities = calculate_game_equity(game, iterations=200, seed=1)
+        self.assertEqual(set(equities), {players[1].get_id(), players[2].get_id()})
+
+    def test_suit_relabelled_spots_share_cached_result(self):
+        equity_cache.clear()
+        hands = [generate_cards(['as', 'ah']), generate_cards(['ks', 'kh'])]
+        relabelled = [generate_cards(['ad', 'ac']), generate_cards(['kd', 'kc'])]
+        equities = calculate_equity(hands, generate_cards(['2c', '7d', '9h', 'kd']))
+        hits = equity_cache.hits
+        self.assertEqual(calculate_equity(relabelled, generate_cards(['2s', '7h', '9c', 'kh'])), equities)
+        self.assertEqual(equity_cache.hits, hits + 1)
+        calculate_equity(relabelled, generate_cards(['2s', '7h', '9c', 'ks']))
+        self.assertEqual(equity_cache.hits, hits + 1)
+
+
+class SuitIsomorphismTest(TestCase):
+    def test_canonical_key_ignores_suit_names_and_order_within_groups(self):
+        codes = lambda names: [card.code for card in generate_cards(names)]
+        key = get_canonical_key(codes(['as', 'kh']), codes(['2s', '3h', '4d']))
+        self.assertEqual(key, get_canonical_key(codes(['kc', 'ad']), codes(['2d', '4s', '3c'])))
+        self.assertNotEqual(key, get_canonical_key(codes(['as', 'ks']), codes(['2s', '3h', '4d'])))
+        self.assertNotEqual(key, get_canonical_key(codes(['2s', '3h', '4d']), codes(['as', 'kh'])))
+
+    def test_result_cache_evicts_least_recently_used(self):
+        cache = ResultCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get_or_compute('c', lambda: 0), 3)
+        self.assertEqual(cache.get_stats(), {'size': 2, 'max_size': 2, 'hits': 2, 'misses': 1, 'evictions': 1, 'hit_rate': 2 / 3})
+
+
+class TableRegistryTest(TestCase):
+    def test_evicts_idle_tables_without_connections(self):
+        registry = TableRegistry()
+        idle = registry.get_table('idle')
+        busy = registry.get_table('busy')
+        busy.connections = 1
+        registry.idle_timeout = -1
+        self.assertEqual(registry.evict_idle_tables(), ['idle'])
+        self.assertIs(registry.get_table('busy'), busy)
+        self.assertIsNot(registry.get_table('idle'), idle)
+
+    async def test_tables_have_separate_waiting_rooms(self):
+        application = URLRouter(websocket_urlpatterns)
+        first = WebsocketCommunicator(application, '/ws/socket-server/first')
+        second = WebsocketCommunicator(application, '/ws/socket-server/second')
+        for communicator in (first, second):
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+        await first.send_json_to({'type': 'player_join', 'userId': 'alice', 'message': ''})
+        self.assertEqual(await first.receive_json_from(), {'type': 'waiting_room_update', 'joined': ['alice'], 'size': 1, 'userId': 'Server'})
+        self.assertTrue(await second.receive_nothing())
+        self.assertEqual(list(table_registry.find_table('first').waiting_room), ['alice'])
+        self.assertEqual(table_registry.find_table('second').waiting_room, {})
+
+        for communicator in (first, second):
+            await communicator.disconnect()
+
+
+@without_hand_history
+class TableActorTest(TestCase):
+    async def test_concurrent_commands_are_applied_in_order(self):
+        table = Table('actor')
+        actor = table.get_actor()
+        user_ids = [f'user{i}' for i in range(10)]
+        results = await asyncio.gather(*[actor.submit('player_join', user_id=user_id) for user_id in user_ids + user_ids[:5]])
+        self.assertEqual(list(table.waiting_room), user_ids)
+        self.assertEqual(results, [True] * 10 + [False] * 5)
+        self.assertEqual(actor.get_stats()['processed'], 15)
+
+        self.assertTrue(await actor.submit('start_game'))
+        self.assertEqual(len(table.game.players), 10)
+        self.assertEqual(table.waiting_room, {})
+        actor.stop()
+
+
+async def receive_all(communicator):
+    messages = []
+    while not await communicator.receive_nothing(timeout=0.05):
+        messages.append(await communicator.receive_json_from())
+    return messages
+
+
+@without_hand_history
+class GameProtocolTest(TestCase):
+    def test_deltas_only_hold_changes(self):
+        players = [HoldemPlayer(stack=100, id=str(i)) for i in range(3)]
+        game = HoldemGameState(players)
+        game.start_preflop()
+        stream = GameStateStream()
+        first = stream.next_delta(game)
+        self.assertEqual(first['seq'], 1)
+        self.assertEqual(first['phase'], 'preflop')
+        self.assertEqual(first['legalActions'], {'call': 2, 'minBet': 4, 'maxBet': 100})
+
+        active_id = game.get_betting_round().get_active_player().get_id()
+        game.get_betting_round().call_action(active_id)
+        delta = stream.next_delta(game)
+        self.assertEqual(delta['seq'], 2)
+        self.assertEqual(delta['bets'], {active_id: 2})
+        self.assertNotIn('phase', delta)
+        self.assertNotIn('communityCards', delta)
+
+        game.start_flop()
+        delta = stream.next_delta(game)
+        self.assertEqual(len(delta['newCards']), 3)
+        self.assertEqual(stream.snapshot(game)['communityCards'], delta['newCards'])
+
+    async def test_hand_is_played_over_websockets(self):
+        application = URLRouter(websocket_urlpatterns)
+        clients = {}
+        for user_id in ('alice', 'bob'):
+            clients[user_id] = WebsocketCommunicator(application, '/ws/socket-server/protocol')
+            await clients[user_id].connect()
+            await clients[user_id].send_json_to({'type': 'server_message', 'userId': user_id, 'message': ''})
+            await clients[user_id].send_json_to({'type': 'player_join', 'userId': user_id, 'message': ''})
+            # consumers run concurrently, so wait for the join before the next player or start_game
+            while user_id not in (await clients[user_id].receive_json_from(timeout=5)).get('joined', []):
+                pass
+        await clients['alice'].send_json_to({'type': 'start_game', 'userId': 'alice', 'message': ''})
+
+        table = table_registry.find_table('protocol')
+        for user_id, client in clients.items():
+            messages = await receive_all(client)
+            private_updates = [message for message in messages if message['type'] == 'private_update']
+            player = next(player for player in table.game.players if player.get_id() == user_id)
+            self.assertEqual([update['holeCards'] for update in private_updates], [[repr(card) for card in player.hole_cards]])
+            self.assertEqual([message['seq'] for message in messages if message['type'] == 'state_delta'], [1])
+
+        # connections can only act as the user id they first sent
+        intruder = WebsocketCommunicator(application, '/ws/socket-server/protocol')
+        await intruder.connect()
+        await intruder.send_json_to({'type': 'snapshot', 'userId': 'alice'})
+        self.assertEqual(await intruder.receive_json_from(timeout=5), {'type': 'chat', 'message': 'alice is connected elsewhere', 'userId': 'Server'})
+        await intruder.disconnect()
+        await clients['bob'].send_json_to({'type': 'fold', 'userId': 'alice'})
+        self.assertIn({'type': 'chat', 'message': 'This connection belongs to bob', 'userId': 'Server'}, await receive_all(clients['bob']))
+        self.assertEqual(table.game.count_active_players(), 2)
+
+        while table.game.phase != HoldemGamePhase.SHOWDOWN:
+            active_id = table.game.get_betting_round().get_active_player().get_id()
+            await clients[active_id].send_json_to({'type': 'call', 'userId': active_id})
+            deltas = [message for message in await receive_all(clients['bob']) if message['type'] == 'state_delta']
+            self.assertEqual(len(deltas), 1)
+
+        await clients['bob'].send_json_to({'type': 'snapshot', 'userId': 'bob'})
+        snapshot = await clients['bob'].receive_json_from()
+        self.assertEqual(snapshot['phase'], 'showdown')
+        self.assertEqual(snapshot['seq'], table.stream.seq)
+        self.assertTrue(snapshot['winners'])
+        self.assertEqual(sum(snapshot['stacks'].values()), 200)
+        for client in clients.values():
+            await client.disconnect()
+
+
+class TableRouterTest(TestCase):
+    async def test_commands_are_forwarded_to_the_owning_worker(self):
+        channel_layer = InMemoryChannelLayer()
+        shared_cache = LocMemCache('table-router-test', {})
+        first = TableRouter(TableRegistry(), channel_layer, shared_cache)
+        second = TableRouter(TableRegistry(), channel_layer, shared_cache)
+
+        self.assertTrue(await first.submit('shared', 'player_join', user_id='alice'))
+        self.assertTrue(await second.submit('shared', 'player_join', user_id='bob'))
+        self.assertFalse(await second.submit('shared', 'player_join', user_id='alice'))
+        self.assertEqual(await second.submit('shared', 'get_waiting_room'), ['alice', 'bob'])
+        self.assertEqual(list(first.registry.find_table('shared').waiting_room), ['alice', 'bob'])
+        self.assertIsNone(second.registry.find_table('shared'))
+
+        self.assertTrue(await second.submit('other', 'player_join', user_id='carol'))
+        self.assertEqual(list(second.registry.find_table('other').waiting_room), ['carol'])
+        for router in (first, second):
+            router.stop()
+
+    async def test_only_the_owner_tracks_connections_and_snapshots(self):
+        channel_layer = InMemoryChannelLayer()
+        shared_cache = LocMemCache('table-router-owner-test', {})
+        store = FileSnapshotStore(get_temp_dir(self))
+        first = TableRouter(TableRegistry(snapshot_store=store), channel_layer, shared_cache)
+        second = TableRouter(TableRegistry(snapshot_store=store), channel_layer, shared_cache)
+
+        await first.submit('shared', 'player_join', user_id='alice')
+        self.assertEqual(await second.submit('shared', 'connect'), 1)
+        table = first.registry.find_table('shared')
+        self.assertEqual(table.connections, 1)
+        first.registry.idle_timeout = -1
+        self.assertEqual(first.registry.evict_idle_tables(), [])
+        self.assertIsNone(second.registry.find_table('shared'))
+
+        await save_snapshots(first.registry)
+        await shared_cache.aset('table_owner:shared', second.worker_channel)
+        self.assertEqual(await first.get_owner('shared'), second.worker_channel)
+        self.assertIsNone(first.registry.find_table('shared'))
+        self.assertIsNotNone(store.load('shared'))  # kept for the new owner to restore from
+        self.assertEqual(list((await second.submit('shared', 'get_waiting_room'))), ['alice'])
+        for router in (first, second):
+            router.stop()
+
+
+@without_hand_history
+class LoadTestCommandTest(TestCase):
+    def test_reports_throughput_and_latency(self):
+        out = StringIO()
+        call_command('loadtest', clients=4, players_per_table=2, chats=2, hands=1, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(report['hands'], 2)
+        self.assertGreater(report['messages_per_sec'], 0)
+        self.assertIsNotNone(report['chat_rtt_p99_ms'])
+        self.assertIsNotNone(report['action_rtt_p99_ms'])
+
+
+class BenchmarkTest(TestCase):
+    def test_regressions_past_threshold_fail_the_comparison(self):
+        out = StringIO()
+        call_command('benchmark', filter='generate_cards', min_time=0.01, stdout=out)
+        self.assertIn('generate_cards', out.getvalue())
+
+        result = measure(lambda: None, min_run_time=0.01)
+        self.assertGreater(result['ops_per_sec'], 0)
+        baseline = {'case': {'ops_per_sec': 100.0}}
+        self.assertEqual(find_regressions(baseline, {'case': {'ops_per_sec': 95.0}}, 10), [])
+        self.assertEqual(len(find_regressions(baseline, {'case': {'ops_per_sec': 85.0}}, 10)), 1)
+
+
+class SimulationTest(TestCase):
+    def test_simulation_is_deterministic_for_a_seed(self):
+        policies = ['passive', 'aggressive', 'random']
+        first = simulate_parallel(300, policies, seed=7, workers=1, hands_per_chunk=100)
+        second = simulate_parallel(300, policies, seed=7, workers=1, hands_per_chunk=100)
+        self.assertEqual(first.hands, 300)
+        self.assertEqual(first.showdowns + first.uncontested, 300)
+        self.assertEqual(first.winning_hands, second.winning_hands)
+        self.assertEqual(first.net_chips_by_policy, second.net_chips_by_policy)
+
+    def test_seeded_games_repeat_without_the_global_random_module(self):
+        state = random.getstate()
+        games = [HoldemGameState([HoldemPlayer(stack=100, id=str(i)) for i in range(6)], seed=3) for _ in range(2)]
+        for game in games:
+            game.start_preflop()
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(*[[player.get_id() for player in game.players] for game in games])
+        self.assertEqual(games[0].deck_codes, games[1].deck_codes)
+
+    def test_hands_that_deal_straight_to_showdown_are_counted(self):
+        game = HoldemGameState([HoldemPlayer(stack=1, id='passive0'), HoldemPlayer(stack=2, id='passive1')], seed=1)
+        stats = SimulationStats()
+        play_hand(game, {'passive0': 'passive', 'passive1': 'passive'}, random.Random(1), stats)
+        self.assertEqual(stats.hands, 1)
+        self.assertEqual(stats.total_pot, 2)
+        self.assertEqual(stats.conservation_violations, 0)
+
+    def test_passive_bots_only_move_chips_through_showdowns(self):
+        stats = simulate(200, ['passive', 'passive'], seed=1)
+        self.assertEqual(stats.hands, 200)
+        self.assertEqual(stats.uncontested, 0)
+        self.assertEqual(sum(stats.net_chips_by_policy.values()), -stats.chips_lost)
+
+
+class MetricsTest(TestCase):
+    def test_histograms_render_cumulative_buckets(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram('test_seconds', 'Test latency', buckets=(0.1, 1.0))
+        latency.observe(0.05, type='bet')
+        latency.observe(0.1, type='bet')
+        latency.observe(5, type='bet')
+        rendered = registry.render()
+        self.assertIn('# TYPE test_seconds histogram', rendered)
+        self.assertIn('test_seconds_bucket{type="bet",le="0.1"} 2', rendered)
+        self.assertIn('test_seconds_bucket{type="bet",le="1.0"} 2', rendered)
+        self.assertIn('test_seconds_bucket{type="bet",le="+Inf"} 3', rendered)
+        self.assertIn('test_seconds_count{type="bet"} 3', rendered)
+        with self.assertRaises(ValueError):
+            registry.counter('test_seconds', 'Duplicate')
+
+    async def test_messages_are_timed_and_exposed(self):
+        handled_before = message_latency.get_count(type='message')
+        sent_before = group_send_latency.get_count(event='chat_message')
+        client = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/socket-server/metrics')
+        await client.connect()
+        await client.send_json_to({'type': 'message', 'userId': 'alice', 'message': 'hi'})
+        await client.receive_json_from()
+        await client.disconnect()
+        self.assertEqual(message_latency.get_count(type='message'), handled_before + 1)
+        self.assertEqual(group_send_latency.get_count(event='chat_message'), sent_before + 1)
+
+    def test_metrics_endpoint(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE holdem_message_handling_seconds histogram', response.content)
+
+
+class BinaryProtocolTest(TestCase):
+    async def test_clients_can_opt_into_msgpack_frames(self):
+        application = URLRouter(websocket_urlpatterns)
+        binary_client = WebsocketCommunicator(application, '/ws/socket-server/binary', subprotocols=[MSGPACK_PROTOCOL])
+        json_client = WebsocketCommunicator(application, '/ws/socket-server/binary')
+        connected, subprotocol = await binary_client.connect()
+        self.assertEqual(subprotocol, MSGPACK_PROTOCOL)
+        await json_client.connect()
+
+        await binary_client.send_to(bytes_data=msgpack.packb({'type': 'message', 'userId': 'alice', 'message': 'hi'}))
+        expected = {'type': 'chat', 'message': 'hi', 'userId': 'alice'}
+        self.assertEqual(msgpack.unpackb(await binary_client.receive_from()), expected)
+        self.assertEqual(json.loads(await json_client.receive_from()), expected)
+
+        await binary_client.send_to(bytes_data=msgpack.packb({'type': 'snapshot', 'userId': 'alice'}))
+        self.assertEqual(msgpack.unpackb(await binary_client.receive_from()), {'type': 'snapshot'})
+        await binary_client.disconnect()
+        await json_client.disconnect()
+
+    async def test_events_are_only_encoded_for_the_formats_in_use(self):
+        application = URLRouter(websocket_urlpatterns)
+        json_client = WebsocketCommunicator(application, '/ws/socket-server/textonly')
+        await json_client.connect()
+        actor = table_registry.get_table('textonly').get_actor()
+        self.assertEqual(actor.get_frame_formats(), {'text'})
+        binary_client = WebsocketCommunicator(application, '/ws/socket-server/textonly', subprotocols=[MSGPACK_PROTOCOL])
+        await binary_client.connect()
+        self.assertEqual(actor.get_frame_formats(), {'text', 'bytes'})
+        binary_channel = next(channel for channel, protocol in actor.table.channel_protocols.items() if protocol)
+        self.assertEqual(actor.get_frame_formats(binary_channel), {'bytes'})
+        self.assertIsNone(actor.get_frame_formats('unknown'))
+        await binary_client.disconnect()
+        self.assertEqual(actor.get_frame_formats(), {'text'})
+        self.assertEqual((await json_client.receive_json_from())['message'], 'None has disconnected!')
+
+        await json_client.send_json_to({'type': 'bet', 'userId': 'alice', 'amount': 'lots'})
+        self.assertEqual(await json_client.receive_json_from(),
+                         {'type': 'chat', 'message': 'Bet amount must be a number', 'userId': 'Server'})
+        await json_client.disconnect()
+
+
+class HandHistoryTest(TransactionTestCase):
+    def test_recorded_hands_replay_to_the_same_result(self):
+        writer = HandHistoryWriter(batch_size=5)
+        table = Table('history')
+        table.recorder = HandRecorder('history', writer)
+        table.waiting_room = dict.fromkeys(['alice', 'bob', 'carol'], 100)
+
+        async def play_hands():
+            actor = table.get_actor()
+            for _ in range(2):
+                await actor.submit('start_game')
+                await actor.submit('bet', user_id=table.game.get_betting_round().get_active_player().get_id(), amount=6)
+                while table.game.phase != HoldemGamePhase.SHOWDOWN:
+                    await actor.submit('call', user_id=table.game.get_betting_round().get_active_player().get_id())
+            actor.stop()
+        async_to_sync(play_hands)()
+        writer.flush()
+
+        records = list(HandRecord.objects.filter(table_id='history').order_by('hand_number'))
+        self.assertEqual([record.hand_number for record in records], [1, 2])
+        self.assertEqual(writer.written, sum(record.events.count() for record in records) + 2)
+        replayed = replay_hand(records[-1].hand_id)
+        self.assertEqual(replayed.phase, HoldemGamePhase.SHOWDOWN)
+        self.assertEqual({player.get_id(): player.stack for player in replayed.players},
+                         {player.get_id(): player.stack for player in table.game.players})
+        self.assertEqual(replayed.get_community_cards(), table.game.get_community_cards())
+        kinds = [event.kind for event in records[-1].events.all()]
+        self.assertEqual(kinds[:3], ['hole_cards'] * 3)
+        self.assertEqual(kinds.count('deal'), 3)
+        self.assertEqual(kinds[-1], 'showdown')
+
+    def test_all_in_hands_record_every_street_of_the_runout(self):
+        writer = HandHistoryWriter(batch_size=5)
+        tables = [Table('blinds-all-in'), Table('shove')]
+        for table, stack in zip(tables, [1, 100]):
+            table.recorder = HandRecorder(table.table_id, writer)
+            table.waiting_room = dict.fromkeys(['alice', 'bob'], stack)
+
+        async def play_hands():
+            for table in tables:
+                actor = table.get_actor()
+                await actor.submit('start_game')
+                while table.game.phase != HoldemGamePhase.SHOWDOWN:
+                    player = table.game.get_betting_round().get_active_player()
+                    await actor.submit('bet', user_id=player.get_id(), amount=player.stack)
+                actor.stop()
+        async_to_sync(play_hands)()
+        writer.flush()
+
+        for table, stack in zip(tables, [1, 100]):
+            record = HandRecord.objects.get(table_id=table.table_id)
+            self.assertEqual([seat['stack'] for seat in record.seats], [stack, stack])
+            events = list(record.events.order_by('sequence'))
+            self.assertEqual([event.phase for event in events if event.kind == 'deal'], ['flop', 'turn', 'river'])
+            self.assertEqual(events[-1].kind, 'showdown')
+            replayed = replay_hand(record.hand_id)
+            self.assertEqual({player.get_id(): player.stack for player in replayed.players},
+                             {player.get_id(): player.stack for player in table.game.players})
+
+
+@without_hand_history
+class SnapshotTest(TestCase):
+    async def test_restarted_registry_carries_on_the_hand(self):
+        store = FileSnapshotStore(get_temp_dir(self))
+        registry = TableRegistry(snapshot_store=store)
+        table = registry.get_table('snapshot')
+        table.waiting_room = dict.fromkeys(['alice', 'bob', 'carol'], 100)
+        actor = table.get_actor()
+        await actor.submit('start_game')
+        for _ in range(4):
+            await actor.submit('call', user_id=table.game.get_betting_round().get_active_player().get_id())
+        self.assertEqual(table.game.phase, HoldemGamePhase.FLOP)
+        self.assertEqual(await save_snapshots(registry), 1)
+        self.assertEqual(await save_snapshots(registry), 0)
+
+        restored = TableRegistry(snapshot_store=store).get_table('snapshot')
+        self.assertEqual(get_public_state(restored.game), get_public_state(table.game))
+        self.assertEqual(restored.stream.seq, table.stream.seq)
+        for original, player in zip(table.game.players, restored.game.players):
+            self.assertEqual(player.hole_cards, original.hole_cards)
+
+        restored_actor = restored.get_actor()
+        await restored_actor.submit('get_waiting_room')
+        # nobody has reconnected yet, so the turn and every seat are on the clock again
+        self.assertIsNotNone(restored.turn_timer)
+        self.assertEqual(set(restored.reconnect_timers), {'alice', 'bob', 'carol'})
+        for game, game_actor in ((table.game, actor), (restored.game, restored_actor)):
+            while game.phase != HoldemGamePhase.SHOWDOWN:
+                await game_actor.submit('check', user_id=game.get_betting_round().get_active_player().get_id())
+        self.assertEqual(get_public_state(restored.game), get_public_state(table.game))
+        table.close()
+        restored.close()
+
+    def test_unknown_versions_are_not_restored(self):
+        store = FileSnapshotStore(get_temp_dir(self))
+        store.save('old', msgpack.packb({'version': SNAPSHOT_VERSION + 1, 'table_id': 'old'}))
+        with self.assertLogs('holdem.tables', 'ERROR'):
+            table = TableRegistry(snapshot_store=store).get_table('old')
+        self.assertIsNone(table.game)
+
+
+class SidePotTest(TestCase):
+    def create_player(self, player_id, contribution, is_active=True):
+        player = HoldemPlayer(stack=100, id=player_id)
+        player.total_contribution = contribution
+        player.is_active = is_active
+        return player
+
+    def test_pots_are_layered_by_all_in_amounts(self):
+        players = [self.create_player('a', 10), self.create_player('b', 30), self.create_player('c', 30),
+                   self.create_player('d', 20, is_active=False)]
+        pots = build_pots(players)
+        self.assertEqual(pots, [Pot(40, ['a', 'b', 'c']), Pot(50, ['b', 'c'])])
+
+        winnings = award_pots(pots, {'a': 3, 'b': 1, 'c': 2})
+        self.assertEqual(winnings, {'a': 40, 'c': 50})
+
+    def test_odd_chips_go_to_the_first_winners_in_order(self):
+        pots = [Pot(11, ['a', 'b', 'c'])]
+        self.assertEqual(award_pots(pots, {'a': 1, 'b': 2, 'c': 2}), {'b': 6, 'c': 5})
+
+    def test_ten_way_all_in_ranks_hands_as_the_board_is_dealt(self):
+        players = [HoldemPlayer(stack=10 * (i + 1), id=str(i)) for i in range(10)]
+        game = HoldemGameState(players)
+        game.start_preflop()
+        while game.phase != HoldemGamePhase.SHOWDOWN:
+            active_player = game.get_betting_round().get_active_player()
+            game.get_betting_round().bet_action(active_player.get_id(), active_player.stack)
+            if game.get_betting_round().is_round_over(): game.advance_phase()
+        self.assertEqual(dict(game.get_active_player_hand_strengths()),
+                         {player.get_id(): evaluate_hand(game.community_cards + player.hole_cards) for player in game.players})
+        self.assertEqual(len(game.community_cards), 5)
+        self.assertEqual(sum(player.stack for player in game.players), 550)
+        self.assertEqual(sum(pot.amount for pot in game.pots), 540)  # the biggest stack gets its last 10 back
+        self.assertEqual(len(game.pots), 9)
+
+    def test_short_stack_calls_all_in(self):
+        players = [HoldemPlayer(stack=100, id='big'), HoldemPlayer(stack=5, id='short')]
+        game = HoldemGameState(players)
+        game.deal_hand()
+        betting_round = game.get_betting_round()
+        self.assertTrue(betting_round.bet_action('big', 50))
+        self.assertTrue(betting_round.call_action('short'))
+        game.advance_phase()
+        self.assertEqual(game.phase, HoldemGamePhase.SHOWDOWN)
+        self.assertEqual(sum(player.stack for player in game.players), 105)
+        self.assertGreaterEqual(game.players[0].stack, 95)
+
+
+
+class BettingRoundTest(TestCase):
+    def create_round(self, stacks, bets=None):
+        players = [HoldemPlayer(stack=stack, id=str(i)) for i, stack in enumerate(stacks)]
+        for player, bet in zip(players, bets or [0] * len(players)):
+            player.participate()
+            if bet: player.bet(bet)
+        return BettingRound(players, min_raise=2)
+
+    def test_raises_must_be_full_unless_all_in(self):
+        betting_round = self.create_round([100, 100, 12], [0, 1, 2])
+        self.assertEqual(betting_round.get_legal_actions(), LegalActions('0', 2, 4, 100))
+        self.assertFalse(betting_round.bet_action('0', 3))
+        self.assertTrue(betting_round.bet_action('0', 8))
+        self.assertEqual(betting_round.get_legal_actions(), LegalActions('1', 7, 13, 99))
+        self.assertTrue(betting_round.call_action('1'))
+        self.assertEqual(betting_round.get_legal_actions(), LegalActions('2', 6, 10, 10))
+        self.assertTrue(betting_round.bet_action('2', 10))  # all in for a raise of 4, short of the minimum 6
+        self.assertFalse(betting_round.is_round_over())
+        self.assertEqual((betting_round.highest_bet, betting_round.min_raise, betting_round.last_aggressor.get_id()), (12, 6, '2'))
+        # the short all in does not reopen betting for players who already acted
+        self.assertEqual(betting_round.get_legal_actions(), LegalActions('0', 4, 0, 0))
+        self.assertFalse(betting_round.bet_action('0', 20))
+        self.assertTrue(betting_round.call_action('0'))
+        self.assertFalse(betting_round.check_action('1'))
+        self.assertTrue(betting_round.call_action('1'))
+        self.assertTrue(betting_round.is_round_over())
+
+    def test_folds_skip_seats_and_end_the_round(self):
+        betting_round = self.create_round([50, 50, 50])
+        self.assertTrue(betting_round.check_action('0'))
+        self.assertFalse(betting_round.check_action('2'))
+        self.assertTrue(betting_round.fold_action('1'))
+        self.assertTrue(betting_round.bet_action('2', 10))
+        self.assertEqual(betting_round.get_active_player().get_id(), '0')
+        self.assertTrue(betting_round.fold_action('0'))
+        self.assertTrue(betting_round.is_round_over())
+
+    def test_round_without_acting_seats_is_over(self):
+        betting_round = self.create_round([5, 5], [5, 5])
+        self.assertTrue(betting_round.is_round_over())
+        self.assertFalse(betting_round.check_action('0'))
+
+
+@without_hand_history
+class TurnTimerTest(TestCase):
+    async def test_timers_fire_in_deadline_order_unless_cancelled(self):
+        queue = TimerQueue()
+        fired = []
+        async def record(name):
+            fired.append(name)
+        queue.schedule(0.03, record, 'late')
+        cancelled = queue.schedule(0.01, record, 'cancelled')
+        queue.schedule(0.02, record, 'early')
+        queue.cancel(cancelled)
+        self.assertEqual(len(queue), 2)
+        await asyncio.sleep(0.1)
+        self.assertEqual(fired, ['early', 'late'])
+        self.assertEqual(len(queue), 0)
+
+    def test_cancelling_a_previous_loops_timer_keeps_the_count(self):
+        queue = TimerQueue()
+        async def noop():
+            pass
+        async def schedule():
+            return queue.schedule(60, noop)
+        stale = asyncio.run(schedule())
+
+        async def schedule_and_cancel_stale():
+            queue.schedule(60, noop)
+            queue.schedule(60, noop)
+            queue.cancel(stale)
+            self.assertEqual(len(queue), 2)
+            self.assertEqual(len(queue.heap), 2)
+        asyncio.run(schedule_and_cancel_stale())
+
+    async def test_timed_out_players_fold_then_sit_out(self):
+        table = Table('timeouts')
+        table.waiting_room = dict.fromkeys(['alice', 'bob', 'carol'], 100)
+        actor = table.get_actor()
+        await actor.submit('start_game')
+        active_id = table.game.get_betting_round().get_active_player().get_id()
+        self.assertEqual(table.turn_timer.args, ('turn_timeout',))
+        self.assertFalse(await actor.submit('turn_timeout', user_id=active_id, seq=table.stream.seq - 1))
+        self.assertTrue(await actor.submit('turn_timeout', user_id=active_id, seq=table.stream.seq))
+        self.assertFalse(actor.get_player(active_id).is_active)
+        self.assertEqual(table.timeouts, {active_id: 1})
+
+        for user_id in {'alice', 'bob', 'carol'} - {active_id}:
+            await actor.submit('sit_out', user_id=user_id)
+        self.assertEqual(table.game.phase, HoldemGamePhase.SHOWDOWN)
+        self.assertIsNone(table.turn_timer)
+        actor.stop()
+
+    async def test_disconnected_players_leave_after_the_grace_period(self):
+        table = Table('grace')
+        actor = table.get_actor()
+        for user_id in ('alice', 'bob'):
+            await actor.submit('register_channel', user_id=user_id, channel_name=user_id)
+            await actor.submit('player_join', user_id=user_id)
+        await actor.submit('unregister_channel', user_id='alice', channel_name='alice')
+        await actor.submit('register_channel', user_id='alice', channel_name='alice')
+        self.assertEqual(table.reconnect_timers, {})
+
+        with mock.patch('holdem.actors.RECONNECT_GRACE', 0.01):
+            await actor.submit('unregister_channel', user_id='bob', channel_name='bob')
+            await asyncio.sleep(0.1)
+        self.assertEqual(list(table.waiting_room), ['alice'])
+        actor.stop()
+
+
+@without_hand_history
+class MatchmakingTest(TestCase):
+    def test_tables_open_once_enough_players_queue(self):
+        pool = MatchPool(big_blind=2, seats=6)
+        self.assertEqual(pool.join('a'), (1, []))
+        self.assertEqual(pool.join('b'), (2, []))
+        self.assertEqual(pool.leave('b'), 2)
+        self.assertEqual(pool.join('c'), (3, []))
+        ticket, seatings = pool.join('d')
+        self.assertEqual([(seating.user_id, seating.ticket) for seating in seatings], [('a', 1), ('c', 3), ('d', 4)])
+        self.assertEqual(pool.join('e')[1], [Seating('e', 'bb2_6max_1', ticket=5)])
+        self.assertEqual(pool.queue, {})
+
+    def test_short_tables_are_broken_up(self):
+        matchmaker = Matchmaker()
+        for user_id in 'abcd':
+            matchmaker.join(user_id, big_blind=2, seats=2)
+        self.assertEqual(matchmaker.release('bb2_2max_1', 'a'), [])
+        self.assertEqual(matchmaker.release('bb2_2max_2', 'c'), [Seating('d', 'bb2_2max_1', from_table_id='bb2_2max_2')])
+        self.assertNotIn('bb2_2max_2', matchmaker.table_pools)
+        self.assertEqual(matchmaker.get_pool(2, 2).tables, {'bb2_2max_1': {'b', 'd'}})
+        self.assertEqual(matchmaker.release('bb2_2max_2', 'd'), [])
+
+    async def test_waiting_players_are_seated_at_the_next_hand(self):
+        table = Table('next_hand')
+        table.waiting_room = dict.fromkeys(['alice', 'bob'], 100)
+        actor = table.get_actor()
+        await actor.submit('start_game')
+        self.assertTrue(await actor.submit('player_join', user_id='carol'))
+        self.assertFalse(await actor.submit('player_join', user_id='alice'))
+        await actor.submit('fold', user_id=table.game.get_betting_round().get_active_player().get_id())
+        self.assertTrue(await actor.submit('start_game'))
+        self.assertEqual(table.waiting_room, {})
+        self.assertEqual(table.game.players[-1].get_id(), 'carol')  # newcomers post the big blind
+        actor.stop()
+
+    async def test_lobby_seats_queued_players_at_a_new_table(self):
+        application = URLRouter(websocket_urlpatterns)
+        clients = {}
+        for user_id in ('ann', 'ben'):
+            clients[user_id] = WebsocketCommunicator(application, '/ws/socket-server/lobby')
+            await clients[user_id].connect()
+            await clients[user_id].send_json_to({'type': 'server_message', 'userId': user_id, 'message': ''})
+            await clients[user_id].send_json_to({'type': 'queue_join', 'userId': user_id, 'bigBlind': 10, 'seats': 2})
+            if user_id == 'ann':
+                while 'ticket' not in (message := await clients[user_id].receive_json_from(timeout=5)):
+                    pass
+                self.assertEqual(message, {'type': 'queue_update', 'pool': '10_2', 'ticket': 1, 'position': 1})
+
+        messages = await receive_all(clients['ann'])
+        # ben was seated on joining, so the queue never heard of that ticket
+        self.assertEqual([message for message in messages if message['type'] == 'queue_update'],
+                         [{'type': 'queue_update', 'pool': '10_2', 'joined': 1, 'size': 1}])
+        self.assertIn({'type': 'table_assigned', 'tableId': 'bb10_2max_1', 'bigBlind': 10, 'seats': 2}, messages)
+        self.assertIn({'type': 'table_assigned', 'tableId': 'bb10_2max_1', 'bigBlind': 10, 'seats': 2}, await receive_all(clients['ben']))
+
+        table = table_registry.find_table('bb10_2max_1')
+        self.assertEqual(table.game.big_blind, 10)
+        self.assertEqual(sorted(player.stack + player.get_current_bet() for player in table.game.players), [500, 500])
+        for client in clients.values():
+            await client.disconnect()
+
+
+@without_hand_history
+class SpectatorTest(TestCase):
+    async def test_spectators_get_throttled_public_snapshots(self):
+        application = URLRouter(websocket_urlpatterns)
+        table = table_registry.get_table('watched')
+        table.waiting_room = dict.fromkeys(['alice', 'bob', 'carol'], 100)
+        actor = table.get_actor()
+        await actor.submit('start_game')
+        player = WebsocketCommunicator(application, '/ws/socket-server/watched')
+        spectator = WebsocketCommunicator(application, '/ws/socket-server/watched?spectate=1')
+        for communicator in (player, spectator):
+            await communicator.connect()
+        snapshot = await spectator.receive_json_from()
+        self.assertEqual((snapshot['type'], snapshot['seq']), ('spectator_update', 1))
+        self.assertNotIn('holeCards', snapshot)
+
+        with mock.patch('holdem.actors.SPECTATOR_INTERVAL', 0.05):
+            await player.send_json_to({'type': 'message', 'userId': 'alice', 'message': 'hi'})
+            for _ in range(3):
+                await actor.submit('call', user_id=table.game.get_betting_round().get_active_player().get_id())
+            messages = await receive_all(spectator)
+            while not messages:
+                messages = await receive_all(spectator)
+        self.assertEqual([(message['type'], message['seq']) for message in messages], [('spectator_update', 4)])
+        self.assertEqual(messages[0]['phase'], 'flop')
+        self.assertEqual(table.spectators, 1)
+
+        for communicator in (player, spectator):
+            await communicator.disconnect()
+        self.assertEqual(table.spectators, 0)
+        actor.stop()
+
+
+class PreflopEquityTest(TestCase):
+    def test_every_hand_falls_into_one_of_169_classes(self):
+        class_sizes = Counter(get_starting_hand_index(list(hand)) for hand in combinations(CARDS, 2))
+        self.assertEqual(len(class_sizes), 169)
+        self.assertEqual(sorted(set(class_sizes.values())), [4, 6, 12])
+        names = {get_starting_hand_name(index) for index in class_sizes}
+        self.assertTrue({'AA', 'AKs', 'AKo', '72o'} <= names)
+
+    def test_built_table_is_read_back_from_the_mapped_file(self):
+        path = f'{get_temp_dir(self)}/preflop_equity.bin'
+        call_command('build_preflop_equity', iterations=200, workers=1, output=path, stdout=StringIO())
+        table = PreflopEquityTable(path)
+        self.addCleanup(table.close)
+        aces, seven_deuce = generate_cards(['as', 'ah']), generate_cards(['7c', '2d'])
+        self.assertEqual(table.iterations, 200)
+        self.assertGreater(table.get_equity(aces, 1), table.get_equity(seven_deuce, 1))
+        self.assertGreater(table.get_equity(aces, 1), table.get_equity(aces, 9))
+        self.assertEqual(table.get_equity(aces, 3), table.get_equity(generate_cards(['ad', 'ac']), 3))
+        self.assertAlmostEqual(table.get_equity(aces, 1), 0.85, delta=0.1)
+        with self.assertRaises(ValueError):
+            table.get_equity(aces, 10)
@@ -0,0 +1,85 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    __slots__ = ('deadline', 'callback', 'args', 'kwargs', 'cancelled', 'generation')
+
+    def __init__(self, deadline: float, callback: Callable[..., Awaitable], args: tuple, kwargs: dict,
+                 generation: int = 0) -> None:
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+        self.generation = generation  # heap it was pushed into, one per event loop
+
+
+class TimerQueue:
+    """Every timeout in the process on one heap, with a single event loop callback
+    armed for the earliest deadline. Cancelling only flags the timer, the heap
+    is compacted once cancelled timers make up most of it"""
+    def __init__(self) -> None:
+        self.heap: list[tuple[float, int, Timer]] = []
+        self.counter = itertools.count()
+        self.cancelled: int = 0  # flagged timers still on the heap
+        self.generation: int = 0
+        self.loop: asyncio.AbstractEventLoop = None
+        self.wakeup: asyncio.TimerHandle = None
+
+    def schedule(self, delay: float, callback: Callable[..., Awaitable], *args, **kwargs) -> Timer:
+        """Runs await callback(*args, **kwargs) as a task after delay seconds, unless cancelled first"""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # timers of a previous event loop can never fire
+            self.heap = []
+            self.cancelled = 0
+            self.generation += 1
+            self.loop = loop
+            self.wakeup = None
+        timer = Timer(loop.time() + delay, callback, args, kwargs, self.generation)
+        heapq.heappush(self.heap, (timer.deadline, next(self.counter), timer))
+        if self.heap[0][2] is timer: self.arm()
+        return timer
+
+    def cancel(self, timer: Timer) -> None:
+        if timer is None or timer.cancelled: return
+        timer.cancelled = True
+        if timer.generation != self.generation: return  # its heap was dropped with its event loop
+        self.cancelled += 1
+        if self.cancelled > len(self.heap) // 2:
+            self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+            heapq.heapify(self.heap)
+            self.cancelled = 0
+
+    def __len__(self) -> int:
+        return len(self.heap) - self.cancelled
+
+    def arm(self) -> None:
+        if self.wakeup: self.wakeup.cancel()
+        self.wakeup = self.loop.call_at(self.heap[0][0], self.fire_due) if self.heap else None
+
+    def fire_due(self) -> None:
+        now = self.loop.time()
+        while self.heap and self.heap[0][0] <= now:
+            _, _, timer = heapq.heappop(self.heap)
+            if timer.cancelled:
+                self.cancelled -= 1
+                continue
+            timer.cancelled = True  # fired, a late cancel is a no-op
+            self.loop.create_task(self.fire(timer))
+        self.arm()
+
+    async def fire(self, timer: Timer) -> None:
+        try:
+            await timer.callback(*timer.args, **timer.kwargs)
+        except Exception:
+            logger.exception('Timer callback failed', extra={'callback': getattr(timer.callback, '__name__', None)})
+
+
+timer_queue = TimerQueue()
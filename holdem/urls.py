@@ -2,5 +2,6 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('', views.lobby)
+    path('', views.lobby),
+    path('metrics', views.metrics),
 ]
\ No newline at end of file
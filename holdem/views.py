@@ -1,6 +1,12 @@
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from .metrics import registry
+
 # Create your views here.
 
 def lobby(request):
-    return render(request, 'room/lobby.html')
\ No newline at end of file
+    return render(request, 'room/lobby.html')
+
+def metrics(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
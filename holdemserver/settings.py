@@ -45,11 +45,20 @@ INSTALLED_APPS = [
 
 ASGI_APPLICATION = 'holdemserver.asgi.application'
 
+# Set REDIS_URL to run several worker processes: channel groups and table
+# ownership (see holdem.cluster) are then shared through Redis
+REDIS_URL = os.environ.get('REDIS_URL')
+
 CHANNEL_LAYERS = {
     'default':{
         'BACKEND':'channels.layers.InMemoryChannelLayer'
     }
 }
+if REDIS_URL:
+    CHANNEL_LAYERS['default'] = {
+        'BACKEND':'channels_redis.core.RedisChannelLayer',
+        'CONFIG':{'hosts':[REDIS_URL]}
+    }
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
@@ -67,6 +76,44 @@ CACHES = {
         "TIMEOUT": 60 * 60 * 24
     }
 }
+if REDIS_URL:
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "TIMEOUT": 60 * 60 * 24
+    }
+
+# Records from the holdem app are written as JSON lines by a background thread
+# (see holdem.log), set HOLDEM_LOG_LEVEL=DEBUG to log every websocket message
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "structured": {"()": "holdem.log.StructuredFormatter"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "structured"},
+    },
+    "loggers": {
+        "holdem": {
+            "handlers": ["console"],
+            "level": os.environ.get("HOLDEM_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# Every deal and action is saved as hand history (see holdem.history) by a
+# background thread with its own database connection
+HOLDEM_HAND_HISTORY = os.environ.get("HOLDEM_HAND_HISTORY", "1") == "1"
+
+# Set HOLDEM_SNAPSHOT_DIR to snapshot live tables there every few seconds, so
+# a restarted worker carries on its games (see holdem.snapshots)
+HOLDEM_SNAPSHOT_DIR = os.environ.get("HOLDEM_SNAPSHOT_DIR")
+
+# Preflop equities of the 169 starting hand classes, built once with
+# manage.py build_preflop_equity and memory mapped at startup
+HOLDEM_PREFLOP_EQUITY_PATH = os.environ.get("HOLDEM_PREFLOP_EQUITY_PATH", BASE_DIR / "holdem" / "data" / "preflop_equity.bin")
 
 ROOT_URLCONF = "holdemserver.urls"
 